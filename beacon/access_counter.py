@@ -0,0 +1,140 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import AccessCounter
+
+
+class DatabaseAccessCounter:
+    """
+    Counts the requests per remote site and day in the AccessCounter table
+    using atomic increments.
+    """
+
+    def increment(self, remote_site_id, count=1, day=None):
+        """
+        Increments the number of requests of the remote site.
+
+        :param remote_site_id: The id of a RemoteSite object.
+        :param count: Number of requests to be added, default is 1
+        :param day: A date object, default is today
+        """
+        day = day or timezone.localdate()
+        counters = AccessCounter.objects.filter(remote_site_id=remote_site_id, date=day)
+        if counters.update(count=F("count") + count):
+            return
+        try:
+            with transaction.atomic():
+                AccessCounter.objects.create(
+                    remote_site_id=remote_site_id, date=day, count=count
+                )
+        except IntegrityError:  # created concurrently
+            counters.update(count=F("count") + count)
+
+    def get(self, remote_site_id, day=None):
+        """
+        Returns the number of requests of the remote site.
+
+        :param remote_site_id: The id of a RemoteSite object.
+        :param day: A date object, default is today
+        :return: Number of requests integer
+        """
+        counter = (
+            AccessCounter.objects.filter(
+                remote_site_id=remote_site_id, date=day or timezone.localdate()
+            )
+            .values_list("count", flat=True)
+            .first()
+        )
+        return counter or 0
+
+    def rebuild(self, counts):
+        """
+        Replaces all counters by the given counts.
+
+        :param counts: dict mapping (remote site id, date) tuples to the number of requests
+        """
+        with transaction.atomic():
+            AccessCounter.objects.all().delete()
+            AccessCounter.objects.bulk_create(
+                [
+                    AccessCounter(remote_site_id=remote_site_id, date=day, count=count)
+                    for (remote_site_id, day), count in counts.items()
+                ]
+            )
+
+
+class CacheAccessCounter:
+    """
+    Counts the requests per remote site and day in the Django cache defined by
+    the setting BEACON_ACCESS_COUNTER_CACHE. The cache should be shared by all
+    processes serving the Beacon, e.g. memcached or redis.
+    """
+
+    #: Seconds a counter is kept in the cache
+    TIMEOUT = 2 * 24 * 60 * 60
+
+    def increment(self, remote_site_id, count=1, day=None):
+        """
+        Increments the number of requests of the remote site.
+
+        :param remote_site_id: The id of a RemoteSite object.
+        :param count: Number of requests to be added, default is 1
+        :param day: A date object, default is today
+        """
+        key = self._key(remote_site_id, day)
+        cache = caches[settings.BEACON_ACCESS_COUNTER_CACHE]
+        cache.add(key, 0, self.TIMEOUT)
+        try:
+            cache.incr(key, count)
+        except ValueError:  # expired in between
+            cache.add(key, count, self.TIMEOUT)
+
+    def get(self, remote_site_id, day=None):
+        """
+        Returns the number of requests of the remote site.
+
+        :param remote_site_id: The id of a RemoteSite object.
+        :param day: A date object, default is today
+        :return: Number of requests integer
+        """
+        cache = caches[settings.BEACON_ACCESS_COUNTER_CACHE]
+        return cache.get(self._key(remote_site_id, day), 0)
+
+    def rebuild(self, counts):
+        """
+        Sets the counters to the given counts.
+
+        :param counts: dict mapping (remote site id, date) tuples to the number of requests
+        """
+        caches[settings.BEACON_ACCESS_COUNTER_CACHE].set_many(
+            {
+                self._key(remote_site_id, day): count
+                for (remote_site_id, day), count in counts.items()
+            },
+            self.TIMEOUT,
+        )
+
+    def _key(self, remote_site_id, day):
+        """
+        Returns the cache key of the counter.
+
+        :param remote_site_id: The id of a RemoteSite object.
+        :param day: A date object, default is today
+        :return: key string
+        """
+        return "beacon-access-counter-%s-%s" % (
+            remote_site_id,
+            (day or timezone.localdate()).isoformat(),
+        )
+
+
+def get_access_counter():
+    """
+    Returns the access counter backend defined by the setting BEACON_ACCESS_COUNTER.
+
+    :return: An access counter object
+    """
+    return import_string(settings.BEACON_ACCESS_COUNTER)()
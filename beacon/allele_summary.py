@@ -0,0 +1,169 @@
+from itertools import groupby
+from django.db import connection, transaction
+from .models import AlleleSummary, Case, Phenotype, Variant
+
+#: Fields identifying the allele of a Variant or AlleleSummary object
+ALLELE_FIELDS = ("release", "chromosome", "start", "end", "reference", "alternative")
+
+
+def summarize_variants(allele, project_id, variants, phenotypes):
+    """
+    Sums up the variants of an allele in a project.
+
+    :param allele: A (release, chromosome, start, end, reference, alternative) tuple.
+    :param project_id: The id of the Project object containing the variants.
+    :param variants: An iterable of Variant objects with their cases.
+    :param phenotypes: A dict mapping case ids to lists of HPO terms.
+    :return: unsaved AlleleSummary object, set of case ids
+    """
+    summary = AlleleSummary(project_id=project_id, **dict(zip(ALLELE_FIELDS, allele)))
+    case_ids = set()
+    terms = set()
+    for v in variants:
+        c_variant, c_sample, c_frequency = v.get_variant_sample_frequency_count()
+        summary.variant_count += c_variant
+        summary.sample_count += c_sample
+        summary.frequency_count += c_frequency
+        case_ids.add(v.case_id)
+        terms.update(phenotypes.get(v.case_id, ()))
+    summary.phenotypes = sorted(terms)
+    return summary, case_ids
+
+
+def get_allele_summary_keys(instance):
+    """
+    Returns the summaries depending on a Variant, Case or Phenotype object.
+
+    :param instance: A Variant, Case or Phenotype object.
+    :return: list of (release, chromosome, start, end, reference, alternative, project id) tuples
+    """
+    if isinstance(instance, Variant):
+        project_id = _get_project_id(instance.case_id)
+        alleles = [tuple(getattr(instance, field) for field in ALLELE_FIELDS)]
+    elif isinstance(instance, Case):
+        project_id = instance.project_id
+        alleles = Variant.objects.filter(case_id=instance.id).values_list(
+            *ALLELE_FIELDS
+        )
+    else:
+        project_id = _get_project_id(instance.case_id)
+        alleles = Variant.objects.filter(case_id=instance.case_id).values_list(
+            *ALLELE_FIELDS
+        )
+    if project_id is None:
+        return []
+    return [tuple(allele) + (project_id,) for allele in alleles]
+
+
+def refresh_allele_summaries(keys):
+    """
+    Recomputes the summaries of the given alleles from their variants and removes
+    the summaries without variants.
+
+    :param keys: An iterable of (release, chromosome, start, end, reference, alternative,
+     project id) tuples.
+    """
+    for key in set(keys):
+        allele, project_id = key[:-1], key[-1]
+        filters = dict(zip(ALLELE_FIELDS, allele))
+        with transaction.atomic():
+            AlleleSummary.objects.filter(project_id=project_id, **filters).delete()
+            variants = list(
+                Variant.objects.filter(
+                    case__project_id=project_id, **filters
+                ).select_related("case")
+            )
+            if variants:
+                phenotypes = _get_phenotypes({v.case_id for v in variants})
+                _create_summaries(
+                    [summarize_variants(allele, project_id, variants, phenotypes)]
+                )
+
+
+def rebuild_allele_summaries(batch_size=1000):
+    """
+    Replaces all summaries by summing up all variants of the projects.
+
+    :param batch_size: Number of summaries inserted at once.
+    :return: Number of summaries integer
+    """
+    phenotypes = _get_phenotypes()
+    variants = (
+        Variant.objects.filter(case__project__isnull=False)
+        .select_related("case")
+        .order_by(*ALLELE_FIELDS, "case__project_id")
+        .iterator(chunk_size=batch_size)
+    )
+    count = 0
+    with transaction.atomic():
+        AlleleSummary.objects.all().delete()
+        summaries = []
+        for (allele, project_id), group in groupby(variants, key=_get_variant_key):
+            summaries.append(summarize_variants(allele, project_id, group, phenotypes))
+            if len(summaries) == batch_size:
+                _create_summaries(summaries)
+                count += len(summaries)
+                summaries = []
+        _create_summaries(summaries)
+        count += len(summaries)
+    return count
+
+
+def _get_variant_key(variant):
+    """
+    Returns the allele and project of a Variant object for grouping.
+
+    :param variant: A Variant object with its case.
+    :return: (release, chromosome, start, end, reference, alternative) tuple, project id
+    """
+    return (
+        tuple(getattr(variant, field) for field in ALLELE_FIELDS),
+        variant.case.project_id,
+    )
+
+
+def _get_project_id(case_id):
+    """
+    Returns the project of a case.
+
+    :param case_id: The id of a Case object.
+    :return: project id, None if the case or its project do not exist
+    """
+    return Case.objects.filter(id=case_id).values_list("project_id", flat=True).first()
+
+
+def _get_phenotypes(case_ids=None):
+    """
+    Returns the HPO terms of the cases.
+
+    :param case_ids: An iterable of Case ids, default are all cases.
+    :return: dict mapping case ids to lists of HPO terms
+    """
+    phenotypes = Phenotype.objects.all()
+    if case_ids is not None:
+        phenotypes = phenotypes.filter(case_id__in=case_ids)
+    result = {}
+    for case_id, term in phenotypes.values_list("case_id", "phenotype"):
+        result.setdefault(case_id, []).append(term)
+    return result
+
+
+def _create_summaries(summaries):
+    """
+    Inserts the summaries and links their cases.
+
+    :param summaries: A list of (unsaved AlleleSummary object, set of case ids) tuples.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        AlleleSummary.objects.bulk_create([summary for summary, _ in summaries])
+    else:
+        # the primary keys are needed for linking the cases
+        for summary, _ in summaries:
+            summary.save()
+    AlleleSummary.cases.through.objects.bulk_create(
+        [
+            AlleleSummary.cases.through(allelesummary_id=summary.id, case_id=case_id)
+            for summary, case_ids in summaries
+            for case_id in case_ids
+        ]
+    )
@@ -4,3 +4,15 @@ from django.apps import AppConfig
 # Name of the app
 class BeaconConfig(AppConfig):
     name = "beacon"
+
+    def ready(self):
+        """
+        Connects the signal handlers invalidating the caches and loads the HPO graph
+        if ``HPO_WARM_UP`` is set.
+        """
+        from django.conf import settings
+        from . import signals  # noqa: F401
+        from .hpo import get_ontology
+
+        if settings.HPO_WARM_UP:
+            get_ontology()
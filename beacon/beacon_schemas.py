@@ -42,6 +42,111 @@ class QueryResponse:
         )
 
 
+class BatchQueryResponse:
+    """
+    A QueryResponseObject answering a batch of allele requests.
+    """
+
+    def __init__(
+        self,
+        beacon_id,
+        api_version,
+        allele_requests,
+        exists=None,
+        error=None,
+        dataset_allele_responses=None,
+    ):
+        self.beacon_id = beacon_id
+        self.api_version = api_version
+        self.allele_requests = allele_requests
+        self.exists = exists
+        self.error = error
+        self.dataset_allele_responses = dataset_allele_responses
+
+    def create_dict(self):
+        """
+        Creates a dictionary for the JSONResponse.
+
+        :return: dict of BatchQueryResponseObject
+        """
+        if not self.dataset_allele_responses:
+            self.dataset_allele_responses = []
+        return dict(
+            beaconId=self.beacon_id,
+            apiVersion=self.api_version,
+            exists=self.exists,
+            error=self.error,
+            alleleRequests=self.allele_requests,
+            datasetAlleleResponses=self.dataset_allele_responses,
+        )
+
+
+class RegionQueryResponse:
+    """
+    A QueryResponseObject answering a request for the alleles overlapping a region.
+    """
+
+    def __init__(
+        self,
+        beacon_id,
+        api_version,
+        region_request,
+        exists=None,
+        error=None,
+        dataset_allele_responses=None,
+    ):
+        self.beacon_id = beacon_id
+        self.api_version = api_version
+        self.region_request = region_request
+        self.exists = exists
+        self.error = error
+        self.dataset_allele_responses = dataset_allele_responses
+
+    def create_dict(self):
+        """
+        Creates a dictionary for the JSONResponse.
+
+        :return: dict of RegionQueryResponseObject
+        """
+        if not self.dataset_allele_responses:
+            self.dataset_allele_responses = []
+        return dict(
+            beaconId=self.beacon_id,
+            apiVersion=self.api_version,
+            exists=self.exists,
+            error=self.error,
+            regionRequest=self.region_request,
+            datasetAlleleResponses=self.dataset_allele_responses,
+        )
+
+
+class RegionRequest:
+    """
+    A request for the alleles overlapping a region.
+    """
+
+    def __init__(self, chromosome, start, end, release, aggregate):
+        self.chromosome = chromosome
+        self.start = start
+        self.end = end
+        self.release = release
+        self.aggregate = aggregate
+
+    def create_dict(self):
+        """
+        Creates a dictionary for the JSONResponse.
+
+        :return: dict of RegionRequestObject
+        """
+        return dict(
+            referenceName=self.chromosome,
+            start=self.start,
+            end=self.end,
+            assemblyId=self.release,
+            aggregate=self.aggregate,
+        )
+
+
 class AlleleRequest:
     """
     The AlleleRequestObject defined by the beacon protocol.
@@ -116,8 +221,8 @@ class AlleleResponse(object):
             "variantCount>10": self.variant_count_greater_ten,
             "variantCount": self.variant_count,
             "frequency": self.frequency,
-            "coarsePhenotype": sorted(list(self.coarse_phenotype)),
-            "phenotype": sorted(list(self.phenotype)),
+            "coarsePhenotype": sorted(self.coarse_phenotype),
+            "phenotype": sorted(self.phenotype),
             "caseName": sorted(self.case_indices),
         }
         return allele_response_dict
@@ -132,6 +237,8 @@ class AlleleResponseAccumulation(AlleleResponse):
     internal_variant_count: int = 0
     frequency_count: int = 0
     variant: Variant = Variant()
+    #: Counts of the variant computed in bulk for all matched variants, None if not computed
+    variant_counts: tuple = None
 
 
 class InfoResponse:
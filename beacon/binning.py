@@ -0,0 +1,64 @@
+#: First bin of each level of the UCSC binning scheme, from the smallest bins of 128 kb
+#: up to the single bin of 512 Mb
+BIN_OFFSETS = (512 + 64 + 8 + 1, 64 + 8 + 1, 8 + 1, 1, 0)
+
+#: Number of bits of a position shifted away for the smallest bins
+BIN_FIRST_SHIFT = 17
+
+#: Number of bits shifted away for each larger level
+BIN_NEXT_SHIFT = 3
+
+#: Maximal end position covered by the scheme
+MAX_BIN_POSITION = 1 << (BIN_FIRST_SHIFT + BIN_NEXT_SHIFT * (len(BIN_OFFSETS) - 1))
+
+
+def get_bin(start, end):
+    """
+    Returns the smallest bin of the UCSC binning scheme containing a range, so that all
+    ranges overlapping a region are found in the few bins returned by get_overlapping_bins.
+
+    :param start: 1-based start position integer.
+    :param end: End position integer, included in the range.
+    :return: bin integer
+    """
+    start_bin, end_bin = _get_first_bins(start, end)
+    for offset in BIN_OFFSETS:
+        if start_bin == end_bin:
+            return offset + start_bin
+        start_bin >>= BIN_NEXT_SHIFT
+        end_bin >>= BIN_NEXT_SHIFT
+    raise ValueError("The range %d-%d exceeds the binning scheme." % (start, end))
+
+
+def get_overlapping_bins(start, end):
+    """
+    Returns the bins which may contain ranges overlapping a region, which are few
+    for regions up to some Mb. The bins are listed instead of given as ranges per level,
+    so that the database can look up each bin in an index over the bin and position.
+
+    :param start: 1-based start position integer of the region.
+    :param end: End position integer of the region, included in the region.
+    :return: sorted list of bin integers
+    """
+    start_bin, end_bin = _get_first_bins(start, end)
+    bins = []
+    for offset in BIN_OFFSETS:
+        bins.extend(range(offset + start_bin, offset + end_bin + 1))
+        start_bin >>= BIN_NEXT_SHIFT
+        end_bin >>= BIN_NEXT_SHIFT
+    return sorted(bins)
+
+
+def _get_first_bins(start, end):
+    """
+    Returns the smallest bins containing the first and the last base of a range.
+
+    :param start: 1-based start position integer.
+    :param end: End position integer, included in the range.
+    :return: first bin integer, last bin integer
+    """
+    if start < 1 or end > MAX_BIN_POSITION:
+        raise ValueError("The range %d-%d exceeds the binning scheme." % (start, end))
+    # the scheme is defined on 0-based half-open ranges, an empty range such as an
+    # insertion before the start position is placed into the bin of its start
+    return (start - 1) >> BIN_FIRST_SHIFT, (max(start, end) - 1) >> BIN_FIRST_SHIFT
@@ -0,0 +1,219 @@
+import attr
+import hashlib
+import threading
+import time
+import typing
+from collections import OrderedDict
+from django.conf import settings
+from django.db.models import Min
+from .beacon_schemas import DatasetResponse, InfoResponse, OrganizationResponse
+from .models import (
+    Consortium,
+    MetadataBeacon,
+    MetadataBeaconDataset,
+    MetadataBeaconOrganization,
+    RemoteSite,
+)
+from .rendering import render_json
+
+
+def get_visibility_levels(remote_site):
+    """
+    Queries the database for the minimal visibility level of all projects belonging to
+    the consortia of the remote site.
+
+    :param remote_site: A RemoteSite object.
+    :return: dict mapping project id to visibility level integer
+    """
+    project_consortia = (
+        Consortium.projects.through.objects.filter(consortium__remotesite=remote_site)
+        .values("project_id")
+        .annotate(visibility_level=Min("consortium__visibility_level"))
+    )
+    return {c["project_id"]: c["visibility_level"] for c in project_consortia}
+
+
+@attr.s
+class AuthenticatedRemoteSite(object):
+    """
+    A remote site resolved from its key together with the visibility levels of the
+    projects it has access to.
+    """
+
+    remote_site: RemoteSite = attr.ib()
+    visibility_levels: typing.Dict[int, int] = attr.ib(factory=dict)
+
+
+class AuthenticationCache:
+    """
+    In-process LRU cache with a time to live of the remote sites per authentication key.
+    Unknown keys are cached as well. The size and time to live are defined by the
+    settings BEACON_AUTH_CACHE_SIZE and BEACON_AUTH_CACHE_TTL (in seconds). The
+    visibility levels are queried together with the remote site, so an entry is never
+    older than the time to live.
+    The cache is cleared by the signal handlers in the signals module whenever
+    a consortium, remote site or project is changed.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        #: Number of keys answered from the cache
+        self.hits = 0
+        #: Number of keys looked up in the database
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns the remote site belonging to the key.
+
+        :param key: A key string.
+        :return: AuthenticatedRemoteSite object or None if the key is unknown
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        authenticated_site = self._build(key)
+        with self._lock:
+            self._entries[key] = (
+                now + settings.BEACON_AUTH_CACHE_TTL,
+                authenticated_site,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.BEACON_AUTH_CACHE_SIZE:
+                self._entries.popitem(last=False)
+        return authenticated_site
+
+    def stats(self):
+        """
+        Returns the counters of the cache.
+
+        :return: dict containing the number of hits, misses and cached keys
+        """
+        return dict(hits=self.hits, misses=self.misses, size=len(self._entries))
+
+    def clear(self):
+        """
+        Drops all cached keys, the counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def _build(self, key):
+        """
+        Queries the database for the remote site and its visibility levels.
+
+        :param key: A key string.
+        :return: AuthenticatedRemoteSite object or None if the key is unknown
+        """
+        remote_site = RemoteSite.objects.filter(key=key).first()
+        if remote_site is None:
+            return None
+        return AuthenticatedRemoteSite(
+            remote_site,
+            get_visibility_levels(remote_site),
+        )
+
+
+#: Remote sites per authentication key
+authentication_cache = AuthenticationCache()
+
+
+@attr.s
+class RenderedInfoResponse(object):
+    """
+    The rendered InfoResponseObject together with its validators for conditional
+    requests and the remote site of the logged requests.
+    """
+
+    content: bytes = attr.ib()
+    etag: str = attr.ib()
+    #: Time of rendering as timestamp in seconds
+    last_modified: int = attr.ib()
+    public_site: RemoteSite = attr.ib()
+
+
+class InfoResponseCache:
+    """
+    In-process cache of the rendered response of the info endpoint with a time to live
+    defined by the setting BEACON_INFO_CACHE_TTL (in seconds). The response is dropped
+    by the signal handlers in the signals module whenever the beacon metadata or a
+    remote site is changed.
+    """
+
+    def __init__(self):
+        self._entry = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns the rendered response, renders it on first access.
+
+        :return: RenderedInfoResponse object
+        """
+        now = time.monotonic()
+        entry = self._entry
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        info_response = self._build()
+        with self._lock:
+            self._entry = (now + settings.BEACON_INFO_CACHE_TTL, info_response)
+        return info_response
+
+    def clear(self):
+        """
+        Drops the rendered response.
+        """
+        with self._lock:
+            self._entry = None
+
+    def _build(self):
+        """
+        Queries the database for the beacon metadata and renders the response.
+
+        :return: RenderedInfoResponse object
+        """
+        metadata_beacon = MetadataBeacon.objects.all()[0]
+        datasets = [
+            DatasetResponse(
+                d.beacon_data_id,
+                d.name,
+                d.assembly_id,
+                d.create_date_time,
+                d.update_date_time,
+            ).create_dict()
+            for d in MetadataBeaconDataset.objects.filter(
+                metadata_beacon=metadata_beacon
+            )
+        ]
+        organisation = MetadataBeaconOrganization.objects.filter(
+            metadata_beacon=metadata_beacon
+        )[0]
+        content = render_json(
+            InfoResponse(
+                metadata_beacon.beacon_id,
+                metadata_beacon.name,
+                metadata_beacon.api_version,
+                datasets,
+                OrganizationResponse(
+                    organisation.beacon_org_id,
+                    organisation.name,
+                    organisation.contact_url,
+                ).create_dict(),
+            ).create_dict()
+        )
+        return RenderedInfoResponse(
+            content,
+            '"%s"' % hashlib.blake2b(content, digest_size=16).hexdigest(),
+            int(time.time()),
+            RemoteSite.objects.get(name="public"),
+        )
+
+
+#: Rendered response of the info endpoint
+info_response_cache = InfoResponseCache()
@@ -0,0 +1,75 @@
+import numpy as np
+
+
+def pack_allele_counts(genotype, pedigree):
+    """
+    Packs the number of alternative alleles of each sample into one byte per sample
+    ordered by the position of the sample in the pedigree.
+
+    :param genotype: A dict mapping sample names to dicts with the genotype string "gt".
+    :param pedigree: The pedigree list of a case.
+    :return: bytes of the allele counts
+    """
+    return bytes(genotype[x["patient"]]["gt"].count("1") for x in pedigree)
+
+
+def count_alleles(allele_counts, pedigree, chromosome):
+    """
+    Counts the alleles, samples and total number of alleles for the frequency from
+    packed allele counts.
+
+    :param allele_counts: Bytes of the allele counts ordered by pedigree position.
+    :param pedigree: The pedigree list of the case.
+    :param chromosome: The chromosome value of the variant.
+    :return: integer of number of alleles, samples and total numbers of alleles
+    """
+    # the buffers of single cases are short, so counting on the bytes object is
+    # faster than creating a numpy array per variant
+    counts = bytes(allele_counts)
+    c_sample = len(counts) - counts.count(0)
+    if chromosome == 24:  # 24: Y
+        c_frequency = c_sample
+    elif chromosome == 23:  # 23: X
+        c_frequency = sum(
+            1 if x["sex"] == 1 else 2 for count, x in zip(counts, pedigree) if count
+        )
+    else:
+        c_frequency = 2 * c_sample
+    return sum(counts), c_sample, c_frequency
+
+
+def count_variants(variants):
+    """
+    Counts the alleles, samples and total number of alleles for the frequency of many
+    variants at once with arrays over all their samples.
+
+    :param variants: A list of Variant objects with their cases.
+    :return: list of (number of alleles, samples, total number of alleles) tuples of integers
+    """
+    allele_counts = []
+    sexes = []
+    sexes_per_case = {}
+    for v in variants:
+        pedigree = v.case.pedigree
+        if v.allele_counts is not None:
+            allele_counts.append(bytes(v.allele_counts))
+        else:
+            allele_counts.append(pack_allele_counts(v.genotype, pedigree))
+        if v.case_id not in sexes_per_case:
+            sexes_per_case[v.case_id] = bytes(x["sex"] for x in pedigree)
+        sexes.append(sexes_per_case[v.case_id])
+    # index of the variant of each sample
+    owners = np.repeat(np.arange(len(variants)), [len(c) for c in allele_counts])
+    counts = np.frombuffer(b"".join(allele_counts), dtype=np.uint8)
+    carriers = counts > 0
+    chromosomes = np.array([v.chromosome for v in variants], dtype=np.int64)[owners]
+    male = np.frombuffer(b"".join(sexes), dtype=np.uint8) == 1
+    # 23: X, 24: Y
+    ploidy = np.where((chromosomes == 24) | ((chromosomes == 23) & male), 1, 2)
+    return list(
+        zip(
+            np.bincount(owners, counts, len(variants)).astype(int).tolist(),
+            np.bincount(owners, carriers, len(variants)).astype(int).tolist(),
+            np.bincount(owners, carriers * ploidy, len(variants)).astype(int).tolist(),
+        )
+    )
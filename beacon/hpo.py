@@ -0,0 +1,176 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from pathlib import Path
+from django.conf import settings
+import networkx
+import obonet
+
+#: Distance of the coarse terms to the root term of the ontology
+COARSE_TERM_DEPTH = 4
+
+#: The ontology of the process, loaded on first use by get_ontology
+_ontology = None
+#: Lock serializing the first load of the ontology
+_ontology_lock = threading.Lock()
+
+
+class HpoOntology:
+    """
+    The Human Phenotype Ontology reduced to what is needed for the coarse phenotypes:
+    the graph of the terms with edges pointing from a term to its subterms, the
+    set of coarse terms and the coarse terms of each term.
+    """
+
+    def __init__(self, version, graph, coarse_terms, coarse_lookup=None):
+        #: Data version of the ontology, None if unknown
+        self.version = version
+        #: networkx DiGraph of the terms
+        self.graph = graph
+        #: Set of coarse terms
+        self.coarse_terms = coarse_terms
+        #: dict mapping each term below a coarse term to the frozenset of its coarse terms
+        if coarse_lookup is None:
+            coarse_lookup = build_coarse_lookup(graph, coarse_terms)
+        self.coarse_lookup = coarse_lookup
+
+    def get_coarse_terms(self, term):
+        """
+        Returns the coarse terms which are ancestors of the term.
+
+        :param term: A HPO term string.
+        :return: frozenset of coarse term strings, empty if the term has no coarse ancestor
+        """
+        return self.coarse_lookup.get(term, frozenset())
+
+
+def get_ontology():
+    """
+    Returns the ontology configured by the settings ``HPO_GRAPH_PATH`` and
+    ``HPO_CACHE_DIR``. It is loaded once per process on first use, so code paths
+    which never touch phenotypes do not pay for it.
+
+    :return: HpoOntology object
+    """
+    global _ontology
+    if _ontology is None:
+        with _ontology_lock:
+            if _ontology is None:
+                _ontology = load_hpo(settings.HPO_GRAPH_PATH, settings.HPO_CACHE_DIR)
+    return _ontology
+
+
+def load_hpo(path, cache_dir=None):
+    """
+    Loads the ontology from a local OBO file or an URL. If a cache directory is given,
+    the precomputed ontology is serialised to it and loaded from there by later calls.
+    The cache of a local file is keyed by the data version of the file, the cache of
+    an URL is kept until it is removed from the cache directory.
+
+    :param path: A path string or URL of the OBO file.
+    :param cache_dir: A path string of the cache directory, default is no cache.
+    :return: HpoOntology object
+    """
+    if cache_dir is None:
+        return build_hpo(path)
+    cache_file = Path(cache_dir) / ("hpo-%s.pickle" % _cache_key(path))
+    try:
+        with open(cache_file, "rb") as f:
+            version, nodes, edges, coarse_terms, coarse_lookup = pickle.load(f)
+        graph = networkx.DiGraph()
+        graph.add_nodes_from(nodes)
+        graph.add_edges_from(edges)
+        return HpoOntology(version, graph, coarse_terms, coarse_lookup)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        pass
+    ontology = build_hpo(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    # write to a temporary file first so other processes never read a partial cache
+    with tempfile.NamedTemporaryFile(dir=cache_dir, delete=False) as f:
+        pickle.dump(
+            (
+                ontology.version,
+                list(ontology.graph.nodes),
+                list(ontology.graph.edges),
+                ontology.coarse_terms,
+                ontology.coarse_lookup,
+            ),
+            f,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    os.replace(f.name, cache_file)
+    return ontology
+
+
+def build_hpo(path):
+    """
+    Parses the OBO file and computes the coarse terms.
+
+    :param path: A path string or URL of the OBO file.
+    :return: HpoOntology object
+    """
+    obo_graph = obonet.read_obo(path)
+    # reverse the edges to point from a term to its subterms, without the term data
+    graph = networkx.DiGraph()
+    graph.add_nodes_from(obo_graph.nodes)
+    graph.add_edges_from((v, u) for u, v in obo_graph.edges())
+    root = sorted(n for n, d in graph.in_degree() if d == 0)[0]
+    coarse_terms = {
+        k
+        for k, v in networkx.algorithms.shortest_path_length(graph, root).items()
+        if v == COARSE_TERM_DEPTH
+    }
+    return HpoOntology(obo_graph.graph.get("data-version"), graph, coarse_terms)
+
+
+def build_coarse_lookup(graph, coarse_terms):
+    """
+    Computes the coarse terms of all terms by collecting the subterms of each coarse term.
+
+    :param graph: A networkx DiGraph with edges pointing from a term to its subterms.
+    :param coarse_terms: A set of coarse term strings.
+    :return: dict mapping each term below a coarse term to the frozenset of its coarse terms
+    """
+    coarse_lookup = {}
+    for coarse_term in coarse_terms:
+        for term in networkx.algorithms.descendants(graph, coarse_term):
+            coarse_lookup.setdefault(term, set()).add(coarse_term)
+    return {term: frozenset(terms) for term, terms in coarse_lookup.items()}
+
+
+def read_data_version(path):
+    """
+    Reads the data version from the header of a local OBO file.
+
+    :param path: A path string of the OBO file.
+    :return: The data version string or None if the header does not contain it.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("["):
+                break
+            if line.startswith("data-version:"):
+                return line.split(":", 1)[1].strip()
+    return None
+
+
+def _cache_key(path):
+    """
+    Returns the key of the cache file for the OBO file.
+
+    :param path: A path string or URL of the OBO file.
+    :return: key string
+    """
+    path = str(path)
+    if "://" in path:
+        key = path
+    else:
+        stat = os.stat(path)
+        key = read_data_version(path) or "%s-%d-%d" % (
+            os.path.abspath(path),
+            stat.st_size,
+            stat.st_mtime_ns,
+        )
+    return hashlib.sha1(key.encode()).hexdigest()
@@ -0,0 +1,216 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from .access_counter import get_access_counter
+from .models import LogEntry
+from .request_summary import add_request_summaries
+
+logger = logging.getLogger(__name__)
+
+
+class LogWriter:
+    """
+    Writes the LogEntry objects of the requests. Depending on the setting BEACON_LOG_MODE
+    the entries are saved immediately ("sync") or put into a bounded in-memory queue
+    ("async") which is flushed by a background thread with bulk inserts every
+    BEACON_LOG_BATCH_SIZE entries or BEACON_LOG_FLUSH_INTERVAL milliseconds.
+    In sync mode the access counters are incremented within the request. In async mode
+    the buffered requests are kept as pending counts in memory, which are added by the
+    access limit check, and the background thread increments the access counters and
+    adds the entries to the request summaries together with the bulk inserts. The
+    requests in sync mode are kept free of the summaries, which are filled by
+    rebuild_request_summaries.
+    """
+
+    #: Marks the end of the queue when stopping the background thread
+    _STOP = object()
+
+    def __init__(self):
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+        #: Counts of the buffered requests per (remote site id, date) tuple
+        self._pending = Counter()
+
+    def write(self, log_entry, cases=()):
+        """
+        Writes a LogEntry object together with the requested cases.
+
+        :param log_entry: An unsaved LogEntry object.
+        :param cases: An iterable of Case objects for the entry.
+        """
+        self.write_many([(log_entry, cases)])
+
+    def write_many(self, items):
+        """
+        Writes several LogEntry objects together with their requested cases.
+
+        :param items: A list of (unsaved LogEntry object, iterable of Case objects) tuples.
+        """
+        items = [(log_entry, [c for c in cases if c]) for log_entry, cases in items]
+        if settings.BEACON_LOG_MODE == "async":
+            self._ensure_started()
+            with self._lock:
+                self._pending.update(self._count(items))
+            for item in items:
+                # blocks if the writer falls behind and the buffer is full
+                self._queue.put(item)
+        else:
+            self._write(items)
+
+    def pending(self, remote_site_id, day=None):
+        """
+        Returns the number of buffered requests of the remote site which are not yet
+        added to the access counter.
+
+        :param remote_site_id: The id of a RemoteSite object.
+        :param day: A date object, default is today
+        :return: Number of requests integer
+        """
+        with self._lock:
+            return self._pending[(remote_site_id, day or timezone.localdate())]
+
+    def flush(self):
+        """
+        Writes all buffered entries in the calling thread.
+        """
+        items = []
+        while self._queue is not None:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if self._STOP in items:
+            # keep the stop mark for the background thread
+            items.remove(self._STOP)
+            self._queue.put(self._STOP)
+        if items:
+            self._write(items, buffered=True)
+
+    def stop(self):
+        """
+        Stops the background thread after all buffered entries were written.
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(self._STOP)
+            thread.join()
+        self.flush()
+
+    def _ensure_started(self):
+        """
+        Starts the background thread and creates the queue if not done yet.
+        """
+        with self._lock:
+            if self._queue is None:
+                self._queue = queue.Queue(maxsize=settings.BEACON_LOG_BUFFER_SIZE)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="beacon-log-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def _run(self):
+        """
+        Collects buffered entries until the batch is full or the flush interval
+        is over and writes them, until the stop mark is read.
+        """
+        stop = False
+        while not stop:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + settings.BEACON_LOG_FLUSH_INTERVAL / 1000
+            while len(items) < settings.BEACON_LOG_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            stop = self._STOP in items
+            items = [item for item in items if item is not self._STOP]
+            if not items:
+                continue
+            close_old_connections()
+            try:
+                self._write(items, buffered=True)
+            except Exception:
+                logger.exception("Writing %d log entries failed.", len(items))
+        connection.close()
+
+    def _write(self, items, buffered=False):
+        """
+        Inserts the entries and their requested cases and increments the access counters.
+        Buffered entries are added to the request summaries in the same transaction and
+        removed from the pending counts.
+
+        :param items: A list of (unsaved LogEntry object, list of Case objects) tuples.
+        :param buffered: The entries were buffered in async mode, default is False
+        """
+        try:
+            self._insert(items, buffered)
+        finally:
+            # the requests are charged even if logging them failed
+            counts = self._count(items)
+            access_counter = get_access_counter()
+            for (remote_site_id, day), count in counts.items():
+                access_counter.increment(remote_site_id, count, day)
+            if buffered:
+                # after incrementing, so the requests are never missed by the check
+                with self._lock:
+                    self._pending.subtract(counts)
+                    self._pending = +self._pending
+
+    def _insert(self, items, summarize):
+        """
+        Inserts the entries and their requested cases in one transaction.
+
+        :param items: A list of (unsaved LogEntry object, list of Case objects) tuples.
+        :param summarize: Add the entries to the request summaries.
+        """
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                LogEntry.objects.bulk_create([log_entry for log_entry, _ in items])
+            else:
+                # the primary keys are needed for linking the cases
+                LogEntry.objects.bulk_create(
+                    [log_entry for log_entry, cases in items if not cases]
+                )
+                for log_entry, cases in items:
+                    if cases:
+                        log_entry.save()
+            LogEntry.cases.through.objects.bulk_create(
+                [
+                    LogEntry.cases.through(logentry_id=log_entry.id, case_id=case_id)
+                    for log_entry, cases in items
+                    for case_id in {case.id for case in cases}
+                ]
+            )
+            if summarize:
+                add_request_summaries([log_entry for log_entry, _ in items])
+
+    def _count(self, items):
+        """
+        Counts the entries of known remote sites.
+
+        :param items: A list of (LogEntry object, list of Case objects) tuples.
+        :return: Counter mapping (remote site id, date) tuples to the number of entries
+        """
+        return Counter(
+            (log_entry.remote_site_id, timezone.localdate(log_entry.date_time))
+            for log_entry, _ in items
+            if log_entry.remote_site_id is not None
+        )
+
+
+#: Writer used for logging the requests
+log_writer = LogWriter()
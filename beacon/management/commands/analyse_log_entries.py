@@ -1,10 +1,267 @@
 from django.core.management.base import BaseCommand
-from beacon.models import LogEntry, RemoteSite
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from beacon.models import LogEntry, RemoteSite, RequestSummary, VariantRequestSummary
+from itertools import islice
+import datetime
 import pandas as pd
-import numpy as np
+import json
 import os
 import matplotlib.pyplot as plt
 
+#: Columns of the DataFrame read directly from the LogEntry fields
+LOG_ENTRY_COLUMNS = {
+    "method": "method",
+    "endpoint": "endpoint",
+    "user_identifier": "user_identifier",
+    "ip_address": "ip_address",
+    "date_time": "date_time",
+    "status code": "status_code",
+    "response_size": "response_size",
+    "reference": "reference",
+    "alternative": "alternative",
+    "chromosome": "chromosome",
+    "start": "start",
+    "end": "end",
+    "release": "release",
+    "server protocol": "server_protocol",
+}
+
+#: Number of rows fetched from the database at once
+CHUNK_SIZE = 10000
+
+#: Minutes within which a LogEntry is committed after its request, the entries of the
+#: last minutes are left for the next update of the aggregates
+LOG_DELAY_MINUTES = 10
+
+#: Columns identifying a requested variant
+VARIANT_COLUMNS = ["chromosome", "start", "end", "reference", "alternative", "release"]
+
+
+def count_per_day(data, column):
+    """
+    Counts the requests per day and value of a column.
+
+    :param data: pandas DataFrame object with the LogEntry data
+    :param column: string
+    :return: pandas Series object indexed by the day and the value
+    """
+    return data.groupby([data["date_time"].dt.normalize(), column]).size()
+
+
+def count_variant_containers(data, variant_container, columns):
+    """
+    Counts the requests per variant container and values of other columns. Requests with
+    several cases or projects are counted for each of them.
+
+    :param data: pandas DataFrame object with a column of lists of variant containers
+    :param variant_container: string, either "case" or "project"
+    :param columns: list of strings
+    :return: pandas Series object
+    """
+    exploded = data[[variant_container] + columns].explode(variant_container)
+    # requests without variant container result in missing values
+    return (
+        exploded.dropna(subset=[variant_container])
+        .groupby([variant_container] + columns)
+        .size()
+    )
+
+
+def get_top_remote_sites(counts):
+    """
+    Determines the remote site requesting each variant container most often.
+
+    :param counts: pandas Series object of the counts per variant container and remote site
+    :return: pandas DataFrame object indexed by the variant containers with the columns
+     "total_call_count", "Maximal requesting identifier" and "percentage", the share
+     of the remote site on the requests rounded to two decimals
+    """
+    table_count_remote_site = counts.unstack()
+    return pd.DataFrame(
+        {
+            "total_call_count": counts.groupby(level=0).sum(),
+            "Maximal requesting identifier": table_count_remote_site.idxmax(axis=1),
+            "percentage": (
+                table_count_remote_site.max(axis=1)
+                / table_count_remote_site.sum(axis=1)
+            ).round(2),
+        }
+    )
+
+
+def get_top_users(counts):
+    """
+    Determines the user requesting each variant container most often within the remote
+    site requesting it most often.
+
+    :param counts: pandas Series object of the counts per variant container, remote site
+     and user
+    :return: pandas DataFrame object indexed by the variant containers with the columns
+     "total_call_count", "Maximal requesting user per remote site" and "percentage",
+     the share of the user on the requests of the remote site rounded to two decimals
+    """
+    top_remote_sites = get_top_remote_sites(counts.groupby(level=[0, 1]).sum())
+    table_count_user = counts.unstack(level=2).loc[
+        pd.MultiIndex.from_arrays(
+            [
+                top_remote_sites.index,
+                top_remote_sites["Maximal requesting identifier"],
+            ]
+        )
+    ]
+    return pd.DataFrame(
+        {
+            "total_call_count": top_remote_sites["total_call_count"].values,
+            "Maximal requesting user per remote site": table_count_user.idxmax(
+                axis=1
+            ).values,
+            "percentage": (table_count_user.max(axis=1) / table_count_user.sum(axis=1))
+            .round(2)
+            .values,
+        },
+        index=top_remote_sites.index,
+    )
+
+
+class LogAggregates:
+    """
+    The numbers of requests needed for the plots of the command, which are counted chunk
+    by chunk, so that the memory used does not grow with the number of LogEntry entries.
+    Each number is a pandas Series of counts indexed by the counted values. The
+    aggregates can be saved to a file together with the date time up to which the
+    LogEntry entries were counted, so that later runs only count the entries logged in
+    the meantime.
+    """
+
+    #: Index levels of each number
+    LEVELS = {
+        "endpoints": ["date_time", "endpoint"],
+        "status_codes": ["date_time", "status code"],
+        "remote_sites": ["remote site"],
+        "cases": ["case", "remote site", "remote site user"],
+        "projects": ["project", "remote site", "remote site user"],
+        "access_limits": ["remote site", "status code"],
+        "variants": VARIANT_COLUMNS,
+    }
+
+    def __init__(self):
+        #: Date time up to which the LogEntry entries were counted
+        self.high_water_mark = None
+        #: Number of requests per day and endpoint
+        self.endpoints = pd.Series(dtype="int64")
+        #: Number of requests per day and status code
+        self.status_codes = pd.Series(dtype="int64")
+        #: Number of requests to the query endpoint per remote site
+        self.remote_sites = pd.Series(dtype="int64")
+        #: Number of requests to the query endpoint per case, remote site and user
+        self.cases = pd.Series(dtype="int64")
+        #: Number of requests to the query endpoint per project, remote site and user
+        self.projects = pd.Series(dtype="int64")
+        #: Number of allowed and by the access limit restricted requests to the query
+        #: endpoint per remote site and status code
+        self.access_limits = pd.Series(dtype="int64")
+        #: Number of valid requests to the query endpoint per variant
+        self.variants = pd.Series(dtype="int64")
+
+    @property
+    def empty(self):
+        """
+        True if no request was counted.
+        """
+        return self.endpoints.empty
+
+    def add(self, data):
+        """
+        Counts the requests of a chunk and adds them to the aggregates.
+
+        :param data: pandas DataFrame object as created by Command._create_data_frame
+        """
+        self.endpoints = self._add(self.endpoints, count_per_day(data, "endpoint"))
+        self.status_codes = self._add(
+            self.status_codes, count_per_day(data, "status code")
+        )
+        query = data[data["endpoint"] == "query"]
+        self.remote_sites = self._add(
+            self.remote_sites, query.groupby("remote site").size()
+        )
+        self.cases = self._add(
+            self.cases,
+            count_variant_containers(
+                query, "case", ["remote site", "remote site user"]
+            ),
+        )
+        self.projects = self._add(
+            self.projects,
+            count_variant_containers(
+                query, "project", ["remote site", "remote site user"]
+            ),
+        )
+        restricted = query[query["status code"].isin([200, 403])]
+        self.access_limits = self._add(
+            self.access_limits,
+            restricted.groupby(["remote site", "status code"]).size(),
+        )
+        valid = query[query["status code"] != 400]
+        self.variants = self._add(self.variants, valid.groupby(VARIANT_COLUMNS).size())
+
+    @classmethod
+    def load(cls, file_name):
+        """
+        Loads aggregates saved by save or, if the file does not exist yet, creates empty
+        aggregates.
+
+        :param file_name: path of the file
+        :return: LogAggregates object
+        """
+        aggregates = cls()
+        if not os.path.exists(file_name):
+            return aggregates
+        with open(file_name) as json_file:
+            saved = json.load(json_file)
+        if saved["high_water_mark"] is not None:
+            aggregates.high_water_mark = parse_datetime(saved["high_water_mark"])
+        for name, levels in cls.LEVELS.items():
+            if not saved[name]:
+                continue
+            counts = pd.DataFrame(saved[name], columns=levels + ["count"])
+            if "date_time" in levels:
+                counts["date_time"] = pd.to_datetime(counts["date_time"])
+            setattr(aggregates, name, counts.set_index(levels)["count"].rename(None))
+        return aggregates
+
+    def save(self, file_name):
+        """
+        Saves the aggregates and the high-water mark as JSON file. The file is replaced
+        at once, so that an interrupted run leaves the previous aggregates.
+
+        :param file_name: path of the file
+        """
+        saved = {"high_water_mark": self.high_water_mark}
+        for name in self.LEVELS:
+            saved[name] = getattr(self, name).reset_index().values.tolist()
+        with open("%s.tmp" % file_name, "w") as json_file:
+            json.dump(saved, json_file, cls=DjangoJSONEncoder)
+        os.replace("%s.tmp" % file_name, file_name)
+
+    @staticmethod
+    def _add(counts, new_counts):
+        """
+        Adds counts of two pandas Series objects.
+
+        :param counts: pandas Series object
+        :param new_counts: pandas Series object
+        :return: pandas Series object
+        """
+        if new_counts.empty:
+            return counts
+        if counts.empty:
+            return new_counts
+        return counts.add(new_counts, fill_value=0).astype("int64")
+
+
 #: Suppress warning for too many figures opened for testing
 plt.rcParams.update({"figure.max_open_warning": 0})
 
@@ -35,14 +292,35 @@ class Command(BaseCommand):
             nargs=2,
             help="The time period to look at like '2021-05-03' '2021-10-01'.",
         )
+        parser.add_argument(
+            "--aggregates",
+            type=str,
+            help="Path of a file keeping the aggregates of the log entries between runs, "
+            "so that only the entries logged after the previous run are read.",
+        )
+        parser.add_argument(
+            "--summaries",
+            action="store_true",
+            help="Reads the daily request summaries instead of the log entries, "
+            "without the plots about cases and projects.",
+        )
+        parser.add_argument(
+            "--chunk_size",
+            type=int,
+            help="Number of log entries read at once, default is %d. The entries are counted "
+            "chunk by chunk, so that the memory used does not grow with their number."
+            % CHUNK_SIZE,
+        )
 
     def handle(self, *args, **options):
         """
         Creates a statistical overview of the logged requests.
 
         :param args:
-        :param options: Flags for optionally create a csv file "--as_csv", save plots in given directory "--path" 
-         and define the to be observed time period "--time_period '2021-10-01' '2022-10-01'"
+        :param options: Flags for optionally create a csv file "--as_csv", save plots in given directory "--path"
+         and define the to be observed time period "--time_period '2021-10-01' '2022-10-01'", read the entries
+         in chunks "--chunk_size 100000", update the aggregates of previous runs "--aggregates aggregates.json"
+         or read the request summaries "--summaries"
         :return: A stdout string if successful otherwise returns an error or warning.
         """
         # if argument given time period, filter for given time period
@@ -63,118 +341,59 @@ class Command(BaseCommand):
                         "ERROR: Your input format of the date_time is invalid."
                     )
                 )
-            # creates dataframe for given time period
-            log_data = self._create_data_frame(True, time_start, time_end)
+            time_period = (True, time_start, time_end)
+        else:
+            time_period = ()
+        log_entries = self._get_log_entries(*time_period)
+        chunk_size = options["chunk_size"] or CHUNK_SIZE
+        if options["aggregates"]:
+            # the saved aggregates always cover all logged entries
+            if options["time_period"]:
+                return self.stdout.write(
+                    self.style.ERROR(
+                        "ERROR: The aggregates can't be restricted to a time period."
+                    )
+                )
+            try:
+                aggregates = LogAggregates.load(options["aggregates"])
+            except (OSError, ValueError, KeyError):
+                return self.stdout.write(
+                    self.style.ERROR(
+                        "ERROR: Couldn't read the aggregates file: %s"
+                        % options["aggregates"]
+                    )
+                )
+            self._update_aggregates(aggregates, chunk_size)
+            try:
+                aggregates.save(options["aggregates"])
+            except OSError:
+                return self.stdout.write(
+                    self.style.ERROR(
+                        "ERROR: Couldn't write the aggregates file: %s"
+                        % options["aggregates"]
+                    )
+                )
+        elif options["summaries"]:
+            # counts the requests from the daily summaries
+            aggregates = self._read_summaries(*time_period)
         else:
-            # creates dataframe for all logged entries
-            log_data = self._create_data_frame()
-        # checks whether dataframe is not empty
-        if log_data.empty:
+            # counts the logged entries of the time period chunk by chunk
+            aggregates = LogAggregates()
+            for data in self._iterate_data_frames(log_entries, chunk_size):
+                aggregates.add(data)
+        # checks whether there are any log entries
+        if aggregates.empty:
             return self.stdout.write(
                 self.style.WARNING(
                     "WARNING: No data available for the given time period."
                 )
             )
-        # sets date time as an index for dataframe
-        log_data_indexed = log_data.set_index("date_time")
         # sets style used for plotting
         plt.style.use("seaborn-bright")
-        # checks whether data is just from one month
-        # indicator for used daily data points in plots
-        month_day = False
-        if log_data_indexed.index.year.nunique() == 1:
-            month_day = True
         # figures and plot names for saving them later
         figures = []
         file_names = []
-        fig1, ax1 = plt.subplots(1)
-        fig2, ax2 = plt.subplots(1)
-        log_data_indexed.reset_index(inplace=True)
-        # making plots
-        self._plot_endpoint_per_time(
-            log_data_indexed, fig1, ax1, figures, file_names, month_day
-        )
-        figures.append(fig1)
-        file_names.append("requests_per_endpoint.pdf")
-        self._plot_status_codes_per_time(
-            log_data_indexed, fig2, ax2, figures, file_names, month_day
-        )
-        figures.append(fig2)
-        file_names.append("status_codes_requests.pdf")
-        log_data_query = log_data.loc[log_data.endpoint == "query"]
-        # checks whether there are data points with query as endpoint
-        if log_data_query.empty:
-            self.stdout.write(
-                self.style.WARNING(
-                    "WARNING: No data available for plotting information about query endpoint."
-                )
-            )
-        else:
-            # making plots
-            log_data_query.reset_index(inplace=True)
-            fig3, ax3 = plt.subplots(1)
-            self._plot_requests_per_remote_site(
-                log_data_query["remote site"], fig3, ax3, figures, file_names
-            )
-            figures.append(fig3)
-            file_names.append("requests_per_remote_site.pdf")
-            fig4, ax4 = plt.subplots(1)
-            self._plot_remote_site_per_variant_container(
-                log_data_query[["remote site", "case"]],
-                fig4,
-                ax4,
-                "case",
-                figures,
-                file_names,
-            )
-            fig5, ax5 = plt.subplots(1)
-            self._plot_remote_site_per_variant_container(
-                log_data_query[["remote site", "project"]],
-                fig5,
-                ax5,
-                "project",
-                figures,
-                file_names,
-            )
-            fig6, ax6 = plt.subplots(1)
-            self._plot_remote_site_user_per_variant_container(
-                log_data_query[["remote site user", "case", "remote site"]],
-                fig6,
-                ax6,
-                "case",
-                figures,
-                file_names,
-            )
-            fig7, ax7 = plt.subplots(1)
-            self._plot_remote_site_user_per_variant_container(
-                log_data_query[["remote site user", "project", "remote site"]],
-                fig7,
-                ax7,
-                "project",
-                figures,
-                file_names,
-            )
-            fig8, ax8 = plt.subplots(1)
-            self._plot_access_limit_per_remote_site(
-                log_data_query, fig8, ax8, figures, file_names
-            )
-            fig9, ax9 = plt.subplots(1)
-            self._plot_table_top_requested_variants(
-                log_data_query[log_data_query["status code"] != 400][
-                    [
-                        "reference",
-                        "chromosome",
-                        "start",
-                        "end",
-                        "release",
-                        "alternative",
-                    ]
-                ],
-                fig9,
-                ax9,
-                figures,
-                file_names,
-            )
+        self._plot_aggregates(aggregates, figures, file_names)
         # checks if '--path' argument was passed
         if options["path"]:
             path = options["path"]
@@ -185,7 +404,7 @@ class Command(BaseCommand):
                     figure.savefig(file_name)
                 # if argument '--as_csv' was passed save data as csv file
                 if options["as_csv"]:
-                    log_data.to_csv("log_entry_data.csv")
+                    self._save_csv(log_entries, chunk_size)
             except OSError:
                 return self.stdout.write(
                     self.style.ERROR(
@@ -199,7 +418,7 @@ class Command(BaseCommand):
             # if argument '--as_csv' was passed save csv file in current directory
             if options["as_csv"]:
                 try:
-                    log_data.to_csv("log_entry_data.csv")
+                    self._save_csv(log_entries, chunk_size)
                     self.stdout.write(
                         self.style.WARNING(
                             "WARNING: The log_entry_data.csv file was saved in the current working directory."
@@ -217,34 +436,215 @@ class Command(BaseCommand):
             )
         )
 
-    # logs = pandas.DataFrame(LogEntry.objects.all().values())
+    def _plot_aggregates(self, aggregates, figures, file_names):
+        """
+        Creates the plots of the aggregated LogEntry data.
+
+        :param aggregates: LogAggregates object
+        :param figures: list of matplotlib figures objects
+        :param file_names: list of strings
+        """
+        # checks whether data is just from one year
+        # indicator for used daily data points in plots
+        month_day = aggregates.endpoints.index.get_level_values(0).year.nunique() == 1
+        fig1, ax1 = plt.subplots(1)
+        self._plot_endpoint_per_time(
+            aggregates.endpoints, fig1, ax1, figures, file_names, month_day
+        )
+        fig2, ax2 = plt.subplots(1)
+        self._plot_status_codes_per_time(
+            aggregates.status_codes, fig2, ax2, figures, file_names, month_day
+        )
+        # checks whether there are data points with query as endpoint
+        if aggregates.remote_sites.empty:
+            self.stdout.write(
+                self.style.WARNING(
+                    "WARNING: No data available for plotting information about query endpoint."
+                )
+            )
+            return
+        fig3, ax3 = plt.subplots(1)
+        self._plot_requests_per_remote_site(
+            aggregates.remote_sites, fig3, ax3, figures, file_names
+        )
+        fig4, ax4 = plt.subplots(1)
+        self._plot_remote_site_per_variant_container(
+            aggregates.cases, fig4, ax4, "case", figures, file_names
+        )
+        fig5, ax5 = plt.subplots(1)
+        self._plot_remote_site_per_variant_container(
+            aggregates.projects, fig5, ax5, "project", figures, file_names
+        )
+        fig6, ax6 = plt.subplots(1)
+        self._plot_remote_site_user_per_variant_container(
+            aggregates.cases, fig6, ax6, "case", figures, file_names
+        )
+        fig7, ax7 = plt.subplots(1)
+        self._plot_remote_site_user_per_variant_container(
+            aggregates.projects, fig7, ax7, "project", figures, file_names
+        )
+        fig8, ax8 = plt.subplots(1)
+        self._plot_access_limit_per_remote_site(
+            aggregates.access_limits, fig8, ax8, figures, file_names
+        )
+        fig9, ax9 = plt.subplots(1)
+        self._plot_table_top_requested_variants(
+            aggregates.variants, fig9, ax9, figures, file_names
+        )
+
+    def _read_summaries(self, time_period=False, time_start=None, time_end=None):
+        """
+        Reads the aggregates from the RequestSummary and VariantRequestSummary entries,
+        optionally filtered for the days of a given time period. The requests are not
+        counted per case and project.
+
+        :param time_period: bool indicating if time period is given
+        :param time_start: a pandas datetime object
+        :param time_end: a pandas datetime object
+        :return: LogAggregates object
+        """
+        request_summaries = RequestSummary.objects.all()
+        variant_summaries = VariantRequestSummary.objects.all()
+        if time_period:
+            request_summaries = request_summaries.filter(
+                date__gte=time_start.date(), date__lte=time_end.date()
+            )
+            variant_summaries = variant_summaries.filter(
+                date__gte=time_start.date(), date__lte=time_end.date()
+            )
+        requests = pd.DataFrame(
+            request_summaries.values_list(
+                "date", "remote_site__name", "endpoint", "status_code"
+            )
+            .annotate(count=Sum("count"))
+            .order_by(),
+            columns=["date_time", "remote site", "endpoint", "status code", "count"],
+        )
+        requests["date_time"] = pd.to_datetime(requests["date_time"])
+        requests["remote site"] = requests["remote site"].fillna("Unknown")
+        variants = pd.DataFrame(
+            variant_summaries.values_list(*VARIANT_COLUMNS)
+            .annotate(count=Sum("count"))
+            .order_by(),
+            columns=VARIANT_COLUMNS + ["count"],
+        )
+        aggregates = LogAggregates()
+        aggregates.endpoints = self._sum_counts(requests, ["date_time", "endpoint"])
+        aggregates.status_codes = self._sum_counts(
+            requests, ["date_time", "status code"]
+        )
+        query = requests[requests["endpoint"] == "query"]
+        aggregates.remote_sites = self._sum_counts(query, ["remote site"])
+        aggregates.access_limits = self._sum_counts(
+            query[query["status code"].isin([200, 403])],
+            ["remote site", "status code"],
+        )
+        aggregates.variants = self._sum_counts(variants, VARIANT_COLUMNS)
+        return aggregates
+
+    def _sum_counts(self, data, columns):
+        """
+        Sums up the column "count" per values of the given columns.
+
+        :param data: pandas DataFrame object
+        :param columns: list of strings
+        :return: pandas Series object
+        """
+        if data.empty:
+            return pd.Series(dtype="int64")
+        return data.groupby(columns)["count"].sum().rename(None)
+
+    def _update_aggregates(self, aggregates, chunk_size):
+        """
+        Counts the LogEntry entries logged after the high-water mark of the aggregates
+        up to LOG_DELAY_MINUTES minutes ago and moves the mark to that date time.
+
+        :param aggregates: LogAggregates object
+        :param chunk_size: number of entries read at once
+        """
+        # ids are assigned before the commit, e.g. of the bulk inserts of the async
+        # log writer, so the entries are selected by the date time of their request
+        # leaving the recent ones, which may not be committed yet, for the next run,
+        # the mark is saved in whole seconds
+        high_water_mark = timezone.now().replace(microsecond=0) - datetime.timedelta(
+            minutes=LOG_DELAY_MINUTES
+        )
+        if aggregates.high_water_mark is not None:
+            high_water_mark = max(high_water_mark, aggregates.high_water_mark)
+        log_entries = LogEntry.objects.filter(date_time__lte=high_water_mark)
+        if aggregates.high_water_mark is not None:
+            log_entries = log_entries.filter(date_time__gt=aggregates.high_water_mark)
+        for data in self._iterate_data_frames(log_entries.order_by("id"), chunk_size):
+            aggregates.add(data)
+        aggregates.high_water_mark = high_water_mark
+
+    def _save_csv(self, log_entries, chunk_size):
+        """
+        Saves the LogEntry data as log_entry_data.csv file in the current working directory.
+        The LogEntry entries are read and written in chunks.
+
+        :param log_entries: a QuerySet of the LogEntry entries
+        :param chunk_size: number of entries read at once
+        """
+        for i, data in enumerate(self._iterate_data_frames(log_entries, chunk_size)):
+            data.to_csv("log_entry_data.csv", mode="a" if i else "w", header=i == 0)
+
     def _create_data_frame(self, time_period=False, time_start=None, time_end=None):
         """
         Creates a pandas DataFrame object by querying the database for the the LogEntry entries
-        and filters entries optionally for a given time period.
+        and filters entries optionally for a given time period. The DataFrame is put
+        together from the chunks of _iterate_data_frames, the command itself only counts
+        the chunks.
 
         :param time_period: bool indicating if time period is given
         :param time_start: a pandas datetime object
         :param time_end: a pandas datetime object
         :return: a pandas DataFrame object containing the LogEntry data
         """
-        methods = []
-        endpoints = []
-        user_identifiers = []
-        ip_addresses = []
-        remote_sites_names = []
-        date_times = []
-        status_codes = []
-        response_sizes = []
-        references = []
-        alternatives = []
-        chromosomes = []
-        starts = []
-        ends = []
-        releases = []
-        server_protocols = []
-        cases = []
-        projects = []
+        log_entries = self._get_log_entries(time_period, time_start, time_end)
+        chunks = list(self._iterate_data_frames(log_entries, CHUNK_SIZE))
+        if not chunks:
+            return self._build_data_frame([], {}, {})
+        return pd.concat(chunks)
+
+    def _iterate_data_frames(self, log_entries, chunk_size):
+        """
+        Reads the LogEntry entries in chunks and yields a pandas DataFrame object per chunk
+        like _create_data_frame. The DataFrames are indexed continuously.
+
+        :param log_entries: a QuerySet of the LogEntry entries ordered by their ids
+        :param chunk_size: number of entries read at once
+        :return: generator of pandas DataFrame objects
+        """
+        rows = log_entries.values_list(
+            "id", "remote_site__name", *LOG_ENTRY_COLUMNS.values()
+        ).iterator(chunk_size=chunk_size)
+        offset = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            # entries of the id range outside of the QuerySet are not looked up later
+            cases, projects = self._get_variant_container_names(
+                LogEntry.cases.through.objects.filter(
+                    logentry_id__gte=chunk[0][0], logentry_id__lte=chunk[-1][0]
+                )
+            )
+            data = self._build_data_frame(chunk, cases, projects)
+            data.index += offset
+            offset += len(chunk)
+            yield data
+
+    def _get_log_entries(self, time_period=False, time_start=None, time_end=None):
+        """
+        Returns the LogEntry entries ordered by their ids, optionally filtered for a given
+        time period.
+
+        :param time_period: bool indicating if time period is given
+        :param time_start: a pandas datetime object
+        :param time_end: a pandas datetime object
+        :return: a QuerySet of the LogEntry entries
+        """
         # in case time period is given filters LogEntry entries
         if time_period:
             log_entries = LogEntry.objects.filter(
@@ -253,143 +653,130 @@ class Command(BaseCommand):
         # query database for all LogEntry entries
         else:
             log_entries = LogEntry.objects.all()
-        # read data from 'log_entries' QuerySet
-        for log in log_entries:
-            cases_query_set = log.cases.all()
-            cases.append([c.name for c in cases_query_set])
-            projects.append([c.project.title for c in cases_query_set])
-            methods.append(log.method)
-            endpoints.append(log.endpoint)
-            ip_addresses.append(log.ip_address)
-            if log.remote_site is None:
-                remote_sites_names.append("Unknown")
-            else:
-                remote_sites_names.append(
-                    RemoteSite.objects.get(id=log.remote_site.id).name
-                )
-            user_identifiers.append(
-                "%s - %s"
-                % (remote_sites_names[len(remote_sites_names) - 1], log.user_identifier)
-            )
-            date_times.append(log.date_time)
-            status_codes.append(log.status_code)
-            response_sizes.append(log.response_size)
-            references.append(log.reference)
-            alternatives.append(log.alternative)
-            chromosomes.append(log.chromosome)
-            starts.append(log.start)
-            ends.append(log.end)
-            releases.append(log.release)
-            server_protocols.append(log.server_protocol)
+        return log_entries.order_by("id")
+
+    def _get_variant_container_names(self, log_entry_cases):
+        """
+        Reads the names of the cases and projects per LogEntry.
+
+        :param log_entry_cases: a QuerySet of the many-to-many table of LogEntry and Case
+        :return: dict of the lists of case names per LogEntry id, dict of the lists of
+         project titles per LogEntry id
+        """
+        cases = {}
+        projects = {}
+        for log_id, case_name, project_title in (
+            log_entry_cases.order_by("id")
+            .values_list("logentry_id", "case__name", "case__project__title")
+            .iterator(chunk_size=CHUNK_SIZE)
+        ):
+            cases.setdefault(log_id, []).append(case_name)
+            projects.setdefault(log_id, []).append(project_title)
+        return cases, projects
+
+    def _build_data_frame(self, rows, cases, projects):
+        """
+        Creates a pandas DataFrame object of LogEntry entries.
+
+        :param rows: list of tuples of the id, the name of the remote site and the fields
+         of LOG_ENTRY_COLUMNS of each LogEntry
+        :param cases: dict of the lists of case names per LogEntry id
+        :param projects: dict of the lists of project titles per LogEntry id
+        :return: a pandas DataFrame object containing the LogEntry data
+        """
+        ids, remote_sites_names, *columns = (
+            zip(*rows) if rows else [()] * (len(LOG_ENTRY_COLUMNS) + 2)
+        )
+        data = dict(zip(LOG_ENTRY_COLUMNS.keys(), columns))
+        remote_sites_names = [
+            "Unknown" if name is None else name for name in remote_sites_names
+        ]
         return pd.DataFrame(
             data={
-                "method": methods,
-                "endpoint": endpoints,
-                "remote site user": user_identifiers,
-                "ip_address": ip_addresses,
+                "method": data["method"],
+                "endpoint": data["endpoint"],
+                "remote site user": [
+                    "%s - %s" % (name, user_identifier)
+                    for name, user_identifier in zip(
+                        remote_sites_names, data["user_identifier"]
+                    )
+                ],
+                "ip_address": data["ip_address"],
                 "remote site": remote_sites_names,
                 # time zone removed
-                "date_time": [pd.to_datetime(d).tz_localize(None) for d in date_times],
-                "status code": status_codes,
-                "response_size": response_sizes,
-                "reference": references,
-                "alternative": alternatives,
-                "chromosome": chromosomes,
-                "start": starts,
-                "end": ends,
-                "release": releases,
-                "server protocol": server_protocols,
-                "case": cases,
-                "project": projects,
+                "date_time": pd.to_datetime(data["date_time"], utc=True).tz_localize(
+                    None
+                ),
+                "status code": data["status code"],
+                "response_size": data["response_size"],
+                "reference": data["reference"],
+                "alternative": data["alternative"],
+                "chromosome": data["chromosome"],
+                "start": data["start"],
+                "end": data["end"],
+                "release": data["release"],
+                "server protocol": data["server protocol"],
+                "case": [cases.get(i, []) for i in ids],
+                "project": [projects.get(i, []) for i in ids],
             }
         )
 
     def _plot_endpoint_per_time(
-        self, data, fig, ax, figures, file_names, month_day=False
+        self, counts, fig, ax, figures, file_names, month_day=False
     ):
         """
         Creates a plot containing information about the number of request per endpoint and
         per time scaled per month or per year depending on the month_day input. Appends
         the created plot to the figures and its name to file names.
 
-        :param data: pandas DataFrame object
+        :param counts: pandas Series object of the counts per day and endpoint
         :param fig: matplotlib figure object
         :param ax: matplotlib ax
         :param figures: list of matplotlib figures objects
         :param file_names: list of strings
         :param month_day: bool True if the data contains just data for one month, default is False
         """
-        # creates new dataframe for plotting
-        endpoints_df = pd.DataFrame(data={})
-        # add column to dataframe for each endpoint
-        for endpoint in data["endpoint"].unique():
-            endpoints_df[endpoint] = [int(d) for d in data["endpoint"] == endpoint]
-        # adds date_time as column
-        endpoints_df["date_time"] = data["date_time"]
-        # set datetime index
-        endpoints_df = endpoints_df.set_index("date_time")
-        # if True uses daily data points for plotting
-        if month_day:
-            endpoints_df.groupby(
-                [
-                    endpoints_df.index.year,
-                    endpoints_df.index.month,
-                    endpoints_df.index.day,
-                ]
-            ).sum().plot(
-                kind="line",
-                style=".-",
-                ax=ax,
-                ylabel="Number of requests",
-                xlabel="Time period (year, month, day)",
-            )
-        else:
-            endpoints_df.groupby(
-                [endpoints_df.index.year, endpoints_df.index.month]
-            ).sum().plot(
-                kind="line",
-                style=".-",
-                ax=ax,
-                ylabel="Number of requests",
-                xlabel="Time period (year, month)",
-            )
+        self._plot_counts_per_time(counts, ax, month_day)
         ax.set_title("Number of requests per endpoint")
         ax.tick_params("x", labelrotation=350)
         figures.append(fig)
         file_names.append("requests_per_endpoint.pdf")
 
     def _plot_status_codes_per_time(
-        self, data, fig, ax, figures, file_names, month_day=False
+        self, counts, fig, ax, figures, file_names, month_day=False
     ):
         """
         Creates a plot containing information about the number of request having a certain status
         code per time scaled per month or per year depending on the month_day input. Appends
         the created plot to the figures and its name to file names.
 
-        :param data: pandas DataFrame object
+        :param counts: pandas Series object of the counts per day and status code
         :param fig: matplotlib figure object
         :param ax: matplotlib ax
         :param figures: list of matplotlib figures objects
         :param file_names: list of strings
         :param month_day: bool True if the data contains just data for one month, default is False
         """
-        # creates new dataframe for plotting
-        status_codes_df = pd.DataFrame(data={})
-        # add column to dataframe for each status code
-        for status in data["status code"].unique():
-            status_codes_df[status] = [int(d) for d in data["status code"] == status]
-        # adds date_time as column
-        status_codes_df["date_time"] = data["date_time"]
-        # set datetime index
-        status_codes_df = status_codes_df.set_index("date_time")
+        self._plot_counts_per_time(counts, ax, month_day)
+        ax.tick_params("x", labelrotation=350)
+        ax.set_title("Number of status codes from requests")
+        figures.append(fig)
+        file_names.append("status_codes_requests.pdf")
+
+    def _plot_counts_per_time(self, counts, ax, month_day=False):
+        """
+        Plots counts summed up per month or, if month_day is True, per day.
+
+        :param counts: pandas Series object of the counts per day and value
+        :param ax: matplotlib ax
+        :param month_day: bool True if the data contains just data for one month, default is False
+        """
+        # one column of counts per value
+        counts = counts.unstack(fill_value=0)
         # if True uses daily data points for plotting
         if month_day:
-            status_codes_df.groupby(
-                [
-                    status_codes_df.index.year,
-                    status_codes_df.index.month,
-                    status_codes_df.index.day,
-                ]
+            counts.groupby(
+                [counts.index.year, counts.index.month, counts.index.day]
             ).sum().plot(
                 kind="line",
                 style=".-",
@@ -398,33 +785,26 @@ class Command(BaseCommand):
                 xlabel="Time period (year, month, day)",
             )
         else:
-            status_codes_df.groupby(
-                [status_codes_df.index.year, status_codes_df.index.month]
-            ).sum().plot(
+            counts.groupby([counts.index.year, counts.index.month]).sum().plot(
                 kind="line",
                 style=".-",
                 ax=ax,
                 ylabel="Number of requests",
                 xlabel="Time period (year, month)",
             )
-        ax.tick_params("x", labelrotation=350)
-        ax.set_title("Number of status codes from requests")
-        figures.append(fig)
-        file_names.append("status_codes_requests.pdf")
 
-    def _plot_requests_per_remote_site(self, data, fig, ax, figures, file_names):
+    def _plot_requests_per_remote_site(self, counts, fig, ax, figures, file_names):
         """
         Creates a plot containing information about the number of request per remote site.
         Appends the created plot to the figures and its name to file names.
 
-        :param data: pandas DataFrame object
+        :param counts: pandas Series object of the counts per remote site
         :param fig: matplotlib figure object
         :param ax: matplotlib ax
         :param figures: list of matplotlib figures objects
         :param file_names: list of strings
         """
-        # counts requests per remote site
-        data.value_counts().head(15).plot(
+        counts.sort_values(ascending=False).head(15).plot(
             kind="bar", ax=ax, ylabel="Number of requests", xlabel="Remote site"
         )
         ax.set_title("Number of requests per remote site")
@@ -433,7 +813,7 @@ class Command(BaseCommand):
         file_names.append("requests_per_remote_site.pdf")
 
     def _plot_remote_site_per_variant_container(
-        self, data, fig, ax, variant_container, figures, file_names
+        self, counts, fig, ax, variant_container, figures, file_names
     ):
         """
         Creates a plot containing information about the number of request
@@ -442,70 +822,19 @@ class Command(BaseCommand):
         the number of request in percentage. Appends the created plot to
         the figures and its name to file names.
 
-        :param data: pandas DataFrame object
+        :param counts: pandas Series object of the counts per variant container, remote
+         site and user
         :param fig: matplotlib figure object
         :param ax: matplotlib ax
         :param variant_container: string
         :param figures: list of matplotlib figures objects
         :param file_names: list of strings
         """
-        # read in data
-        remote_sites = []
-        variant_containers = []
-        for i in range(0, len(data[variant_container])):
-            for var_container in data[variant_container][i]:
-                variant_containers.append(var_container)
-                remote_sites.append(data["remote site"].loc[i])
-        case_project_data = pd.DataFrame(
-            {
-                "remote site": remote_sites,
-                variant_container: variant_containers,
-            }
-        )
-        if variant_containers:
-            # count data points per remote site
-            table_count_remote_site = case_project_data.pivot_table(
-                index=variant_container, columns="remote site", aggfunc="size"
-            )
-            # get maximum counted remote site and percentage
-            max_remote_site = [
-                table_count_remote_site.columns[
-                    np.argmax(
-                        table_count_remote_site[
-                            table_count_remote_site.index == c
-                        ].max()
-                    )
-                ]
-                for c in table_count_remote_site.index
-            ]
-            max_percentage = sorted(
-                [
-                    round(
-                        table_count_remote_site[table_count_remote_site.index == c]
-                        .max()
-                        .max()
-                        / sum(
-                            table_count_remote_site[
-                                table_count_remote_site.index == c
-                            ].sum()
-                        ),
-                        2,
-                    )
-                    for c in table_count_remote_site.index
-                ],
-                reverse=True,
-            )
-            # get total counts
-            total_call_counts = case_project_data.pivot_table(
-                index=variant_container, aggfunc="size"
-            )
-            # create pivot table for plotting values
-            table = pd.DataFrame(
-                {
-                    "total_call_count": total_call_counts,
-                    "Maximal requesting identifier": max_remote_site,
-                }
-            )
+        if not counts.empty:
+            # get maximum counted remote site, percentage and total counts
+            table = get_top_remote_sites(counts.groupby(level=[0, 1]).sum())
+            max_percentage = sorted(table["percentage"], reverse=True)
+            total_call_counts = table["total_call_count"]
             # sort values and plot top 15
             table.sort_values("total_call_count", ascending=False).pivot_table(
                 index=table.index,
@@ -524,7 +853,7 @@ class Command(BaseCommand):
             rects = ax.patches
             for rect, label, height in zip(
                 rects,
-                [("%s%s" % (round(mp * 100,2), "%")) for mp in max_percentage[:15]],
+                [("%s%s" % (round(mp * 100, 2), "%")) for mp in max_percentage[:15]],
                 sorted(total_call_counts, reverse=True)[:15],
             ):
                 ax.text(
@@ -550,7 +879,7 @@ class Command(BaseCommand):
             )
 
     def _plot_remote_site_user_per_variant_container(
-        self, data, fig, ax, variant_container, figures, file_names
+        self, counts, fig, ax, variant_container, figures, file_names
     ):
         """
         Creates a plot containing information about the number of request
@@ -560,82 +889,19 @@ class Command(BaseCommand):
         percentage. Appends the created plot to the figures and its name to
         file names.
 
-        :param data: pandas DataFrame object
+        :param counts: pandas Series object of the counts per variant container, remote
+         site and user
         :param fig: matplotlib figure object
         :param ax: matplotlib ax
         :param variant_container: string
         :param figures: list of matplotlib figures objects
         :param file_names: list of strings
         """
-        # read in data
-        remote_sites = []
-        variant_containers = []
-        users = []
-        for i in range(0, len(data[variant_container])):
-            for var_container in data[variant_container][i]:
-                variant_containers.append(var_container)
-                remote_sites.append(data["remote site"].loc[i])
-                users.append(data["remote site user"].loc[i])
-        case_project_data = pd.DataFrame(
-            {
-                "remote site": remote_sites,
-                variant_container: variant_containers,
-                "remote site user": users,
-            }
-        )
-        if variant_containers:
-            # count per remote site
-            table_count_remote_site = case_project_data.pivot_table(
-                index=variant_container, columns="remote site", aggfunc="size"
-            )
-            # get maximum count identifier
-            max_remote_site = [
-                table_count_remote_site.columns[
-                    np.argmax(
-                        table_count_remote_site[
-                            table_count_remote_site.index == c
-                        ].max()
-                    )
-                ]
-                for c in table_count_remote_site.index
-            ]
-            # get total counts
-            total_call_counts = case_project_data.pivot_table(
-                index=variant_container, aggfunc="size"
-            )
-            # get counts user per remote site
-            table_count_user = case_project_data.pivot_table(
-                index=[variant_container, "remote site"],
-                columns="remote site user",
-                aggfunc="size",
-            )
-            # get max requesting user per remote site and percentage
-            max_user = [
-                table_count_user.columns[
-                    table_count_user.loc[(case, remote_site)].argmax().max()
-                ]
-                for case, remote_site in zip(total_call_counts.index, max_remote_site)
-            ]
-            max_percentage = sorted(
-                [
-                    round(
-                        table_count_user.loc[(case, remote_site)].max()
-                        / table_count_user.loc[(case, remote_site)].sum(),
-                        2,
-                    )
-                    for case, remote_site in zip(
-                        total_call_counts.index, max_remote_site
-                    )
-                ],
-                reverse=True,
-            )
-            # create pivot table for plotting
-            table = pd.DataFrame(
-                {
-                    "total_call_count": total_call_counts,
-                    "Maximal requesting user per remote site": max_user,
-                }
-            )
+        if not counts.empty:
+            # get max requesting user per remote site, percentage and total counts
+            table = get_top_users(counts)
+            max_percentage = sorted(table["percentage"], reverse=True)
+            total_call_counts = table["total_call_count"]
             # sort table and plot top 15
             table.sort_values("total_call_count", ascending=False).pivot_table(
                 index=table.index,
@@ -681,31 +947,26 @@ class Command(BaseCommand):
                 )
             )
 
-    def _plot_access_limit_per_remote_site(self, data, fig, ax, figures, file_names):
+    def _plot_access_limit_per_remote_site(self, counts, fig, ax, figures, file_names):
         """
         Creates a plot containing information about the number of request per remote site
         comparing status codes indicating how often a remote site tries to exceed its
         access limits. Appends the created plot to the figures and its name to file names.
 
-        :param data: pandas DataFrame object
+        :param counts: pandas Series object of the counts per remote site and status code
         :param fig: matplotlib figure object
         :param ax: matplotlib ax
         :param figures: list of matplotlib figures objects
         :param file_names: list of strings
         """
-        df_idx_remote_sites = data[data["status code"].isin([200, 403])].set_index(
-            "remote site"
-        )
-        if df_idx_remote_sites.empty:
+        if counts.empty:
             self.stdout.write(
                 self.style.WARNING(
                     "WARNING: No data available for plotting information about the access limits per remote site."
                 )
             )
         else:
-            df_idx_remote_sites.groupby(
-                [df_idx_remote_sites.index, "status code"]
-            ).size().head(15).unstack().plot(
+            counts.head(15).unstack().plot(
                 kind="bar",
                 ax=ax,
                 ylabel="Number of requests",
@@ -729,25 +990,21 @@ class Command(BaseCommand):
             figures.append(fig)
             file_names.append("Number_restricted_requests_remote_site.pdf")
 
-    def _plot_table_top_requested_variants(self, data, fig, ax, figures, file_names):
+    def _plot_table_top_requested_variants(self, counts, fig, ax, figures, file_names):
         """
         Creates a plot containing a table with the top ten requested variants.
         Appends the created plot to the figures and its name to file names.
 
-        :param data: pandas DataFrame object
+        :param counts: pandas Series object of the counts per variant
         :param fig: matplotlib figure object
         :param ax: matplotlib ax
         :param figures: list of matplotlib figures objects
         :param file_names: list of strings
         """
-        data["request number"] = np.zeros(data.shape[0], np.int8)
         # create table for plotting
         df_table = (
-            data.groupby(
-                ["chromosome", "start", "end", "reference", "alternative", "release"],
-                as_index=False,
-            )
-            .agg({"request number": pd.Series.count})
+            counts.rename("request number")
+            .reset_index()
             .sort_values("request number", ascending=False)
         )
         if df_table.empty:
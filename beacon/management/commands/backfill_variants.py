@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from beacon.models import Variant
+
+#: Derived fields of the variants by option name, with the Variant method computing them
+BACKFILLS = {
+    "allele_keys": ("allele_key", "set_allele_key"),
+    "bins": ("bin", "set_bin"),
+}
+
+
+class Command(BaseCommand):
+    """
+    Custom command for the admin.
+    """
+
+    help = "Fills derived fields of variants which were stored without them"
+
+    def add_arguments(self, parser):
+        """
+        Adds the arguments of the command.
+
+        :param parser: Argument parser of the command.
+        """
+        parser.add_argument(
+            "--allele_keys",
+            action="store_true",
+            help="Fill the allele keys used for looking up alleles",
+        )
+        parser.add_argument(
+            "--bins",
+            action="store_true",
+            help="Fill the bins used for looking up regions",
+        )
+        parser.add_argument(
+            "--batch_size",
+            type=int,
+            default=10000,
+            help="Number of variants updated in one transaction",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Computes the selected fields of the variants where they are missing, chunk-wise
+        in the order of their ids.
+
+        :param args:
+        :param options:
+        :return: A stdout string if successful.
+        """
+        selected = [name for name in BACKFILLS if options[name]]
+        if not selected:
+            raise CommandError(
+                "Select the fields to fill: %s"
+                % ", ".join("--%s" % name for name in BACKFILLS)
+            )
+        for name in selected:
+            field, method = BACKFILLS[name]
+            variants = Variant.objects.filter(**{"%s__isnull" % field: True}).order_by(
+                "id"
+            )
+            filled = 0
+            last_id = 0
+            while True:
+                chunk = list(variants.filter(id__gt=last_id)[: options["batch_size"]])
+                if not chunk:
+                    break
+                last_id = chunk[-1].id
+                for v in chunk:
+                    getattr(v, method)()
+                with transaction.atomic():
+                    Variant.objects.bulk_update(chunk, [field])
+                filled += len(chunk)
+                self.stdout.write("%d %s filled" % (filled, field))
+            self.stdout.write(
+                self.style.SUCCESS(
+                    "The %s of %d variants were filled." % (field, filled)
+                )
+            )
@@ -0,0 +1,418 @@
+import json
+import random
+import timeit
+import networkx
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from beacon.genotypes import count_variants, pack_allele_counts
+from beacon.hpo import get_ontology
+from beacon.management.commands.analyse_log_entries import (
+    count_per_day,
+    count_variant_containers,
+    get_top_remote_sites,
+    get_top_users,
+)
+from django.core.serializers.json import DjangoJSONEncoder
+from beacon.beacon_schemas import (
+    AlleleResponse,
+    AlleleResponseAccumulation,
+    DatasetResponse,
+    InfoResponse,
+    OrganizationResponse,
+    QueryResponse,
+)
+from beacon.models import Case, Phenotype, Variant
+from beacon.rendering import orjson
+from beacon.variant_accumulation import (
+    AccumulationItem,
+    VariantAccumulator0,
+    VariantAccumulator5,
+    VariantAccumulator10,
+    VariantAccumulator15,
+    VariantAccumulator20,
+    VariantAccumulator25,
+    accumulate_by_level,
+    get_visibility_rule,
+)
+
+
+def benchmark_coarse_phenotypes(size, seed):
+    """
+    Compares computing the coarse terms of random HPO terms by graph traversal with
+    looking them up in the precomputed table.
+
+    :param size: Number of terms to sample.
+    :param seed: Seed of the random sample.
+    :return: dict mapping the name of each variant to a function running it once,
+     list of informational lines
+    """
+    ontology = get_ontology()
+    terms = random.Random(seed).sample(
+        sorted(ontology.graph), min(size, len(ontology.graph))
+    )
+
+    def traversal():
+        for term in terms:
+            coarse_terms = networkx.algorithms.ancestors(
+                ontology.graph, term
+            ).intersection(ontology.coarse_terms)
+            if coarse_terms == set():
+                coarse_terms = {term}
+
+    def lookup():
+        for term in terms:
+            coarse_terms = ontology.coarse_lookup.get(term)
+            if not coarse_terms:
+                coarse_terms = {term}
+
+    return {"traversal": traversal, "lookup": lookup}, []
+
+
+def benchmark_genotypes(size, seed):
+    """
+    Compares counting the alleles of variants of trios from the genotype JSON with
+    counting them from the packed allele counts, one by one and for all variants at once.
+
+    :param size: Number of variants.
+    :param seed: Seed of the random genotypes.
+    :return: dict mapping the name of each variant to a function running it once,
+     list of informational lines
+    """
+    rng = random.Random(seed)
+    pedigree = [
+        {"patient": name, "sex": sex, "affected": 2}
+        for name, sex in (("index", 1), ("father", 1), ("mother", 2))
+    ]
+    case = Case(pedigree=pedigree)
+    json_variants = []
+    packed_variants = []
+    for i in range(size):
+        genotype = {
+            x["patient"]: {"gt": rng.choice(["0/0", "0/1", "1/1"])} for x in pedigree
+        }
+        chromosome = rng.choice([1, 23, 24])
+        json_variants.append(
+            Variant(chromosome=chromosome, case=case, genotype=genotype)
+        )
+        packed_variants.append(
+            Variant(
+                chromosome=chromosome,
+                case=case,
+                allele_counts=pack_allele_counts(genotype, pedigree),
+            )
+        )
+
+    def count(variants):
+        return lambda: [v.get_variant_sample_frequency_count() for v in variants]
+
+    info = [
+        "genotypes json: %.1f bytes per variant"
+        % (sum(len(json.dumps(v.genotype)) for v in json_variants) / size),
+        "genotypes packed: %.1f bytes per variant"
+        % (sum(len(v.allele_counts) for v in packed_variants) / size),
+    ]
+    # the genotype JSON is decoded for every variant read from the database
+    json_texts = [json.dumps(v.genotype) for v in json_variants]
+
+    def count_decoded():
+        for v, text in zip(json_variants, json_texts):
+            v.genotype = json.loads(text)
+            v.get_variant_sample_frequency_count()
+
+    return {
+        "json": count(json_variants),
+        "json_decoded": count_decoded,
+        "packed": count(packed_variants),
+        "json_vectorised": lambda: count_variants(json_variants),
+        "packed_vectorised": lambda: count_variants(packed_variants),
+    }, info
+
+
+def benchmark_accumulation(size, seed):
+    """
+    Compares accumulating the variants of an allele matching many cases with the chain
+    of accumulator classes and with the accumulation engine grouping them by level.
+
+    :param size: Number of matched variants.
+    :param seed: Seed of the random visibility levels and phenotypes.
+    :return: dict mapping the name of each variant to a function running it once,
+     list of informational lines
+    """
+    rng = random.Random(seed)
+    accumulators = {
+        0: VariantAccumulator0,
+        5: VariantAccumulator5,
+        10: VariantAccumulator10,
+        15: VariantAccumulator15,
+        20: VariantAccumulator20,
+    }
+    terms = sorted(get_ontology().graph)
+    matched = []
+    for i in range(size):
+        case = Case(id=i + 1, index="index_%d" % i)
+        # the phenotypes as prefetched by the query endpoint
+        case._prefetched_objects_cache = {
+            "phenotype_set": [
+                Phenotype(case=case, phenotype=rng.choice(terms)) for _ in range(2)
+            ]
+        }
+        variant = Variant(chromosome=1, case=case)
+        counts = (rng.randint(1, 2), 1, 2)
+        matched.append((variant, counts, rng.choice([0, 5, 10, 15, 20, 25])))
+
+    def classes():
+        allele_response = AlleleResponseAccumulation()
+        for variant, counts, level in matched:
+            allele_response.variant = variant
+            allele_response.variant_counts = counts
+            accumulators.get(level, VariantAccumulator25)().accumulate(allele_response)
+
+    def engine():
+        items_by_level = {}
+        for variant, counts, level in matched:
+            rule = get_visibility_rule(level)
+            items_by_level.setdefault(level, []).append(
+                AccumulationItem(
+                    counts,
+                    (
+                        [p.phenotype for p in variant.case.phenotype_set.all()]
+                        if rule.phenotype or rule.coarse_phenotype
+                        else ()
+                    ),
+                    (variant.case.index,) if rule.case_index else (),
+                )
+            )
+        accumulate_by_level(items_by_level)
+
+    return {"classes": classes, "engine": engine}, []
+
+
+def benchmark_responses(size, seed):
+    """
+    Compares rendering an info response and query responses with many case names and
+    phenotypes indented, compactly and with orjson if it is installed.
+
+    :param size: Number of query responses.
+    :param seed: Seed of the random case names and phenotypes.
+    :return: dict mapping the name of each variant to a function running it once,
+     list of informational lines
+    """
+    rng = random.Random(seed)
+    terms = sorted(get_ontology().graph)
+    info_response = InfoResponse(
+        "beacon_id",
+        "beacon",
+        "v1.0",
+        [
+            DatasetResponse(
+                "dataset_id", "dataset", "GRCh37", timezone.now(), timezone.now()
+            ).create_dict()
+        ],
+        OrganizationResponse(
+            "org_id", "organization", "https://example.org"
+        ).create_dict(),
+    )
+    allele_responses = []
+    for _ in range(size):
+        allele_response = AlleleResponse(
+            phenotype={rng.choice(terms) for _ in range(20)},
+            case_indices=["index_%d" % rng.randint(1, 10000) for _ in range(100)],
+        )
+        allele_response.exists = True
+        allele_response.sample_count = rng.randint(1, 100)
+        allele_response.variant_count = rng.randint(1, 100)
+        allele_response.frequency = round(rng.random(), 2)
+        allele_responses.append(allele_response)
+    allele_request = dict(
+        referenceName="1",
+        start="12344",
+        end="12345",
+        referenceBases="C",
+        alternateBases="T",
+        assemblyId="GRCh37",
+    )
+
+    def create_dicts():
+        return [info_response.create_dict()] + [
+            QueryResponse(
+                "beacon_id", "v1.0", allele_request, True, None, [r.create_dict()]
+            ).create_dict()
+            for r in allele_responses
+        ]
+
+    def render(dumps):
+        return lambda: [dumps(data) for data in create_dicts()]
+
+    variants = {
+        "indent": render(
+            lambda data: json.dumps(data, cls=DjangoJSONEncoder, indent=2).encode()
+        ),
+        "compact": render(
+            lambda data: json.dumps(
+                data, cls=DjangoJSONEncoder, separators=(",", ":")
+            ).encode()
+        ),
+    }
+    if orjson is not None:
+        variants["orjson"] = render(orjson.dumps)
+    info = [
+        "responses %s: %.1f bytes per response"
+        % (name, sum(len(x) for x in variant()) / (size + 1))
+        for name, variant in variants.items()
+    ]
+    return variants, info
+
+
+def benchmark_log_plots(size, seed):
+    """
+    Compares counting the requests of a log for the plots of analyse_log_entries with
+    loops over the entries and the variant containers and with vectorised pandas
+    operations.
+
+    :param size: Number of log entries.
+    :param seed: Seed of the random log entries.
+    :return: dict mapping the name of each variant to a function running it once,
+     list of informational lines
+    """
+    rng = np.random.default_rng(seed)
+    remote_sites = np.array(["site_%d" % i for i in range(20)], dtype=object)
+    remote_site_ids = rng.integers(0, len(remote_sites), size)
+    cases = ["case_%d" % i for i in range(max(1, size // 1000))]
+    data = pd.DataFrame(
+        {
+            "date_time": pd.Timestamp("2021-01-01")
+            + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, size), unit="s"),
+            "endpoint": rng.choice(["query", "info"], size),
+            "status code": rng.choice([200, 400, 401, 403], size),
+            "remote site": remote_sites[remote_site_ids],
+            "remote site user": [
+                "%s - user_%d" % (remote_sites[i], j)
+                for i, j in zip(remote_site_ids, rng.integers(0, 5, size))
+            ],
+            "case": [
+                [cases[j] for j in rng.integers(0, len(cases), k)]
+                for k in rng.integers(0, 3, size)
+            ],
+        }
+    )
+
+    def count_per_time(column):
+        indicators = pd.DataFrame(data={})
+        for value in data[column].unique():
+            indicators[value] = [int(d) for d in data[column] == value]
+        indicators["date_time"] = data["date_time"]
+        return indicators.set_index("date_time")
+
+    def explode(columns):
+        rows = []
+        for i in range(0, len(data["case"])):
+            for case in data["case"][i]:
+                rows.append([case] + [data[column].loc[i] for column in columns])
+        return pd.DataFrame(rows, columns=["case"] + columns)
+
+    def loops():
+        count_per_time("endpoint")
+        count_per_time("status code")
+        counts = explode(["remote site"]).groupby(["case", "remote site"]).size()
+        table = counts.unstack()
+        [table.columns[np.argmax(table[table.index == c].max())] for c in table.index]
+        [
+            round(
+                table[table.index == c].max().max()
+                / sum(table[table.index == c].sum()),
+                2,
+            )
+            for c in table.index
+        ]
+        counts = (
+            explode(["remote site", "remote site user"])
+            .groupby(["case", "remote site", "remote site user"])
+            .size()
+        )
+        table = counts.groupby(level=[0, 1]).sum().unstack()
+        max_remote_site = [
+            table.columns[np.argmax(table[table.index == c].max())] for c in table.index
+        ]
+        table_count_user = counts.unstack(level=2)
+        for case, remote_site in zip(table.index, max_remote_site):
+            table_count_user.columns[
+                table_count_user.loc[(case, remote_site)].argmax().max()
+            ]
+            round(
+                table_count_user.loc[(case, remote_site)].max()
+                / table_count_user.loc[(case, remote_site)].sum(),
+                2,
+            )
+
+    def vectorised():
+        count_per_day(data, "endpoint")
+        count_per_day(data, "status code")
+        get_top_remote_sites(count_variant_containers(data, "case", ["remote site"]))
+        get_top_users(
+            count_variant_containers(data, "case", ["remote site", "remote site user"])
+        )
+
+    return {"loops": loops, "vectorised": vectorised}, [
+        "log_plots: %d cases, %d remote sites" % (len(cases), len(remote_sites))
+    ]
+
+
+#: Benchmark targets by name
+TARGETS = {
+    "accumulation": benchmark_accumulation,
+    "coarse_phenotypes": benchmark_coarse_phenotypes,
+    "genotypes": benchmark_genotypes,
+    "log_plots": benchmark_log_plots,
+    "responses": benchmark_responses,
+}
+
+
+class Command(BaseCommand):
+    """
+    Custom command for the admin.
+    """
+
+    help = "Times the alternative implementations of performance critical code paths"
+
+    def add_arguments(self, parser):
+        """
+        Adds the arguments of the command.
+
+        :param parser: Argument parser of the command.
+        """
+        parser.add_argument(
+            "--target",
+            choices=sorted(TARGETS),
+            default="coarse_phenotypes",
+            help="Code path to benchmark",
+        )
+        parser.add_argument(
+            "--size", type=int, default=1000, help="Number of inputs per run"
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Number of timed runs"
+        )
+        parser.add_argument(
+            "--seed", type=int, default=100, help="Seed of the random inputs"
+        )
+
+    def handle(self, *args, **options):
+        """
+        Runs every variant of the target repeatedly and writes the best time of each.
+
+        :param args:
+        :param options:
+        :return: A stdout string if successful.
+        """
+        variants, info = TARGETS[options["target"]](options["size"], options["seed"])
+        for line in info:
+            self.stdout.write(line)
+        for name, variant in variants.items():
+            best = min(timeit.repeat(variant, number=1, repeat=options["repeat"]))
+            self.stdout.write(
+                "%s %s: %.3f ms for %d inputs"
+                % (options["target"], name, best * 1000, options["size"])
+            )
+        return self.stdout.write(self.style.SUCCESS("The benchmark is finished."))
@@ -0,0 +1,214 @@
+import random
+import timeit
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from beacon.allele_summary import rebuild_allele_summaries
+from beacon.binning import get_overlapping_bins
+from beacon.models import Case, Project, Variant
+
+#: Title of the project containing the synthetic cases
+SYNTHETIC_PROJECT = "synthetic"
+
+
+def populate(size, cases, seed, batch_size=10000):
+    """
+    Inserts synthetic variants of trios into the synthetic project. Meant for a scratch
+    database only.
+
+    :param size: Number of variants.
+    :param cases: Number of cases sharing the variants.
+    :param seed: Seed of the random variants.
+    :param batch_size: Number of variants inserted in one transaction.
+    """
+    rng = random.Random(seed)
+    project, _ = Project.objects.get_or_create(title=SYNTHETIC_PROJECT)
+    offset = Case.objects.filter(project=project).count()
+    case_ids = []
+    for i in range(offset, offset + cases):
+        pedigree = [
+            {"patient": "%s_%d_%s" % (SYNTHETIC_PROJECT, i, member), "sex": sex}
+            for member, sex in (("index", 1), ("father", 1), ("mother", 2))
+        ]
+        case = Case.objects.create(
+            project=project,
+            name="%s_%d" % (SYNTHETIC_PROJECT, i),
+            index=pedigree[0]["patient"],
+            pedigree=pedigree,
+        )
+        case_ids.append(case.id)
+    for i in range(0, size, batch_size):
+        variants = []
+        for _ in range(min(batch_size, size - i)):
+            start = rng.randint(1, 250000000)
+            reference = rng.choice("ACGT")
+            variant = Variant(
+                release="GRCh37",
+                chromosome=rng.randint(1, 24),
+                start=start,
+                end=start,
+                reference=reference,
+                alternative=rng.choice([b for b in "ACGT" if b != reference]),
+                case_id=rng.choice(case_ids),
+                allele_counts=bytes(rng.choice([0, 1, 2]) for _ in range(3)),
+            )
+            variant.set_allele_key()
+            variant.set_bin()
+            variants.append(variant)
+        with transaction.atomic():
+            Variant.objects.bulk_create(variants)
+
+
+def sample_alleles(size, seed):
+    """
+    Samples alleles of stored variants.
+
+    :param size: Number of alleles.
+    :param seed: Seed of the random sample.
+    :return: list of (release, chromosome, start, end, reference, alternative) tuples
+    """
+    rng = random.Random(seed)
+    ids = Variant.objects.order_by("id").values_list("id", flat=True)
+    first, last = ids.first(), ids.last()
+    if first is None:
+        return []
+    return list(
+        Variant.objects.filter(
+            id__in=[rng.randint(first, last) for _ in range(size)]
+        ).values_list(
+            "release", "chromosome", "start", "end", "reference", "alternative"
+        )
+    )
+
+
+def get_queries(alleles, project_ids):
+    """
+    Builds the representative allele and region queries of the query endpoint.
+
+    :param alleles: A list of (release, chromosome, start, end, reference, alternative) tuples.
+    :param project_ids: The ids of the visible projects.
+    :return: dict mapping the name of each query to a QuerySet
+    """
+    release, chromosome, start, end, reference, alternative = alleles[0]
+    allele_keys = sorted({Variant.get_allele_key(*allele) for allele in alleles})
+    # a region of 100 kb around the first allele
+    region_start, region_end = max(1, start - 50000), start + 50000
+    return {
+        # the lookup used before the allele keys
+        "coordinates": Variant.objects.filter(
+            release=release,
+            chromosome=chromosome,
+            start=start,
+            end=end,
+            reference=reference,
+            alternative=alternative,
+            case__project_id__in=project_ids,
+        ).select_related("case__project"),
+        "coordinates_batch": Variant.objects.filter(
+            release__in={allele[0] for allele in alleles},
+            chromosome__in={allele[1] for allele in alleles},
+            start__in=sorted({allele[2] for allele in alleles}),
+            case__project_id__in=project_ids,
+        ).select_related("case__project"),
+        "allele_key": Variant.objects.filter(
+            allele_key=Variant.get_allele_key(*alleles[0]),
+            case__project_id__in=project_ids,
+        ).select_related("case"),
+        # including the variants without allele key like the query endpoint
+        "allele_key_batch": Variant.objects.filter(
+            Q(allele_key__in=allele_keys)
+            | Q(
+                allele_key__isnull=True,
+                release__in={allele[0] for allele in alleles},
+                chromosome__in={allele[1] for allele in alleles},
+                start__in={allele[2] for allele in alleles},
+            ),
+            case__project_id__in=project_ids,
+        ).select_related("case"),
+        "region": Variant.objects.filter(
+            bin__in=get_overlapping_bins(region_start, region_end),
+            release=release,
+            chromosome=chromosome,
+            start__lte=region_end,
+            end__gte=region_start,
+            case__project_id__in=project_ids,
+        ).select_related("case"),
+    }
+
+
+class Command(BaseCommand):
+    """
+    Custom command for the admin.
+    """
+
+    help = (
+        "Prints the query plans and timings of the allele lookups of the query endpoint"
+    )
+
+    def add_arguments(self, parser):
+        """
+        Adds the arguments of the command.
+
+        :param parser: Argument parser of the command.
+        """
+        parser.add_argument(
+            "--populate",
+            type=int,
+            default=0,
+            help="Number of synthetic variants inserted first, only for a scratch database",
+        )
+        parser.add_argument(
+            "--cases", type=int, default=100, help="Number of synthetic cases"
+        )
+        parser.add_argument(
+            "--alleles",
+            type=int,
+            default=100,
+            help="Number of alleles looked up by the batch query",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Number of timed runs"
+        )
+        parser.add_argument(
+            "--seed", type=int, default=100, help="Seed of the random inputs"
+        )
+
+    def handle(self, *args, **options):
+        """
+        Writes the plan of the database and the best time of each query.
+
+        :param args:
+        :param options:
+        :return: A stdout string if successful.
+        """
+        if options["populate"]:
+            populate(options["populate"], options["cases"], options["seed"])
+            # the bulk inserted variants send no signals updating the summaries
+            if settings.BEACON_QUERY_BACKEND == "allele_summaries":
+                rebuild_allele_summaries()
+        alleles = sample_alleles(options["alleles"], options["seed"])
+        if not alleles:
+            raise CommandError("There are no variants to look up.")
+        project_ids = list(Project.objects.values_list("id", flat=True))
+        self.stdout.write("%d variants" % Variant.objects.count())
+        for name, queryset in get_queries(alleles, project_ids).items():
+            sql = str(queryset.query)
+            best = min(
+                timeit.repeat(
+                    lambda: list(queryset.all()), number=1, repeat=options["repeat"]
+                )
+            )
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(sql)
+            self.stdout.write(queryset.explain())
+            self.stdout.write(
+                "%s: %.3f ms, DISTINCT: %s, joins: %d"
+                % (
+                    name,
+                    best * 1000,
+                    "yes" if queryset.query.distinct else "no",
+                    sql.count(" JOIN "),
+                )
+            )
+        return self.stdout.write(self.style.SUCCESS("The queries were explained."))
@@ -0,0 +1,359 @@
+import glob
+import multiprocessing
+import os
+import time
+from queue import Empty
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from beacon.allele_summary import rebuild_allele_summaries
+from beacon.models import Case, Variant
+from beacon.vcf import VARIANT_FIELDS, VcfReader, get_variant_key
+
+#: Arguments of the worker processes set by _init_worker
+_worker_options = {}
+
+#: Seconds waited for a message of the workers before checking if they are alive
+WORKER_TIMEOUT = 1
+
+
+def _init_worker(queue, cases, release, batch_size, packed):
+    """
+    Initializes a worker process parsing VCF files.
+
+    :param queue: A multiprocessing Queue receiving the messages of the worker.
+    :param cases: A list of (case id, list of sample names of the pedigree) tuples.
+    :param release: The genome build of the files.
+    :param batch_size: Maximal number of variants per batch.
+    :param packed: Store only the packed allele counts of the variants.
+    """
+    django.setup()
+    _worker_options.update(
+        queue=queue,
+        cases=cases,
+        release=release,
+        batch_size=batch_size,
+        packed=packed,
+    )
+
+
+def _parse_file_in_worker(path):
+    """
+    Parses a VCF file in a worker process and passes the messages to the writer. The
+    writer is told which process parses the file first, so that it notices if the
+    process dies.
+
+    :param path: Path of the VCF file.
+    """
+    _worker_options["queue"].put(("start", os.getpid(), path))
+    for message in _parse_file(
+        path,
+        _worker_options["cases"],
+        _worker_options["release"],
+        _worker_options["batch_size"],
+        _worker_options["packed"],
+    ):
+        _worker_options["queue"].put(message)
+
+
+def _parse_file(path, cases, release, batch_size, packed):
+    """
+    Parses a VCF file without accessing the database.
+
+    :param path: Path of the VCF file.
+    :param cases: A list of (case id, list of sample names of the pedigree) tuples.
+    :param release: The genome build of the file.
+    :param batch_size: Maximal number of variants per batch.
+    :param packed: Store only the packed allele counts of the variants.
+    :return: generator of ("batch", list of tuples of the VARIANT_FIELDS values) tuples
+     followed by one ("done", process id, path, seconds, number of records, list of
+     the matched case ids, list of the unmatched sample names) or ("error", path,
+     error message) tuple
+    """
+    start_time = time.monotonic()
+    reader = VcfReader(path, cases, release, packed)
+    try:
+        for batch in reader.read_batches(batch_size):
+            yield (
+                "batch",
+                [tuple(getattr(v, field) for field in VARIANT_FIELDS) for v in batch],
+            )
+    except (OSError, ValueError) as e:
+        yield ("error", path, str(e))
+        return
+    except Exception as e:  # the writer must not wait for the result of the file
+        yield ("error", path, "%s: %s" % (type(e).__name__, e))
+        return
+    # only the results are passed back to the writer, not the reader with its cases
+    yield (
+        "done",
+        os.getpid(),
+        path,
+        time.monotonic() - start_time,
+        reader.records,
+        [case_id for case_id, _ in reader.matched_cases],
+        reader.unmatched_samples,
+    )
+
+
+def _is_alive(pid):
+    """
+    Checks if a process is running.
+
+    :param pid: Process id.
+    :return: bool: True if the process is running, False otherwise
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    """
+    Custom command for the admin.
+    """
+
+    help = "Imports the variants of the cases whose samples are contained in VCF files"
+
+    def add_arguments(self, parser):
+        """
+        Adds the arguments of the command.
+
+        :param parser: Argument parser of the command.
+        """
+        parser.add_argument(
+            "path",
+            type=str,
+            help="Path of a (gzipped) VCF file, a directory or a glob pattern of files",
+        )
+        parser.add_argument(
+            "--release", type=str, default="GRCh37", help="Genome build of the files"
+        )
+        parser.add_argument(
+            "--batch_size",
+            type=int,
+            default=10000,
+            help="Number of variants inserted in one transaction",
+        )
+        parser.add_argument(
+            "--packed",
+            action="store_true",
+            help="Store only the packed allele counts instead of the genotype JSON",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=1,
+            help="Number of processes parsing files, the variants are inserted by the main process",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Streams the records of the VCF files and inserts the variants of the cases
+        chunk-wise. With several jobs the files are parsed in a process pool and the
+        parsed batches are inserted one after another by this process. Variants which
+        already exist for a case are skipped, so the import of a file can be repeated.
+
+        :param args:
+        :param options:
+        :return: A stdout string if successful.
+        """
+        paths = self._find_files(options["path"])
+        cases = [
+            (case_id, [x["patient"] for x in pedigree])
+            for case_id, pedigree in Case.objects.values_list("id", "pedigree")
+        ]
+        parse_options = (
+            cases,
+            options["release"],
+            options["batch_size"],
+            options["packed"],
+        )
+        self.records = 0
+        self.created = 0
+        self.skipped = 0
+        self.matched_cases = set()
+        self.workers = {}
+        self.errors = []
+        self.start_time = time.monotonic()
+        if options["jobs"] > 1 and len(paths) > 1:
+            ctx = multiprocessing.get_context()
+            queue = ctx.Queue(maxsize=2 * options["jobs"])
+            # the workers must not share the connections of this process
+            connections.close_all()
+            with ctx.Pool(
+                options["jobs"],
+                initializer=_init_worker,
+                initargs=(queue,) + parse_options,
+            ) as pool:
+                result = pool.map_async(_parse_file_in_worker, paths)
+                self._receive_messages(queue, result, len(paths))
+        else:
+            for path in paths:
+                for message in _parse_file(path, *parse_options):
+                    self._handle_message(message)
+        self._report_workers()
+        if self.created and settings.BEACON_QUERY_BACKEND == "allele_summaries":
+            rebuild_allele_summaries()
+        if self.errors:
+            raise CommandError("\n".join(self.errors))
+        return self.stdout.write(
+            self.style.SUCCESS(
+                "%d variants of %d cases were imported from %d records of %d files, %d variants already existed."
+                % (
+                    self.created,
+                    len(self.matched_cases),
+                    self.records,
+                    len(paths),
+                    self.skipped,
+                )
+            )
+        )
+
+    def _find_files(self, path):
+        """
+        Finds the VCF files to be imported.
+
+        :param path: Path of a file, a directory or a glob pattern.
+        :return: sorted list of file paths
+        """
+        if os.path.isdir(path):
+            paths = glob.glob(os.path.join(path, "*.vcf")) + glob.glob(
+                os.path.join(path, "*.vcf.gz")
+            )
+        else:
+            paths = glob.glob(path)
+        if not paths:
+            raise CommandError("No VCF files were found at %s." % path)
+        return sorted(paths)
+
+    def _receive_messages(self, queue, result, pending):
+        """
+        Handles the messages of the workers until all files are finished. A file whose
+        worker died or stopped without sending its result is reported as error instead
+        of waiting for it forever.
+
+        :param queue: A multiprocessing Queue receiving the messages of the workers.
+        :param result: The AsyncResult object of the parsed files.
+        :param pending: Number of files.
+        """
+        parsing = {}
+        while pending:
+            finished = result.ready()
+            try:
+                message = queue.get(timeout=WORKER_TIMEOUT)
+            except Empty:
+                for path, pid in list(parsing.items()):
+                    if finished or not _is_alive(pid):
+                        del parsing[path]
+                        self.errors.append(
+                            "%s: The worker process %d stopped." % (path, pid)
+                        )
+                        pending -= 1
+                if finished and pending:
+                    # raises the error of the pool if there is one
+                    result.get()
+                    raise CommandError("The worker processes stopped.")
+                continue
+            if message[0] == "start":
+                parsing[message[2]] = message[1]
+            elif self._handle_message(message):
+                parsing.pop(message[1] if message[0] == "error" else message[2], None)
+                pending -= 1
+        if result.ready():
+            result.get()
+
+    def _handle_message(self, message):
+        """
+        Inserts a parsed batch or records the result of a parsed file.
+
+        :param message: A tuple generated by _parse_file.
+        :return: True if a file is finished
+        """
+        if message[0] == "batch":
+            self._write(
+                [Variant(**dict(zip(VARIANT_FIELDS, values))) for values in message[1]]
+            )
+            self._report_progress()
+            return False
+        if message[0] == "error":
+            self.errors.append("%s: %s" % message[1:])
+            return True
+        _, pid, path, seconds, records, case_ids, unmatched_samples = message
+        self.records += records
+        self.matched_cases.update(case_ids)
+        if unmatched_samples:
+            self.stdout.write(
+                self.style.WARNING(
+                    "The samples %s of %s are not part of any case."
+                    % (", ".join(unmatched_samples), path)
+                )
+            )
+        worker = self.workers.setdefault(pid, [0, 0, 0.0])
+        worker[0] += 1
+        worker[1] += records
+        worker[2] += seconds
+        return True
+
+    def _write(self, variants):
+        """
+        Inserts the variants which do not already exist in one transaction.
+
+        :param variants: A list of unsaved Variant objects.
+        """
+        new_variants = {}
+        for v in variants:
+            new_variants.setdefault(get_variant_key(v), v)
+        with transaction.atomic():
+            existing = set()
+            # the records are sorted by position, so the existing variants are
+            # looked up by the range of positions per chromosome
+            for chromosome in {v.chromosome for v in new_variants.values()}:
+                starts = [
+                    v.start for v in new_variants.values() if v.chromosome == chromosome
+                ]
+                existing.update(
+                    Variant.objects.filter(
+                        case_id__in={v.case_id for v in new_variants.values()},
+                        chromosome=chromosome,
+                        start__gte=min(starts),
+                        start__lte=max(starts),
+                    ).values_list(
+                        "case_id",
+                        "release",
+                        "chromosome",
+                        "start",
+                        "end",
+                        "reference",
+                        "alternative",
+                    )
+                )
+            Variant.objects.bulk_create(
+                [v for key, v in new_variants.items() if key not in existing]
+            )
+        created = len(new_variants.keys() - existing)
+        self.created += created
+        self.skipped += len(variants) - created
+
+    def _report_progress(self):
+        """
+        Writes the number of inserted variants and the throughput.
+        """
+        seconds = time.monotonic() - self.start_time
+        self.stdout.write(
+            "%d variants imported (%.0f variants/s)"
+            % (self.created, self.created / seconds if seconds else 0)
+        )
+
+    def _report_workers(self):
+        """
+        Writes the number of parsed files and records and the throughput per process.
+        """
+        for pid, (files, records, seconds) in sorted(self.workers.items()):
+            self.stdout.write(
+                "Process %d parsed %d files with %d records (%.0f records/s)"
+                % (pid, files, records, records / seconds if seconds else 0)
+            )
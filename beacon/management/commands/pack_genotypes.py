@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from beacon.models import Variant
+
+
+class Command(BaseCommand):
+    """
+    Custom command for the admin.
+    """
+
+    help = (
+        "Packs the allele counts of the genotype information of the variants into bytes"
+    )
+
+    def add_arguments(self, parser):
+        """
+        Adds the arguments of the command.
+
+        :param parser: Argument parser of the command.
+        """
+        parser.add_argument(
+            "--batch_size",
+            type=int,
+            default=10000,
+            help="Number of variants updated in one transaction",
+        )
+        parser.add_argument(
+            "--drop_json",
+            action="store_true",
+            help="Remove the genotype JSON of the packed variants",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Fills allele_counts of the variants which only have the genotype JSON, chunk-wise
+        in the order of their ids. Variants whose genotype does not contain all samples
+        of the pedigree are skipped.
+
+        :param args:
+        :param options:
+        :return: A stdout string if successful.
+        """
+        fields = ["allele_counts"] + (["genotype"] if options["drop_json"] else [])
+        variants = (
+            Variant.objects.filter(allele_counts__isnull=True, genotype__isnull=False)
+            .select_related("case")
+            .order_by("id")
+        )
+        packed = 0
+        skipped = 0
+        last_id = 0
+        while True:
+            chunk = list(variants.filter(id__gt=last_id)[: options["batch_size"]])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            updated = []
+            for v in chunk:
+                try:
+                    v.pack_genotype()
+                except KeyError:
+                    skipped += 1
+                    continue
+                if options["drop_json"]:
+                    v.genotype = None
+                updated.append(v)
+            with transaction.atomic():
+                Variant.objects.bulk_update(updated, fields)
+            packed += len(updated)
+            self.stdout.write("%d variants packed" % packed)
+        return self.stdout.write(
+            self.style.SUCCESS(
+                "%d variants were packed, %d variants with incomplete genotypes were skipped."
+                % (packed, skipped)
+            )
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from beacon.access_counter import get_access_counter
+from beacon.models import LogEntry
+
+
+class Command(BaseCommand):
+    """
+    Custom command for the admin.
+    """
+
+    help = "Rebuilds the daily request counters of the remote sites from the logged requests"
+
+    def handle(self, *args, **options):
+        """
+        Counts the logged requests per remote site and day and replaces the
+        counters of the configured access counter backend.
+
+        :param args:
+        :param options:
+        :return: A stdout string if successful.
+        """
+        counts = {
+            (c["remote_site_id"], c["day"]): c["count"]
+            for c in LogEntry.objects.filter(remote_site__isnull=False)
+            .annotate(day=TruncDate("date_time"))
+            .values("remote_site_id", "day")
+            .annotate(count=Count("id"))
+            .order_by()
+        }
+        get_access_counter().rebuild(counts)
+        return self.stdout.write(
+            self.style.SUCCESS(
+                "The access counters were rebuilt from %d logged requests."
+                % sum(counts.values())
+            )
+        )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from beacon.allele_summary import rebuild_allele_summaries
+
+
+class Command(BaseCommand):
+    """
+    Custom command for the admin.
+    """
+
+    help = "Rebuilds the per project allele summaries from all variants"
+
+    def add_arguments(self, parser):
+        """
+        Adds the arguments of the command.
+
+        :param parser: Argument parser of the command.
+        """
+        parser.add_argument(
+            "--batch_size",
+            type=int,
+            default=1000,
+            help="Number of summaries inserted at once",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Replaces all allele summaries by summing up the variants of each allele and project.
+
+        :param args:
+        :param options:
+        :return: A stdout string if successful.
+        """
+        count = rebuild_allele_summaries(options["batch_size"])
+        return self.stdout.write(
+            self.style.SUCCESS("%d allele summaries were rebuilt." % count)
+        )
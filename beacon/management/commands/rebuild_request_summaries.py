@@ -0,0 +1,51 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from beacon.request_summary import rebuild_request_summaries
+
+
+class Command(BaseCommand):
+    """
+    Custom command for the admin.
+    """
+
+    help = "Rebuilds the daily request summaries from the logged requests"
+
+    def add_arguments(self, parser):
+        """
+        Adds the arguments of the command.
+
+        :param parser: Argument parser of the command.
+        """
+        parser.add_argument(
+            "--since",
+            type=str,
+            help="First day rebuilt like '2021-05-03', by default all days are rebuilt",
+        )
+        parser.add_argument(
+            "--batch_size",
+            type=int,
+            default=1000,
+            help="Number of summaries inserted at once",
+        )
+
+    def handle(self, *args, **options):
+        """
+        Replaces the request summaries by counting the logged requests per day, remote
+        site, endpoint and status code and per day and requested allele.
+
+        :param args:
+        :param options:
+        :return: A stdout string if successful.
+        """
+        since = None
+        if options["since"]:
+            try:
+                since = datetime.date.fromisoformat(options["since"])
+            except ValueError:
+                raise CommandError("The day %s is invalid." % options["since"])
+        count = rebuild_request_summaries(since, options["batch_size"])
+        return self.stdout.write(
+            self.style.SUCCESS(
+                "The request summaries were rebuilt from %d logged requests." % count
+            )
+        )
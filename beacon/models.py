@@ -1,6 +1,8 @@
+import hashlib
 from django.db import models
-import networkx
-from mysite.settings import HPO_COARSE_TERMS, HPO_GRAPH
+from .binning import get_bin
+from .genotypes import count_alleles, pack_allele_counts
+from .hpo import get_ontology
 
 
 class Project(models.Model):
@@ -86,8 +88,14 @@ class Variant(models.Model):
         on_delete=models.CASCADE,
         help_text="Case to which this variant belongs.",
     )
-    #: Genotype information as JSONB
-    genotype = models.JSONField()
+    #: Genotype information as JSONB, None if only the packed allele counts are stored
+    genotype = models.JSONField(blank=True, null=True)
+    #: Number of alternative alleles of each sample, one byte per sample ordered by pedigree position
+    allele_counts = models.BinaryField(blank=True, null=True)
+    #: 64 bit hash of the variant coordinates for looking up alleles with a compact index
+    allele_key = models.BigIntegerField(blank=True, null=True)
+    #: Bin of the UCSC binning scheme containing the variant for looking up regions
+    bin = models.IntegerField(blank=True, null=True)
 
     class Meta:
         indexes = [
@@ -100,15 +108,65 @@ class Variant(models.Model):
                     "reference",
                     "alternative",
                 ]
-            )
+            ),
+            models.Index(fields=["allele_key", "case"]),
+            models.Index(fields=["release", "chromosome", "bin", "start"]),
         ]
 
+    @staticmethod
+    def get_allele_key(release, chromosome, start, end, reference, alternative):
+        """
+        Hashes the variant coordinates to a signed 64 bit integer. Different alleles
+        may share a key, so the coordinates of the found variants must be compared.
+
+        :param release: Genome build string.
+        :param chromosome: Chromosome value integer.
+        :param start: 1-based start position integer.
+        :param end: End position integer.
+        :param reference: Reference bases string.
+        :param alternative: Alternate bases string.
+        :return: allele key integer
+        """
+        coordinates = "%s:%d:%d:%d:%s:%s" % (
+            release,
+            int(chromosome),
+            int(start),
+            int(end),
+            reference,
+            alternative,
+        )
+        digest = hashlib.blake2b(coordinates.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big", signed=True)
+
+    def set_allele_key(self):
+        """
+        Sets allele_key from the variant coordinates.
+        """
+        self.allele_key = Variant.get_allele_key(
+            self.release,
+            self.chromosome,
+            self.start,
+            self.end,
+            self.reference,
+            self.alternative,
+        )
+
+    def set_bin(self):
+        """
+        Sets bin from the variant position.
+        """
+        self.bin = get_bin(self.start, self.end)
+
     def get_variant_sample_frequency_count(self):
         """
         Counts the alleles, samples and total number of alleles for the frequency.
 
         :return: integer of number of alleles, samples and total numbers of alleles
         """
+        if self.allele_counts is not None:
+            return count_alleles(
+                self.allele_counts, self.case.pedigree, self.chromosome
+            )
         c_variant = 0
         c_sample = 0
         c_frequency = 0
@@ -125,6 +183,12 @@ class Variant(models.Model):
                     c_frequency += 2
         return c_variant, c_sample, c_frequency
 
+    def pack_genotype(self):
+        """
+        Stores the allele counts of the genotype information packed in allele_counts.
+        """
+        self.allele_counts = pack_allele_counts(self.genotype, self.case.pedigree)
+
 
 class Phenotype(models.Model):
     """
@@ -151,16 +215,13 @@ class Phenotype(models.Model):
 
         :return: Set of phenotype terms
         """
-        # get already created graph for HPO (Human Phenotype Ontology)
-        # intersect with ancestor nodes from phenotype
-        coarse_phenotypes = networkx.algorithms.ancestors(
-            HPO_GRAPH, self.phenotype
-        ).intersection(HPO_COARSE_TERMS)
+        # look up the precomputed coarse terms of the phenotype
+        coarse_phenotypes = get_ontology().coarse_lookup.get(self.phenotype)
         # if phenotype is already a coarse term
-        if coarse_phenotypes == set():
+        if not coarse_phenotypes:
             return {self.phenotype}
         else:
-            return coarse_phenotypes
+            return set(coarse_phenotypes)
 
 
 class Consortium(models.Model):
@@ -221,8 +282,8 @@ class LogEntry(models.Model):
         on_delete=models.CASCADE,
         help_text="Remote site to which the client belongs to.",
     )
-    #: Date and time of request
-    date_time = models.DateTimeField()
+    #: Date and time of request, indexed for reading the entries of recent days
+    date_time = models.DateTimeField(db_index=True)
     #: Request method
     method = models.CharField(max_length=255)
     #: Requested endpoint
@@ -307,3 +368,157 @@ class MetadataBeaconDataset(models.Model):
         on_delete=models.CASCADE,
         help_text="Beacon which this dataset " "contains.",
     )
+
+
+class AccessCounter(models.Model):
+    """
+    The number of logged requests of a remote site per day used for checking its access limit.
+    """
+
+    #: The counted remote site
+    remote_site = models.ForeignKey(
+        RemoteSite,
+        on_delete=models.CASCADE,
+        help_text="Remote site to which the requests belong to.",
+    )
+    #: Day of the requests
+    date = models.DateField()
+    #: Number of requests
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["remote_site", "date"], name="unique_access_counter"
+            )
+        ]
+
+
+class RequestSummary(models.Model):
+    """
+    The number of logged requests per day, remote site, endpoint and status code, which is
+    read for statistics instead of the LogEntry objects.
+    """
+
+    #: Day of the requests
+    date = models.DateField()
+    #: The requesting remote site, None for unknown clients
+    remote_site = models.ForeignKey(
+        RemoteSite,
+        null=True,
+        on_delete=models.CASCADE,
+        help_text="Remote site to which the requests belong to.",
+    )
+    #: Requested endpoint
+    endpoint = models.CharField(max_length=255)
+    #: Status code
+    status_code = models.IntegerField()
+    #: Number of requests
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "remote_site", "endpoint", "status_code"],
+                name="unique_request_summary",
+            ),
+            # NULL values are distinct in the constraint above
+            models.UniqueConstraint(
+                fields=["date", "endpoint", "status_code"],
+                condition=models.Q(remote_site__isnull=True),
+                name="unique_request_summary_unknown_remote_site",
+            ),
+        ]
+
+
+class VariantRequestSummary(models.Model):
+    """
+    The number of valid requests of the query endpoint per day and requested allele.
+    """
+
+    #: Day of the requests
+    date = models.DateField()
+    #: Requested genome build
+    release = models.CharField(max_length=32)
+    #: Requested variant coordinates, the reference chromosome
+    chromosome = models.CharField(max_length=255)
+    #: Requested variant coordinates, the 0-based start position
+    start = models.IntegerField()
+    #: Requested variant coordinates, the end position
+    end = models.IntegerField()
+    #: Requested variant coordinates, the reference base
+    reference = models.CharField(max_length=512)
+    #: Requested variant coordinates, the alternate base
+    alternative = models.CharField(max_length=512)
+    #: Number of requests
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    "date",
+                    "release",
+                    "chromosome",
+                    "start",
+                    "end",
+                    "reference",
+                    "alternative",
+                ],
+                name="unique_variant_request_summary",
+            )
+        ]
+
+
+class AlleleSummary(models.Model):
+    """
+    The variants of an allele in a project summed up for answering queries without
+    reading the genotypes of each case.
+    """
+
+    #: Genome build
+    release = models.CharField(max_length=32)
+    #: Variant coordinates, the reference chromosome
+    chromosome = models.IntegerField(choices=Variant.CHROMOSOME_CHOICES)
+    #: Variant coordinates, the 1-based start position
+    start = models.IntegerField()
+    #: Variant coordinates, the end position
+    end = models.IntegerField()
+    #: Variant coordinates, the reference base
+    reference = models.CharField(max_length=512)
+    #: Variant coordinates, the alternate base
+    alternative = models.CharField(max_length=512)
+    #: Project containing the summed up variants
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        help_text="Project to which the variants belong.",
+    )
+    #: Number of alleles
+    variant_count = models.IntegerField(default=0)
+    #: Number of samples carrying the allele
+    sample_count = models.IntegerField(default=0)
+    #: Total number of alleles of the samples for the frequency
+    frequency_count = models.IntegerField(default=0)
+    #: Cases with the variant
+    cases = models.ManyToManyField(
+        Case, blank=True, help_text="Cases with the variant."
+    )
+    #: Sorted list of the HPO terms of the cases
+    phenotypes = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    "release",
+                    "chromosome",
+                    "start",
+                    "end",
+                    "reference",
+                    "alternative",
+                    "project",
+                ],
+                name="unique_allele_summary",
+            )
+        ]
@@ -0,0 +1,61 @@
+import json
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # the encoder of the standard library is used instead
+    orjson = None
+
+
+def get_json_dumps_params():
+    """
+    Returns the parameters of json.dumps rendering JSON indented by BEACON_JSON_INDENT
+    spaces or, if it is None, compactly without spaces after the separators.
+
+    :return: dict of keyword arguments
+    """
+    if settings.BEACON_JSON_INDENT:
+        return {"indent": settings.BEACON_JSON_INDENT}
+    return {"separators": (",", ":")}
+
+
+def use_orjson():
+    """
+    Checks if the responses are rendered with orjson, which requires the package to be
+    installed, the setting BEACON_JSON_ENCODER to be "orjson" and an indentation
+    supported by orjson.
+
+    :return: bool: True if orjson is used, False otherwise
+    """
+    return (
+        orjson is not None
+        and settings.BEACON_JSON_ENCODER == "orjson"
+        and settings.BEACON_JSON_INDENT in (None, 2)
+    )
+
+
+def render_json(data):
+    """
+    Renders data consisting of dicts, lists, strings, numbers, booleans and None
+    to JSON as configured by the settings.
+
+    :param data: The object to be rendered.
+    :return: bytes of the UTF-8 encoded JSON
+    """
+    if use_orjson():
+        return orjson.dumps(
+            data, option=orjson.OPT_INDENT_2 if settings.BEACON_JSON_INDENT else None
+        )
+    return json.dumps(data, cls=DjangoJSONEncoder, **get_json_dumps_params()).encode()
+
+
+class RenderedJsonResponse(HttpResponse):
+    """
+    An HttpResponse containing data rendered by render_json.
+    """
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=render_json(data), **kwargs)
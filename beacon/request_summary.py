@@ -0,0 +1,147 @@
+from collections import Counter
+from itertools import islice
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import LogEntry, RequestSummary, VariantRequestSummary
+
+#: Fields identifying the counted requests of a RequestSummary object
+REQUEST_FIELDS = ("remote_site_id", "endpoint", "status_code")
+
+#: Fields identifying the requested allele of a VariantRequestSummary object
+ALLELE_FIELDS = ("release", "chromosome", "start", "end", "reference", "alternative")
+
+
+def count_requests(log_entries):
+    """
+    Counts LogEntry objects per day, remote site, endpoint and status code and the valid
+    requests of the query endpoint per day and allele.
+
+    :param log_entries: An iterable of LogEntry objects.
+    :return: Counter of (date, remote site id, endpoint, status code) tuples,
+     Counter of (date, release, chromosome, start, end, reference, alternative) tuples
+    """
+    requests = Counter()
+    variants = Counter()
+    for log_entry in log_entries:
+        day = _get_day(log_entry.date_time)
+        requests[
+            (day,) + tuple(getattr(log_entry, field) for field in REQUEST_FIELDS)
+        ] += 1
+        allele = tuple(getattr(log_entry, field) for field in ALLELE_FIELDS)
+        # invalid requests are rejected with 400
+        if (
+            log_entry.endpoint == "query"
+            and log_entry.status_code != 400
+            and None not in allele
+        ):
+            variants[(day,) + allele] += 1
+    return requests, variants
+
+
+def add_request_summaries(log_entries):
+    """
+    Adds LogEntry objects to the summaries using atomic increments. Called when the
+    entries are written.
+
+    :param log_entries: An iterable of LogEntry objects.
+    """
+    requests, variants = count_requests(log_entries)
+    for key, count in requests.items():
+        _increment(
+            RequestSummary, count, date=key[0], **dict(zip(REQUEST_FIELDS, key[1:]))
+        )
+    for key, count in variants.items():
+        _increment(
+            VariantRequestSummary,
+            count,
+            date=key[0],
+            **dict(zip(ALLELE_FIELDS, key[1:]))
+        )
+
+
+def rebuild_request_summaries(since=None, batch_size=1000):
+    """
+    Replaces the summaries by counting the logged requests in the database, either of
+    all days or of the days from since on.
+
+    :param since: A date object, default is None for all days
+    :param batch_size: Number of summaries inserted at once.
+    :return: Number of summed up requests integer
+    """
+    log_entries = LogEntry.objects.all()
+    request_summaries = RequestSummary.objects.all()
+    variant_summaries = VariantRequestSummary.objects.all()
+    if since is not None:
+        log_entries = log_entries.filter(date_time__date__gte=since)
+        request_summaries = request_summaries.filter(date__gte=since)
+        variant_summaries = variant_summaries.filter(date__gte=since)
+    log_entries = log_entries.annotate(date=TruncDate("date_time")).order_by()
+    with transaction.atomic():
+        request_summaries.delete()
+        variant_summaries.delete()
+        total = _create_summaries(
+            RequestSummary,
+            log_entries.values("date", *REQUEST_FIELDS).annotate(count=Count("id")),
+            batch_size,
+        )
+        _create_summaries(
+            VariantRequestSummary,
+            log_entries.filter(endpoint="query")
+            .exclude(status_code=400)
+            .filter(**{"%s__isnull" % field: False for field in ALLELE_FIELDS})
+            .values("date", *ALLELE_FIELDS)
+            .annotate(count=Count("id")),
+            batch_size,
+        )
+    return total
+
+
+def _get_day(date_time):
+    """
+    Returns the day of a date time in the current time zone.
+
+    :param date_time: A datetime object.
+    :return: date object
+    """
+    if timezone.is_aware(date_time):
+        return timezone.localdate(date_time)
+    return date_time.date()
+
+
+def _increment(model, count, **fields):
+    """
+    Increments the count of the summary with the given fields or creates it.
+
+    :param model: RequestSummary or VariantRequestSummary
+    :param count: Number of requests to be added.
+    :param fields: The fields identifying the summary.
+    """
+    summaries = model.objects.filter(**fields)
+    if summaries.update(count=F("count") + count):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(count=count, **fields)
+    except IntegrityError:  # created concurrently
+        summaries.update(count=F("count") + count)
+
+
+def _create_summaries(model, rows, batch_size):
+    """
+    Inserts the summaries of aggregated rows in batches.
+
+    :param model: RequestSummary or VariantRequestSummary
+    :param rows: A QuerySet of dicts with the fields and the count of each summary.
+    :param batch_size: Number of summaries inserted at once.
+    :return: Sum of the counts integer
+    """
+    total = 0
+    rows = rows.iterator(chunk_size=batch_size)
+    while True:
+        batch = [model(**row) for row in islice(rows, batch_size)]
+        if not batch:
+            return total
+        model.objects.bulk_create(batch)
+        total += sum(summary.count for summary in batch)
@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .allele_summary import get_allele_summary_keys, refresh_allele_summaries
+from .caches import authentication_cache, info_response_cache
+from .models import (
+    Case,
+    Consortium,
+    MetadataBeacon,
+    MetadataBeaconDataset,
+    MetadataBeaconOrganization,
+    Phenotype,
+    Project,
+    RemoteSite,
+    Variant,
+)
+
+
+@receiver(post_save, sender=Consortium)
+@receiver(post_delete, sender=Consortium)
+@receiver(post_save, sender=RemoteSite)
+@receiver(post_delete, sender=RemoteSite)
+@receiver(post_delete, sender=Project)
+@receiver(m2m_changed, sender=Consortium.projects.through)
+@receiver(m2m_changed, sender=RemoteSite.consortia.through)
+def clear_remote_site_caches(sender, **kwargs):
+    """
+    Drops the cached remote sites and their visibility levels if consortia, remote
+    sites or their relations were changed.
+
+    :param sender: The model class sending the signal.
+    """
+    authentication_cache.clear()
+
+
+@receiver(post_save, sender=MetadataBeacon)
+@receiver(post_delete, sender=MetadataBeacon)
+@receiver(post_save, sender=MetadataBeaconOrganization)
+@receiver(post_delete, sender=MetadataBeaconOrganization)
+@receiver(post_save, sender=MetadataBeaconDataset)
+@receiver(post_delete, sender=MetadataBeaconDataset)
+@receiver(post_save, sender=RemoteSite)
+@receiver(post_delete, sender=RemoteSite)
+def clear_info_response_cache(sender, **kwargs):
+    """
+    Drops the rendered info response if the beacon metadata or the remote sites,
+    which contain the public site of the logged requests, were changed.
+
+    :param sender: The model class sending the signal.
+    """
+    info_response_cache.clear()
+
+
+@receiver(pre_save, sender=Variant)
+@receiver(pre_save, sender=Case)
+@receiver(pre_save, sender=Phenotype)
+def remember_allele_summaries(sender, instance, **kwargs):
+    """
+    Remembers the allele summaries depending on the stored state of a changed variant,
+    case or phenotype, so they are refreshed after the change as well. The summaries are
+    only maintained while the query endpoint answers from them.
+
+    :param sender: The model class sending the signal.
+    :param instance: The Variant, Case or Phenotype object to be saved.
+    """
+    instance._allele_summary_keys = []
+    if settings.BEACON_QUERY_BACKEND != "allele_summaries":
+        return
+    if not instance._state.adding:
+        stored = sender.objects.filter(pk=instance.pk).first()
+        if stored:
+            instance._allele_summary_keys = get_allele_summary_keys(stored)
+
+
+@receiver(post_save, sender=Variant)
+@receiver(post_delete, sender=Variant)
+@receiver(post_save, sender=Case)
+@receiver(post_save, sender=Phenotype)
+@receiver(post_delete, sender=Phenotype)
+def update_allele_summaries(sender, instance, **kwargs):
+    """
+    Refreshes the allele summaries depending on a changed variant, case or phenotype.
+    Deleted cases need no handling as their variants are deleted first. The summaries
+    are only maintained while the query endpoint answers from them.
+
+    :param sender: The model class sending the signal.
+    :param instance: The saved or deleted Variant, Case or Phenotype object.
+    """
+    if settings.BEACON_QUERY_BACKEND != "allele_summaries":
+        return
+    refresh_allele_summaries(
+        getattr(instance, "_allele_summary_keys", [])
+        + get_allele_summary_keys(instance)
+    )
+
+
+@receiver(pre_save, sender=Variant)
+def set_variant_lookup_fields(sender, instance, **kwargs):
+    """
+    Keeps the allele key and bin of a saved variant in line with its coordinates.
+
+    :param sender: The model class sending the signal.
+    :param instance: The Variant object to be saved.
+    """
+    instance.set_allele_key()
+    instance.set_bin()
@@ -0,0 +1,113 @@
+from itertools import islice
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+
+class JsonStream(list):
+    """
+    A list whose items are produced by an iterable only while StreamingJsonResponse
+    renders them, e.g. the datasetAlleleResponses created from the accumulated alleles
+    one after another. The items can be iterated once and are rendered as empty list
+    by the encoders written in C, so other responses have to render list(stream).
+    """
+
+    def __init__(self, iterable):
+        super().__init__()
+        self._iterator = iter(iterable)
+        self._head = []
+
+    def __bool__(self):
+        # the encoder renders "[]" without iterating an empty list
+        if not self._head:
+            self._head = list(islice(self._iterator, 1))
+        return bool(self._head)
+
+    def __iter__(self):
+        yield from self._head
+        self._head = []
+        yield from self._iterator
+
+
+class StreamingJsonResponse(StreamingHttpResponse):
+    """
+    A StreamingHttpResponse rendering data to JSON incrementally. The encoded text is
+    sent in chunks of about chunk_size bytes, so the rendered response is never held
+    in memory as a whole, and the items of JsonStream objects in the data are only
+    created while rendering them. The body equals the content of a JsonResponse with
+    the same data and json_dumps_params. As the size of the body is only known after sending it,
+    callbacks registered with on_complete receive it once the body was sent or the
+    response was closed.
+    """
+
+    #: Default number of bytes sent at once
+    CHUNK_SIZE = 8192
+
+    def __init__(
+        self,
+        data,
+        encoder=DjangoJSONEncoder,
+        json_dumps_params=None,
+        chunk_size=CHUNK_SIZE,
+        **kwargs
+    ):
+        kwargs.setdefault("content_type", "application/json")
+        #: Number of bytes sent so far
+        self.response_size = 0
+        self._callbacks = []
+        self._completed = False
+        super().__init__(
+            self._encode(data, encoder(**(json_dumps_params or {})), chunk_size),
+            **kwargs
+        )
+
+    def on_complete(self, callback):
+        """
+        Registers a function called with the response once the body was sent.
+
+        :param callback: A function receiving the StreamingJsonResponse object.
+        """
+        self._callbacks.append(callback)
+
+    def close(self):
+        """
+        Completes the response if the body was not sent completely, e.g. because the
+        client disconnected, and closes it.
+        """
+        self._complete()
+        super().close()
+
+    def _encode(self, data, encoder, chunk_size):
+        """
+        Encodes the data and joins the small pieces of the encoder to chunks.
+
+        :param data: The object to be rendered to JSON.
+        :param encoder: A JSONEncoder object.
+        :param chunk_size: Number of bytes sent at once.
+        :return: generator of bytes objects
+        """
+        buffer = []
+        buffered = 0
+        for piece in encoder.iterencode(data):
+            buffer.append(piece)
+            buffered += len(piece)
+            if buffered >= chunk_size:
+                chunk = "".join(buffer).encode()
+                self.response_size += len(chunk)
+                yield chunk
+                buffer = []
+                buffered = 0
+        if buffer:
+            chunk = "".join(buffer).encode()
+            self.response_size += len(chunk)
+            yield chunk
+        self._complete()
+
+    def _complete(self):
+        """
+        Calls the registered callbacks once.
+        """
+        if self._completed:
+            return
+        self._completed = True
+        for callback in self._callbacks:
+            callback(self)
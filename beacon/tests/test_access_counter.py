@@ -0,0 +1,95 @@
+import datetime
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .factories import LogEntryFactory, RemoteSiteFactory
+from ..access_counter import (
+    CacheAccessCounter,
+    DatabaseAccessCounter,
+    get_access_counter,
+)
+from ..models import AccessCounter
+
+
+class TestDatabaseAccessCounter(TestCase):
+    """Test case for counting requests in the database"""
+
+    #: Set up remote site
+    def setUp(self):
+        self.remote_site = RemoteSiteFactory()
+        self.counter = DatabaseAccessCounter()
+
+    #: Test increment and get for today
+    def test_increment(self):
+        self.assertEqual(self.counter.get(self.remote_site.id), 0)
+        self.counter.increment(self.remote_site.id)
+        self.counter.increment(self.remote_site.id, 3)
+        self.assertEqual(self.counter.get(self.remote_site.id), 4)
+        self.assertEqual(AccessCounter.objects.count(), 1)
+
+    #: Test counters are kept per day
+    def test_increment_day(self):
+        yesterday = timezone.localdate() - datetime.timedelta(days=1)
+        self.counter.increment(self.remote_site.id, 5, yesterday)
+        self.assertEqual(self.counter.get(self.remote_site.id), 0)
+        self.assertEqual(self.counter.get(self.remote_site.id, yesterday), 5)
+
+    #: Test checking the counter is a single query
+    def test_get_num_queries(self):
+        self.counter.increment(self.remote_site.id)
+        with self.assertNumQueries(1):
+            self.counter.get(self.remote_site.id)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class TestCacheAccessCounter(TestCase):
+    """Test case for counting requests in the django cache"""
+
+    #: Set up remote site
+    def setUp(self):
+        self.remote_site = RemoteSiteFactory()
+        self.counter = CacheAccessCounter()
+
+    #: Test increment and rebuild
+    def test_increment(self):
+        self.assertEqual(self.counter.get(self.remote_site.id), 0)
+        self.counter.increment(self.remote_site.id)
+        self.counter.increment(self.remote_site.id, 3)
+        self.assertEqual(self.counter.get(self.remote_site.id), 4)
+        self.counter.rebuild({(self.remote_site.id, timezone.localdate()): 1})
+        self.assertEqual(self.counter.get(self.remote_site.id), 1)
+
+    #: Test the backend is chosen by the settings
+    @override_settings(BEACON_ACCESS_COUNTER="beacon.access_counter.CacheAccessCounter")
+    def test_get_access_counter(self):
+        self.assertIsInstance(get_access_counter(), CacheAccessCounter)
+
+
+class TestRebuildAccessCounters(TestCase):
+    """Test case for calling the admin command 'rebuild_access_counters'"""
+
+    #: Test counters are rebuilt from the logged requests
+    def test_handle(self):
+        remote_site = RemoteSiteFactory()
+        yesterday = timezone.now() - datetime.timedelta(days=1)
+        LogEntryFactory(
+            remote_site=remote_site, date_time=timezone.now(), status_code=200
+        )
+        LogEntryFactory(
+            remote_site=remote_site, date_time=timezone.now(), status_code=403
+        )
+        LogEntryFactory(remote_site=remote_site, date_time=yesterday, status_code=200)
+        LogEntryFactory(remote_site=None, status_code=401)
+        DatabaseAccessCounter().increment(remote_site.id, 10)
+        out = StringIO()
+        call_command("rebuild_access_counters", stdout=out)
+        self.assertEqual(
+            out.getvalue(),
+            "The access counters were rebuilt from 3 logged requests.\n",
+        )
+        counter = get_access_counter()
+        self.assertEqual(counter.get(remote_site.id), 2)
+        self.assertEqual(counter.get(remote_site.id, yesterday.date()), 1)
@@ -0,0 +1,143 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from .factories import CaseFactory, PhenotypeFactory, ProjectFactory, VariantFactory
+from ..allele_summary import rebuild_allele_summaries
+from ..models import AlleleSummary
+
+
+@override_settings(BEACON_QUERY_BACKEND="allele_summaries")
+class TestAlleleSummary(TestCase):
+    """Test case for summing up the variants of an allele per project"""
+
+    #: Set up two cases of a project sharing a variant
+    def setUp(self):
+        self.project = ProjectFactory()
+        self.case_1 = CaseFactory(project=self.project, structure="trio")
+        self.case_2 = CaseFactory(project=self.project)
+        self.variant_1 = self._create_variant(self.case_1)
+        self.variant_2 = self._create_variant(self.case_2)
+        PhenotypeFactory(case=self.case_1, phenotype="HP:0001166")
+        PhenotypeFactory(case=self.case_2, phenotype="HP:0001049")
+
+    def _create_variant(self, case, start=12345):
+        return VariantFactory(
+            case=case,
+            chromosome=1,
+            start=start,
+            end=start,
+            reference="C",
+            alternative="T",
+        )
+
+    def _get_summaries(self):
+        return {
+            (s.project_id, s.start): (
+                s.variant_count,
+                s.sample_count,
+                s.frequency_count,
+                sorted(c.id for c in s.cases.all()),
+                s.phenotypes,
+            )
+            for s in AlleleSummary.objects.all()
+        }
+
+    def _get_counts(self, *variants):
+        counts = [v.get_variant_sample_frequency_count() for v in variants]
+        return tuple(sum(c[i] for c in counts) for i in range(3))
+
+    #: Test creating variants and phenotypes fills the summary
+    def test_create(self):
+        self.assertEqual(
+            self._get_summaries(),
+            {
+                (self.project.id, 12345): self._get_counts(
+                    self.variant_1, self.variant_2
+                )
+                + (
+                    [self.case_1.id, self.case_2.id],
+                    ["HP:0001049", "HP:0001166"],
+                )
+            },
+        )
+
+    #: Test moving a variant updates the summaries of both alleles
+    def test_update_variant(self):
+        self.variant_2.start = 12346
+        self.variant_2.end = 12346
+        self.variant_2.save()
+        self.assertEqual(
+            self._get_summaries(),
+            {
+                (self.project.id, 12345): self._get_counts(self.variant_1)
+                + ([self.case_1.id], ["HP:0001166"]),
+                (self.project.id, 12346): self._get_counts(self.variant_2)
+                + ([self.case_2.id], ["HP:0001049"]),
+            },
+        )
+
+    #: Test deleting variants removes them from the summary and empty summaries
+    def test_delete_variant(self):
+        self.variant_1.delete()
+        self.assertEqual(
+            self._get_summaries(),
+            {
+                (self.project.id, 12345): self._get_counts(self.variant_2)
+                + ([self.case_2.id], ["HP:0001049"]),
+            },
+        )
+        self.variant_2.delete()
+        self.assertEqual(AlleleSummary.objects.count(), 0)
+
+    #: Test moving a case to another project moves its variants
+    def test_update_case(self):
+        other_project = ProjectFactory()
+        self.case_2.project = other_project
+        self.case_2.save()
+        self.assertEqual(
+            self._get_summaries(),
+            {
+                (self.project.id, 12345): self._get_counts(self.variant_1)
+                + ([self.case_1.id], ["HP:0001166"]),
+                (other_project.id, 12345): self._get_counts(self.variant_2)
+                + ([self.case_2.id], ["HP:0001049"]),
+            },
+        )
+
+    #: Test deleting a case or a phenotype updates the summary
+    def test_delete_case_and_phenotype(self):
+        self.case_1.delete()
+        self.case_2.phenotype_set.all().delete()
+        self.assertEqual(
+            self._get_summaries(),
+            {
+                (self.project.id, 12345): self._get_counts(self.variant_2)
+                + ([self.case_2.id], []),
+            },
+        )
+
+    #: Test rebuilding reproduces the incrementally updated summaries
+    def test_rebuild(self):
+        self._create_variant(self.case_1, start=200)
+        self._create_variant(CaseFactory(), start=200)
+        expected = self._get_summaries()
+        AlleleSummary.objects.all().delete()
+        self.assertEqual(rebuild_allele_summaries(batch_size=2), 3)
+        self.assertEqual(self._get_summaries(), expected)
+
+    #: Test the summaries are not maintained with the variants backend
+    @override_settings(BEACON_QUERY_BACKEND="variants")
+    def test_variants_backend(self):
+        variant = self._create_variant(self.case_1, start=200)
+        with self.assertNumQueries(1):
+            variant.save()
+        self.assertNotIn((self.project.id, 200), self._get_summaries())
+
+    #: Test the management command rebuilds the summaries
+    def test_rebuild_command(self):
+        expected = self._get_summaries()
+        AlleleSummary.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_allele_summaries", stdout=out)
+        self.assertIn("1 allele summaries were rebuilt.", out.getvalue())
+        self.assertEqual(self._get_summaries(), expected)
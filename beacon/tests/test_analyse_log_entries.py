@@ -2,7 +2,7 @@ import datetime
 from io import StringIO
 import tempfile
 import matplotlib.pyplot as plt
-from pandas import DataFrame, to_datetime, Timestamp
+from pandas import DataFrame, to_datetime, Timestamp, concat
 from ipaddress import ip_address
 from .factories import (
     RemoteSiteFactory,
@@ -17,7 +17,18 @@ from .factories import (
 import sys
 from django.core.management import call_command
 from django.test import TestCase
-from beacon.management.commands.analyse_log_entries import Command
+from beacon.models import LogEntry
+from beacon.request_summary import rebuild_request_summaries
+from beacon.management.commands.analyse_log_entries import (
+    CHUNK_SIZE,
+    LOG_DELAY_MINUTES,
+    Command,
+    LogAggregates,
+    count_per_day,
+    count_variant_containers,
+    get_top_remote_sites,
+    get_top_users,
+)
 from os import path
 from unittest import mock
 from django.test import Client
@@ -49,6 +60,12 @@ class TestAnalyseLogEntriesMethods(TestCase):
             }
         )
 
+    #: Help function counting the requests of the data
+    def aggregate(self):
+        aggregates = LogAggregates()
+        aggregates.add(self.data)
+        return aggregates
+
     #: Test method _create_data_frame
     def test_create_data_frame(self):
         log_entry_no_remote_side = LogEntryFactory(remote_site=None)
@@ -129,12 +146,64 @@ class TestAnalyseLogEntriesMethods(TestCase):
         equal = out.equals(df)
         self.assertEqual(equal, True)
 
+    #: Test method _create_data_frame with cases and remote sites in a constant number of queries
+    def test_create_data_frame_cases_remote_sites(self):
+        case_1 = CaseFactory(name="case_1", project__title="project_1")
+        case_2 = CaseFactory(name="case_2", project__title="project_2")
+        log_entry_1 = LogEntryFactory(
+            endpoint="query", status_code=200, remote_site__name="remote_site_1"
+        )
+        log_entry_1.cases.add(case_1, case_2)
+        LogEntryFactory(status_code=401)
+        log_entry_3 = LogEntryFactory(
+            endpoint="query", status_code=200, remote_site=log_entry_1.remote_site
+        )
+        log_entry_3.cases.add(case_2)
+        with self.assertNumQueries(2):
+            out = Command()._create_data_frame()
+        self.assertEqual(
+            list(out.columns),
+            [
+                "method",
+                "endpoint",
+                "remote site user",
+                "ip_address",
+                "remote site",
+                "date_time",
+                "status code",
+                "response_size",
+                "reference",
+                "alternative",
+                "chromosome",
+                "start",
+                "end",
+                "release",
+                "server protocol",
+                "case",
+                "project",
+            ],
+        )
+        self.assertEqual(
+            list(out["remote site"]), ["remote_site_1", "Unknown", "remote_site_1"]
+        )
+        self.assertEqual(
+            out["remote site user"][0],
+            "remote_site_1 - %s" % log_entry_1.user_identifier,
+        )
+        self.assertEqual(list(out["case"]), [["case_1", "case_2"], [], ["case_2"]])
+        self.assertEqual(
+            list(out["project"]), [["project_1", "project_2"], [], ["project_2"]]
+        )
+        self.assertIsNone(out["date_time"][0].tzinfo)
+
     #: Test method _plot_endpoint_per_time
     def test_plot_endpoint_per_time(self):
         fig, ax = plt.subplots(1)
         figures = []
         file_names = []
-        Command()._plot_endpoint_per_time(self.data, fig, ax, figures, file_names)
+        Command()._plot_endpoint_per_time(
+            self.aggregate().endpoints, fig, ax, figures, file_names
+        )
         self.assertEqual(ax.title.get_text(), "Number of requests per endpoint")
         self.assertEqual(figures, [fig])
         self.assertEqual(file_names, ["requests_per_endpoint.pdf"])
@@ -145,7 +214,9 @@ class TestAnalyseLogEntriesMethods(TestCase):
         fig, ax = plt.subplots(1)
         figures = []
         file_names = []
-        Command()._plot_endpoint_per_time(self.data, fig, ax, figures, file_names, True)
+        Command()._plot_endpoint_per_time(
+            self.aggregate().endpoints, fig, ax, figures, file_names, True
+        )
         self.assertEqual(ax.title.get_text(), "Number of requests per endpoint")
 
     #: Test method _plot_request_per_time
@@ -154,7 +225,7 @@ class TestAnalyseLogEntriesMethods(TestCase):
         figures = []
         file_names = []
         Command()._plot_requests_per_remote_site(
-            self.data[self.data.endpoint == "query"]["remote site"],
+            self.aggregate().remote_sites,
             fig,
             ax,
             figures,
@@ -170,7 +241,7 @@ class TestAnalyseLogEntriesMethods(TestCase):
         figures = []
         file_names = []
         Command()._plot_remote_site_per_variant_container(
-            self.data[self.data.endpoint == "query"][["remote site", "case"]],
+            self.aggregate().cases,
             fig,
             ax,
             "case",
@@ -191,7 +262,7 @@ class TestAnalyseLogEntriesMethods(TestCase):
         file_names = []
         self.data["case"] = [[]]
         Command()._plot_remote_site_per_variant_container(
-            self.data[self.data.endpoint == "query"][["remote site", "case"]],
+            self.aggregate().cases,
             fig,
             ax,
             "case",
@@ -211,9 +282,7 @@ class TestAnalyseLogEntriesMethods(TestCase):
         figures = []
         file_names = []
         Command()._plot_remote_site_user_per_variant_container(
-            self.data[self.data.endpoint == "query"][
-                ["remote site", "case", "remote site user"]
-            ],
+            self.aggregate().cases,
             fig,
             ax,
             "case",
@@ -234,9 +303,7 @@ class TestAnalyseLogEntriesMethods(TestCase):
         file_names = []
         self.data["case"] = [[]]
         Command()._plot_remote_site_user_per_variant_container(
-            self.data[self.data.endpoint == "query"][
-                ["remote site", "case", "remote site user"]
-            ],
+            self.aggregate().cases,
             fig,
             ax,
             "case",
@@ -257,7 +324,7 @@ class TestAnalyseLogEntriesMethods(TestCase):
         figures = []
         file_names = []
         Command()._plot_access_limit_per_remote_site(
-            self.data[self.data.endpoint == "query"], fig, ax, figures, file_names
+            self.aggregate().access_limits, fig, ax, figures, file_names
         )
         self.assertEqual(
             ax.title.get_text(),
@@ -271,8 +338,9 @@ class TestAnalyseLogEntriesMethods(TestCase):
         fig, ax = plt.subplots(1)
         figures = []
         file_names = []
+        self.data["endpoint"] = "info"
         Command()._plot_access_limit_per_remote_site(
-            self.data[self.data.endpoint == "info"], fig, ax, figures, file_names
+            self.aggregate().access_limits, fig, ax, figures, file_names
         )
         self.assertEqual(
             sys.stdout.getvalue(),
@@ -289,7 +357,7 @@ class TestAnalyseLogEntriesMethods(TestCase):
         file_names = []
         self.data["remote site"] = "Unknown"
         Command()._plot_access_limit_per_remote_site(
-            self.data[self.data.endpoint == "query"], fig, ax, figures, file_names
+            self.aggregate().access_limits, fig, ax, figures, file_names
         )
         self.assertEqual(
             ax.title.get_text(),
@@ -304,9 +372,7 @@ class TestAnalyseLogEntriesMethods(TestCase):
         figures = []
         file_names = []
         Command()._plot_table_top_requested_variants(
-            self.data[
-                (self.data.endpoint == "query") & (self.data["status code"] != 400)
-            ][["reference", "chromosome", "start", "end", "release", "alternative"]],
+            self.aggregate().variants,
             fig,
             ax,
             figures,
@@ -321,10 +387,9 @@ class TestAnalyseLogEntriesMethods(TestCase):
         fig, ax = plt.subplots(1)
         figures = []
         file_names = []
+        self.data["endpoint"] = "info"
         Command()._plot_table_top_requested_variants(
-            self.data[
-                (self.data.endpoint == "info") & (self.data["status code"] != 400)
-            ][["reference", "chromosome", "start", "end", "release", "alternative"]],
+            self.aggregate().variants,
             fig,
             ax,
             figures,
@@ -342,7 +407,9 @@ class TestAnalyseLogEntriesMethods(TestCase):
         fig, ax = plt.subplots(1)
         figures = []
         file_names = []
-        Command()._plot_status_codes_per_time(self.data, fig, ax, figures, file_names)
+        Command()._plot_status_codes_per_time(
+            self.aggregate().status_codes, fig, ax, figures, file_names
+        )
         self.assertEqual(ax.title.get_text(), "Number of status codes from requests")
         self.assertEqual(figures, [fig])
         self.assertEqual(file_names, ["status_codes_requests.pdf"])
@@ -354,12 +421,78 @@ class TestAnalyseLogEntriesMethods(TestCase):
         figures = []
         file_names = []
         Command()._plot_status_codes_per_time(
-            self.data, fig, ax, figures, file_names, True
+            self.aggregate().status_codes, fig, ax, figures, file_names, True
         )
         self.assertEqual(ax.title.get_text(), "Number of status codes from requests")
         self.assertEqual(figures, [fig])
         self.assertEqual(file_names, ["status_codes_requests.pdf"])
 
+    #: Data of several requests used for the counting functions
+    def get_requests(self):
+        return DataFrame(
+            data={
+                "endpoint": ["query", "info", "query", "query"],
+                "remote site": ["site_1", None, "site_2", "site_2"],
+                "remote site user": ["user_1", None, "user_2", "user_3"],
+                "date_time": to_datetime(
+                    [
+                        "2021-05-19 10:00",
+                        "2021-05-19 12:00",
+                        "2021-05-21 08:00",
+                        "2021-05-21 09:00",
+                    ]
+                ),
+                "case": [["case_1", "case_2"], [], ["case_1"], ["case_1"]],
+            }
+        )
+
+    #: Test function count_per_day
+    def test_count_per_day(self):
+        counts = count_per_day(self.get_requests(), "endpoint")
+        self.assertEqual(
+            counts.to_dict(),
+            {
+                (Timestamp("2021-05-19"), "info"): 1,
+                (Timestamp("2021-05-19"), "query"): 1,
+                (Timestamp("2021-05-21"), "query"): 2,
+            },
+        )
+
+    #: Test function count_variant_containers
+    def test_count_variant_containers(self):
+        counts = count_variant_containers(self.get_requests(), "case", ["remote site"])
+        self.assertEqual(
+            counts.to_dict(),
+            {("case_1", "site_1"): 1, ("case_1", "site_2"): 2, ("case_2", "site_1"): 1},
+        )
+
+    #: Test function get_top_remote_sites
+    def test_get_top_remote_sites(self):
+        table = get_top_remote_sites(
+            count_variant_containers(self.get_requests(), "case", ["remote site"])
+        )
+        self.assertEqual(list(table.index), ["case_1", "case_2"])
+        self.assertEqual(list(table["total_call_count"]), [3, 1])
+        self.assertEqual(
+            list(table["Maximal requesting identifier"]), ["site_2", "site_1"]
+        )
+        self.assertEqual(list(table["percentage"]), [0.67, 1.0])
+
+    #: Test function get_top_users
+    def test_get_top_users(self):
+        table = get_top_users(
+            count_variant_containers(
+                self.get_requests(), "case", ["remote site", "remote site user"]
+            )
+        )
+        self.assertEqual(list(table.index), ["case_1", "case_2"])
+        self.assertEqual(list(table["total_call_count"]), [3, 1])
+        self.assertEqual(
+            list(table["Maximal requesting user per remote site"]),
+            ["user_2", "user_1"],
+        )
+        self.assertEqual(list(table["percentage"]), [0.5, 1.0])
+
 
 class TestAnalyseLogEntries(TestCase):
     """Test Case for calling customized admin command 'analyse_log_entries'"""
@@ -540,3 +673,267 @@ class TestAnalyseLogEntries(TestCase):
                 "ERROR: Couldn't find the directory or permission for the directory is missing: %s\n"
                 % str(self.test_dir.name),
             )
+
+    #: Creates log entries of the query endpoint with cases for the chunked reading
+    def create_query_log_entries(self):
+        case = CaseFactory(project=self.project)
+        for i, status_code in enumerate([200, 200, 403, 200, 400]):
+            LogEntryFactory(
+                endpoint="query",
+                remote_site=self.remote_site,
+                status_code=status_code,
+                chromosome="1",
+                start=100,
+                end=101,
+                reference="A",
+                alternative="C",
+                date_time=datetime.datetime(
+                    2021, 5, 1 + i % 2, tzinfo=datetime.timezone.utc
+                ),
+                cases=[self.case.id, case.id],
+            )
+        LogEntryFactory(
+            endpoint="info",
+            status_code=200,
+            date_time=datetime.datetime(2021, 5, 2, tzinfo=datetime.timezone.utc),
+        )
+        return case
+
+    #: Test reading the log entries in chunks
+    def test_iterate_data_frames(self):
+        self.create_query_log_entries()
+        command = Command()
+        log_entries = command._get_log_entries()
+        data = command._create_data_frame()
+        chunks = list(command._iterate_data_frames(log_entries, 4))
+        self.assertEqual([len(chunk) for chunk in chunks], [4, 2])
+        self.assertTrue(concat(chunks).equals(data))
+
+    #: Test counting the requests of chunks
+    def test_log_aggregates(self):
+        case = self.create_query_log_entries()
+        users = LogEntry.objects.filter(endpoint="query", status_code=200).values_list(
+            "user_identifier", flat=True
+        )
+        command = Command()
+        aggregates = LogAggregates()
+        for chunk in command._iterate_data_frames(command._get_log_entries(), 4):
+            aggregates.add(chunk)
+        self.assertEqual(
+            aggregates.endpoints.to_dict(),
+            {
+                (Timestamp("2021-05-01"), "query"): 3,
+                (Timestamp("2021-05-02"), "query"): 2,
+                (Timestamp("2021-05-02"), "info"): 1,
+            },
+        )
+        self.assertEqual(
+            aggregates.status_codes.to_dict(),
+            {
+                (Timestamp("2021-05-01"), 200): 1,
+                (Timestamp("2021-05-01"), 400): 1,
+                (Timestamp("2021-05-01"), 403): 1,
+                (Timestamp("2021-05-02"), 200): 3,
+            },
+        )
+        self.assertEqual(aggregates.remote_sites.to_dict(), {"public": 5})
+        # cases are only logged for successful requests
+        self.assertEqual(
+            aggregates.cases.to_dict(),
+            {(self.case.name, "public", "public - %s" % user): 1 for user in users}
+            | {(case.name, "public", "public - %s" % user): 1 for user in users},
+        )
+        self.assertEqual(
+            aggregates.projects.groupby(level=0).sum().to_dict(),
+            {self.project.title: 6},
+        )
+        self.assertEqual(
+            aggregates.access_limits.to_dict(),
+            {("public", 200): 3, ("public", 403): 1},
+        )
+        self.assertEqual(
+            aggregates.variants.to_dict(), {("1", 100, 101, "A", "C", "GRCh37"): 4}
+        )
+
+    #: Test the command reading the log entries in chunks
+    def test_handle_chunk_size_path_csv(self):
+        self.create_query_log_entries()
+        with self.test_dir:
+            out = self.call_command(
+                ["--path", self.test_dir.name, "--as_csv", "--chunk_size", "4"]
+            )
+            self.assertEqual(
+                "A statistical overview of the logged requests was created successfully.\n",
+                out,
+            )
+            for file_name in (
+                "requests_per_endpoint.pdf",
+                "status_codes_requests.pdf",
+                "requests_per_remote_site.pdf",
+                "requested_cases_per_remote_site.pdf",
+                "requested_projects_per_remote_site.pdf",
+                "requested_cases_per_remote_site_users.pdf",
+                "requested_projects_per_remote_site_users.pdf",
+                "Number_restricted_requests_remote_site.pdf",
+                "top_10_variants.pdf",
+            ):
+                self.assertTrue(path.isfile(file_name), file_name)
+            with open("log_entry_data.csv") as csv_file:
+                chunked_csv = csv_file.read()
+            Command()._create_data_frame().to_csv("log_entry_data.csv")
+            with open("log_entry_data.csv") as csv_file:
+                self.assertEqual(chunked_csv, csv_file.read())
+
+    #: Test the command reading the log entries in chunks without log entries
+    def test_handle_chunk_size_empty_db(self):
+        out = self.call_command(["--chunk_size", "4"])
+        self.assertEqual(out, "WARNING: No data available for the given time period.\n")
+
+    #: Test the command counts the log entries in chunks by default
+    @mock.patch("beacon.management.commands.analyse_log_entries.plt.show")
+    def test_handle_default_chunks(self, mock_show):
+        self.create_query_log_entries()
+        with mock.patch.object(
+            Command, "_iterate_data_frames", wraps=Command()._iterate_data_frames
+        ) as mock_iterate, mock.patch.object(
+            Command, "_create_data_frame"
+        ) as mock_create:
+            out = self.call_command()
+        self.assertEqual(
+            out,
+            "A statistical overview of the logged requests was created successfully.\n",
+        )
+        self.assertEqual(mock_iterate.call_args[0][1], CHUNK_SIZE)
+        mock_create.assert_not_called()
+
+    #: Test saving and loading the aggregates
+    def test_log_aggregates_save_load(self):
+        self.create_query_log_entries()
+        command = Command()
+        aggregates = LogAggregates()
+        command._update_aggregates(aggregates, 4)
+        with self.test_dir:
+            file_name = path.join(self.test_dir.name, "aggregates.json")
+            aggregates.save(file_name)
+            loaded = LogAggregates.load(file_name)
+        self.assertEqual(loaded.high_water_mark, aggregates.high_water_mark)
+        for name in LogAggregates.LEVELS:
+            self.assertTrue(getattr(loaded, name).equals(getattr(aggregates, name)))
+
+    #: Test loading the aggregates without a saved file
+    def test_log_aggregates_load_missing(self):
+        aggregates = LogAggregates.load("missing_aggregates.json")
+        self.assertIsNone(aggregates.high_water_mark)
+        self.assertTrue(aggregates.empty)
+
+    #: Test updating the saved aggregates with the entries logged after the previous run
+    @mock.patch("beacon.management.commands.analyse_log_entries.plt.show")
+    def test_handle_aggregates(self, mock_show):
+        self.create_query_log_entries()
+        now = datetime.datetime(2022, 5, 3, 12, tzinfo=datetime.timezone.utc)
+        LogEntryFactory(endpoint="info", status_code=200, date_time=now)
+        later = now + datetime.timedelta(minutes=LOG_DELAY_MINUTES)
+        with self.test_dir:
+            file_name = path.join(self.test_dir.name, "aggregates.json")
+            with mock.patch(
+                "beacon.management.commands.analyse_log_entries.timezone.now",
+                return_value=now,
+            ):
+                out = self.call_command(["--aggregates", file_name])
+            self.assertEqual(
+                out,
+                "A statistical overview of the logged requests was created successfully.\n",
+            )
+            # the entry of the last minutes may not be committed yet and is left
+            self.assertEqual(LogAggregates.load(file_name).endpoints.sum(), 6)
+            with mock.patch(
+                "beacon.management.commands.analyse_log_entries.timezone.now",
+                return_value=later,
+            ), mock.patch.object(
+                Command, "_iterate_data_frames", wraps=Command()._iterate_data_frames
+            ) as mock_iterate:
+                self.call_command(["--aggregates", file_name, "--chunk_size", "4"])
+            # only the new entry is read
+            self.assertEqual(mock_iterate.call_args[0][0].count(), 1)
+            # the entries of the period are looked up by the index of the date time
+            self.assertIn(
+                "USING INDEX beacon_logentry_date_time",
+                mock_iterate.call_args[0][0].explain(),
+            )
+            aggregates = LogAggregates.load(file_name)
+        self.assertEqual(
+            aggregates.high_water_mark,
+            later - datetime.timedelta(minutes=LOG_DELAY_MINUTES),
+        )
+        self.assertEqual(aggregates.endpoints.sum(), 7)
+        self.assertEqual(aggregates.remote_sites.to_dict(), {"public": 5})
+
+    #: Test the saved aggregates with a time period
+    def test_handle_aggregates_time_period(self):
+        out = self.call_command(
+            [
+                "--aggregates",
+                "aggregates.json",
+                "--time_period",
+                "2021-05-20",
+                "2022-05-20",
+            ]
+        )
+        self.assertEqual(
+            out, "ERROR: The aggregates can't be restricted to a time period.\n"
+        )
+
+    #: Test an unreadable aggregates file
+    def test_handle_aggregates_invalid(self):
+        with self.test_dir:
+            file_name = path.join(self.test_dir.name, "aggregates.json")
+            with open(file_name, "w") as json_file:
+                json_file.write("{")
+            out = self.call_command(["--aggregates", file_name])
+        self.assertEqual(
+            out, "ERROR: Couldn't read the aggregates file: %s\n" % file_name
+        )
+
+    #: Test reading the aggregates from the request summaries
+    def test_read_summaries(self):
+        self.create_query_log_entries()
+        rebuild_request_summaries()
+        command = Command()
+        aggregates = LogAggregates()
+        command._update_aggregates(aggregates, 4)
+        summaries = command._read_summaries()
+        for name in (
+            "endpoints",
+            "status_codes",
+            "remote_sites",
+            "access_limits",
+            "variants",
+        ):
+            self.assertEqual(
+                getattr(summaries, name).to_dict(), getattr(aggregates, name).to_dict()
+            )
+        self.assertTrue(summaries.cases.empty)
+        self.assertTrue(
+            command._read_summaries(
+                True,
+                to_datetime("2021-05-03", utc=True),
+                to_datetime("2021-05-04", utc=True),
+            ).empty
+        )
+
+    #: Test the command reading the request summaries
+    def test_handle_summaries(self):
+        self.create_query_log_entries()
+        rebuild_request_summaries()
+        with self.test_dir:
+            out = self.call_command(["--path", self.test_dir.name, "--summaries"])
+            self.assertTrue(path.isfile("Number_restricted_requests_remote_site.pdf"))
+            self.assertFalse(path.isfile("requested_cases_per_remote_site.pdf"))
+        self.assertEqual(
+            out,
+            "WARNING: No data available for plotting information about the cases.\n"
+            "WARNING: No data available for plotting information about the projects.\n"
+            "WARNING: No data available for plotting information about the cases.\n"
+            "WARNING: No data available for plotting information about the projects.\n"
+            "A statistical overview of the logged requests was created successfully.\n",
+        )
@@ -0,0 +1,87 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class TestBenchmark(TestCase):
+    """Test case for the benchmark command"""
+
+    #: Test every variant of the coarse phenotype target is timed
+    def test_coarse_phenotypes(self):
+        out = StringIO()
+        call_command(
+            "benchmark",
+            "--target",
+            "coarse_phenotypes",
+            "--size",
+            "10",
+            "--repeat",
+            "1",
+            stdout=out,
+        )
+        self.assertIn("coarse_phenotypes traversal", out.getvalue())
+        self.assertIn("coarse_phenotypes lookup", out.getvalue())
+
+    #: Test the size and counting of the genotypes are measured
+    def test_genotypes(self):
+        out = StringIO()
+        call_command(
+            "benchmark",
+            "--target",
+            "genotypes",
+            "--size",
+            "10",
+            "--repeat",
+            "1",
+            stdout=out,
+        )
+        self.assertIn("genotypes packed: 3.0 bytes per variant", out.getvalue())
+        self.assertIn("genotypes json_decoded", out.getvalue())
+
+    #: Test both accumulations are timed
+    def test_accumulation(self):
+        out = StringIO()
+        call_command(
+            "benchmark",
+            "--target",
+            "accumulation",
+            "--size",
+            "10",
+            "--repeat",
+            "1",
+            stdout=out,
+        )
+        self.assertIn("accumulation classes", out.getvalue())
+        self.assertIn("accumulation engine", out.getvalue())
+
+    #: Test the size and rendering time of the responses are measured
+    def test_responses(self):
+        out = StringIO()
+        call_command(
+            "benchmark",
+            "--target",
+            "responses",
+            "--size",
+            "10",
+            "--repeat",
+            "1",
+            stdout=out,
+        )
+        self.assertIn("responses indent:", out.getvalue())
+        self.assertIn("responses compact:", out.getvalue())
+
+    #: Test the counting of the log entries for the plots is timed
+    def test_log_plots(self):
+        out = StringIO()
+        call_command(
+            "benchmark",
+            "--target",
+            "log_plots",
+            "--size",
+            "100",
+            "--repeat",
+            "1",
+            stdout=out,
+        )
+        self.assertIn("log_plots loops:", out.getvalue())
+        self.assertIn("log_plots vectorised:", out.getvalue())
@@ -0,0 +1,35 @@
+from django.test import TestCase
+from ..binning import MAX_BIN_POSITION, get_bin, get_overlapping_bins
+
+
+class TestBinning(TestCase):
+    """Test case for the UCSC binning scheme"""
+
+    #: Test the smallest bin containing a range is found on each level
+    def test_get_bin(self):
+        self.assertEqual(get_bin(1, 1), 585)
+        self.assertEqual(get_bin(131072, 131072), 585)
+        self.assertEqual(get_bin(131073, 131073), 586)
+        # ranges crossing a bin border are placed into a larger bin
+        self.assertEqual(get_bin(131072, 131073), 73)
+        self.assertEqual(get_bin(1, MAX_BIN_POSITION), 0)
+        # an insertion before the start position
+        self.assertEqual(get_bin(131073, 131072), 586)
+        with self.assertRaises(ValueError):
+            get_bin(1, MAX_BIN_POSITION + 1)
+
+    #: Test the bins of all ranges overlapping a region are returned
+    def test_get_overlapping_bins(self):
+        self.assertEqual(
+            get_overlapping_bins(41196312, 41277500),
+            [0, 1, 13, 112, 899],
+        )
+        bins = get_overlapping_bins(100000, 300000)
+        self.assertEqual(bins[-3:], [585, 586, 587])
+        for start, end in (
+            (1, 1),
+            (150000, 150000),
+            (131072, 131073),
+            (250000, 400000),
+        ):
+            self.assertTrue(get_bin(start, end) in bins)
@@ -0,0 +1,136 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from .factories import ConsortiumFactory, ProjectFactory, RemoteSiteFactory
+from ..caches import authentication_cache, get_visibility_levels
+from ..models import RemoteSite
+
+
+class TestVisibilityLevels(TestCase):
+    """Test case for the visibility levels of the cached remote sites"""
+
+    #: Set up a remote site with access to projects by consortia of different levels
+    def setUp(self):
+        authentication_cache.clear()
+        self.p1 = ProjectFactory()
+        self.p2 = ProjectFactory()
+        self.con1 = ConsortiumFactory(projects=[self.p1], visibility_level=15)
+        self.con2 = ConsortiumFactory(projects=[self.p1, self.p2], visibility_level=20)
+        self.remote_site = RemoteSiteFactory(
+            key="levels", consortia=[self.con1, self.con2]
+        )
+
+    def _get_levels(self):
+        return authentication_cache.get("levels").visibility_levels
+
+    #: Test the highest visibility level is returned per project
+    def test_get_visibility_levels(self):
+        self.assertEqual(
+            get_visibility_levels(self.remote_site), {self.p1.id: 15, self.p2.id: 20}
+        )
+        self.assertEqual(get_visibility_levels(RemoteSiteFactory()), {})
+
+    #: Test changes of consortia and their relations invalidate the cached levels
+    def test_invalidation(self):
+        self._get_levels()
+        self.con2.visibility_level = 5
+        self.con2.save()
+        self.assertEqual(self._get_levels(), {self.p1.id: 5, self.p2.id: 5})
+        p3 = ProjectFactory()
+        self.con1.projects.add(p3)
+        self.assertEqual(self._get_levels()[p3.id], 15)
+        self.remote_site.consortia.remove(self.con2)
+        self.assertEqual(self._get_levels(), {self.p1.id: 15, p3.id: 15})
+        self.con1.delete()
+        self.assertEqual(self._get_levels(), {})
+
+
+class TestAuthenticationCache(TestCase):
+    """Test case for the cached remote sites per authentication key"""
+
+    #: Set up a remote site with a consortium
+    def setUp(self):
+        authentication_cache.clear()
+        self.project = ProjectFactory()
+        self.consortium = ConsortiumFactory(
+            projects=[self.project], visibility_level=10
+        )
+        self.remote_site = RemoteSiteFactory(key="x", consortia=[self.consortium])
+
+    #: Test the remote site is resolved with its visibility levels
+    def test_get(self):
+        # the remote site and its visibility levels
+        with self.assertNumQueries(2):
+            authenticated_site = authentication_cache.get("x")
+        self.assertEqual(authenticated_site.remote_site, self.remote_site)
+        self.assertEqual(authenticated_site.visibility_levels, {self.project.id: 10})
+        self.assertEqual(authentication_cache.get("unknown"), None)
+
+    #: Test hits and misses are counted and hits do not query the database
+    def test_get_cached(self):
+        stats = authentication_cache.stats()
+        authentication_cache.get("x")
+        with self.assertNumQueries(0):
+            authentication_cache.get("x")
+            authentication_cache.get("x")
+        self.assertEqual(authentication_cache.stats()["hits"], stats["hits"] + 2)
+        self.assertEqual(authentication_cache.stats()["misses"], stats["misses"] + 1)
+
+    #: Test entries expire after the time to live
+    @override_settings(BEACON_AUTH_CACHE_TTL=60)
+    def test_get_expired(self):
+        with mock.patch("beacon.caches.time.monotonic", return_value=0):
+            authentication_cache.get("x")
+        with mock.patch("beacon.caches.time.monotonic", return_value=59):
+            with self.assertNumQueries(0):
+                authentication_cache.get("x")
+        with mock.patch("beacon.caches.time.monotonic", return_value=61):
+            misses = authentication_cache.stats()["misses"]
+            authentication_cache.get("x")
+            self.assertEqual(authentication_cache.stats()["misses"], misses + 1)
+
+    #: Test expired entries use the current visibility levels, as changes made in
+    #: other processes send no signals to this one
+    @override_settings(BEACON_AUTH_CACHE_TTL=60)
+    def test_get_expired_visibility_levels(self):
+        other = ConsortiumFactory(projects=[self.project], visibility_level=5)
+        with mock.patch("beacon.caches.time.monotonic", return_value=0):
+            authentication_cache.get("x")
+        # changes the consortium membership without sending signals
+        RemoteSite.consortia.through.objects.filter(
+            remotesite=self.remote_site
+        ).delete()
+        RemoteSite.consortia.through.objects.create(
+            remotesite=self.remote_site, consortium=other
+        )
+        with mock.patch("beacon.caches.time.monotonic", return_value=59):
+            self.assertEqual(
+                authentication_cache.get("x").visibility_levels, {self.project.id: 10}
+            )
+        with mock.patch("beacon.caches.time.monotonic", return_value=61):
+            self.assertEqual(
+                authentication_cache.get("x").visibility_levels, {self.project.id: 5}
+            )
+
+    #: Test the least recently used key is dropped
+    @override_settings(BEACON_AUTH_CACHE_SIZE=2)
+    def test_get_lru(self):
+        RemoteSiteFactory(key="y")
+        authentication_cache.get("x")
+        authentication_cache.get("y")
+        authentication_cache.get("x")
+        authentication_cache.get("z")
+        self.assertEqual(authentication_cache.stats()["size"], 2)
+        with self.assertNumQueries(0):
+            authentication_cache.get("x")
+
+    #: Test changes of remote sites and consortia invalidate the cache
+    def test_invalidation(self):
+        authentication_cache.get("x")
+        self.remote_site.access_limit = 0
+        self.remote_site.save()
+        self.assertEqual(authentication_cache.get("x").remote_site.access_limit, 0)
+        self.consortium.visibility_level = 25
+        self.consortium.save()
+        self.assertEqual(
+            authentication_cache.get("x").visibility_levels, {self.project.id: 25}
+        )
@@ -0,0 +1,72 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from .factories import CaseFactory, VariantFactory
+from ..genotypes import count_alleles, count_variants, pack_allele_counts
+from ..models import Variant
+
+
+class TestGenotypes(TestCase):
+    """Test case for the packed allele counts"""
+
+    #: Set up a quartet with a male index and variants on an autosome and the allosomes
+    def setUp(self):
+        self.case = CaseFactory(structure="quartet", inheritance="dominant")
+        self.variants = [
+            VariantFactory(case=self.case, chromosome=chromosome)
+            for chromosome in (1, 23, 24)
+        ]
+        for v in self.variants:
+            v.genotype[self.case.pedigree[-1]["patient"]] = {"gt": "1/1"}
+            v.save()
+
+    #: Test the allele counts are packed in pedigree order
+    def test_pack_allele_counts(self):
+        self.assertEqual(
+            pack_allele_counts(self.variants[0].genotype, self.case.pedigree),
+            bytes([1, 1, 1, 2]),
+        )
+
+    #: Test counting the packed alleles equals counting the genotype JSON
+    def test_count_alleles(self):
+        for v in self.variants:
+            self.assertEqual(
+                count_alleles(
+                    pack_allele_counts(v.genotype, self.case.pedigree),
+                    self.case.pedigree,
+                    v.chromosome,
+                ),
+                v.get_variant_sample_frequency_count(),
+            )
+
+    #: Test counting all variants at once equals counting them one by one
+    def test_count_variants(self):
+        female_case = CaseFactory(structure="trio", sex=2)
+        variants = self.variants + [
+            VariantFactory(case=female_case, chromosome=chromosome)
+            for chromosome in (1, 23, 24)
+        ]
+        variants[1].pack_genotype()
+        variants[4].pack_genotype()
+        self.assertEqual(
+            count_variants(variants),
+            [v.get_variant_sample_frequency_count() for v in variants],
+        )
+        self.assertEqual(count_variants([]), [])
+
+    #: Test the command packs the genotypes and optionally removes the JSON
+    def test_pack_genotypes_command(self):
+        expected = [v.get_variant_sample_frequency_count() for v in self.variants]
+        broken = VariantFactory()
+        Variant.objects.filter(id=broken.id).update(genotype={})
+        out = StringIO()
+        call_command("pack_genotypes", "--batch_size", "2", "--drop_json", stdout=out)
+        self.assertIn(
+            "3 variants were packed, 1 variants with incomplete genotypes were skipped.",
+            out.getvalue(),
+        )
+        variants = Variant.objects.exclude(id=broken.id).order_by("id")
+        self.assertEqual([v.genotype for v in variants], [None] * 3)
+        self.assertEqual(
+            [v.get_variant_sample_frequency_count() for v in variants], expected
+        )
@@ -0,0 +1,136 @@
+import os
+import tempfile
+from unittest import mock
+import networkx
+from django.apps import apps
+from django.test import TestCase, override_settings
+from ..hpo import (
+    build_coarse_lookup,
+    build_hpo,
+    get_ontology,
+    load_hpo,
+    read_data_version,
+)
+
+#: A small ontology with the root term, four levels of subterms and one term below
+OBO = """format-version: 1.2
+data-version: hp/releases/2021-01-01
+
+[Term]
+id: HP:0000001
+name: All
+
+[Term]
+id: HP:0000002
+name: Level 1
+is_a: HP:0000001
+
+[Term]
+id: HP:0000003
+name: Level 2
+is_a: HP:0000002
+
+[Term]
+id: HP:0000004
+name: Level 3
+is_a: HP:0000003
+
+[Term]
+id: HP:0000005
+name: Level 4
+is_a: HP:0000004
+
+[Term]
+id: HP:0000006
+name: Level 5
+is_a: HP:0000005
+"""
+
+
+class TestHpo(TestCase):
+    """Test case for loading the Human Phenotype Ontology"""
+
+    #: Write the ontology to a temporary directory
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.test_dir.name, "hp.obo")
+        with open(self.path, "w") as f:
+            f.write(OBO)
+        self.cache_dir = os.path.join(self.test_dir.name, "cache")
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    #: Test the graph points to the subterms and the coarse terms are on level 4
+    def test_build_hpo(self):
+        ontology = build_hpo(self.path)
+        self.assertEqual(ontology.version, "hp/releases/2021-01-01")
+        self.assertTrue(ontology.graph.has_edge("HP:0000001", "HP:0000002"))
+        self.assertEqual(ontology.coarse_terms, {"HP:0000005"})
+        self.assertEqual(ontology.coarse_lookup, {"HP:0000006": {"HP:0000005"}})
+
+    #: Test the lookup agrees with intersecting the ancestors with the coarse terms
+    def test_build_coarse_lookup(self):
+        ontology = build_hpo(self.path)
+        ontology.graph.add_edge("HP:0000004", "HP:0000007")
+        ontology.graph.add_edge("HP:0000007", "HP:0000006")
+        coarse_terms = {"HP:0000005", "HP:0000007"}
+        lookup = build_coarse_lookup(ontology.graph, coarse_terms)
+        self.assertEqual(lookup["HP:0000006"], {"HP:0000005", "HP:0000007"})
+        self.assertIsInstance(lookup["HP:0000006"], frozenset)
+        self.assertNotIn("HP:0000004", lookup)
+        for term in ontology.graph:
+            self.assertEqual(
+                lookup.get(term, frozenset()),
+                networkx.algorithms.ancestors(ontology.graph, term) & coarse_terms,
+            )
+
+    #: Test reading the data version from the header
+    def test_read_data_version(self):
+        self.assertEqual(read_data_version(self.path), "hp/releases/2021-01-01")
+
+    #: Test the ontology is only parsed once and then loaded from the cache
+    def test_load_hpo_cached(self):
+        ontology = load_hpo(self.path, self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        with mock.patch("beacon.hpo.obonet.read_obo") as mock_read_obo:
+            cached = load_hpo(self.path, self.cache_dir)
+            mock_read_obo.assert_not_called()
+        self.assertEqual(cached.version, ontology.version)
+        self.assertEqual(set(cached.graph.edges), set(ontology.graph.edges))
+        self.assertEqual(cached.coarse_terms, ontology.coarse_terms)
+        self.assertEqual(cached.coarse_lookup, ontology.coarse_lookup)
+
+    #: Test a new data version is not answered from the old cache
+    def test_load_hpo_new_version(self):
+        load_hpo(self.path, self.cache_dir)
+        with open(self.path, "w") as f:
+            f.write(OBO.replace("2021-01-01", "2022-01-01"))
+        self.assertEqual(
+            load_hpo(self.path, self.cache_dir).version, "hp/releases/2022-01-01"
+        )
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+    #: Test the ontology is loaded from the configured source on first use only
+    def test_get_ontology(self):
+        with override_settings(
+            HPO_GRAPH_PATH=self.path, HPO_CACHE_DIR=self.cache_dir
+        ), mock.patch("beacon.hpo._ontology", None), mock.patch(
+            "beacon.hpo.load_hpo", wraps=load_hpo
+        ) as mock_load_hpo:
+            ontology = get_ontology()
+            self.assertIs(get_ontology(), ontology)
+            mock_load_hpo.assert_called_once_with(self.path, self.cache_dir)
+        self.assertEqual(ontology.version, "hp/releases/2021-01-01")
+
+    #: Test the app only loads the ontology on start if the warm up is enabled
+    def test_warm_up(self):
+        config = apps.get_app_config("beacon")
+        with mock.patch("beacon.hpo._ontology", None), mock.patch(
+            "beacon.hpo.load_hpo"
+        ) as mock_load_hpo:
+            config.ready()
+            mock_load_hpo.assert_not_called()
+            with override_settings(HPO_WARM_UP=True):
+                config.ready()
+            mock_load_hpo.assert_called_once()
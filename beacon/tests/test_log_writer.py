@@ -0,0 +1,95 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .factories import CaseFactory, RemoteSiteFactory
+from ..access_counter import get_access_counter
+from ..log_writer import LogWriter
+from ..models import LogEntry, RequestSummary
+
+
+class TestLogWriter(TestCase):
+    """Test case for writing the log entries of the requests"""
+
+    #: Set up remote site and cases
+    def setUp(self):
+        self.remote_site = RemoteSiteFactory()
+        self.cases = [CaseFactory(), CaseFactory()]
+
+    #: Help function for creating an unsaved log entry
+    def log_entry(self):
+        return LogEntry(
+            ip_address="127.0.0.1",
+            remote_site=self.remote_site,
+            date_time=timezone.now(),
+            method="GET",
+            endpoint="query",
+            server_protocol="HTTP/1.1",
+            status_code=200,
+            response_size=100,
+        )
+
+    #: Test entries are saved immediately in sync mode
+    @override_settings(BEACON_LOG_MODE="sync")
+    def test_write_sync(self):
+        LogWriter().write(self.log_entry(), self.cases + [None])
+        self.assertEqual(LogEntry.objects.count(), 1)
+        self.assertEqual(LogEntry.objects.get().cases.count(), 2)
+        self.assertEqual(get_access_counter().get(self.remote_site.id), 1)
+
+    #: Test the entries written in sync mode are not added to the request summaries
+    @override_settings(BEACON_LOG_MODE="sync")
+    def test_write_sync_request_summaries(self):
+        LogWriter().write_many([(self.log_entry(), []), (self.log_entry(), [])])
+        self.assertFalse(RequestSummary.objects.exists())
+
+    #: Test the buffered entries are added to the request summaries
+    @override_settings(BEACON_LOG_MODE="async")
+    @mock.patch("beacon.log_writer.threading.Thread")
+    def test_write_async_request_summaries(self, mock_thread):
+        writer = LogWriter()
+        writer.write_many([(self.log_entry(), []), (self.log_entry(), [])])
+        writer.flush()
+        summary = RequestSummary.objects.get()
+        self.assertEqual(summary.remote_site, self.remote_site)
+        self.assertEqual(summary.date, timezone.localdate())
+        self.assertEqual(summary.count, 2)
+
+    #: Test entries are buffered in async mode and counted before they are written
+    @override_settings(BEACON_LOG_MODE="async")
+    @mock.patch("beacon.log_writer.threading.Thread")
+    def test_write_async(self, mock_thread):
+        writer = LogWriter()
+        writer.write_many(
+            [
+                (self.log_entry(), self.cases),
+                (self.log_entry(), []),
+                (self.log_entry(), self.cases[:1]),
+            ]
+        )
+        self.assertEqual(mock_thread.return_value.start.call_count, 1)
+        self.assertEqual(LogEntry.objects.count(), 0)
+        self.assertEqual(get_access_counter().get(self.remote_site.id), 0)
+        self.assertEqual(writer.pending(self.remote_site.id), 3)
+        writer.flush()
+        self.assertEqual(LogEntry.objects.count(), 3)
+        self.assertEqual(LogEntry.cases.through.objects.count(), 3)
+        self.assertEqual(get_access_counter().get(self.remote_site.id), 3)
+        self.assertEqual(writer.pending(self.remote_site.id), 0)
+
+    #: Test the background thread writes batches and all entries when stopped
+    @override_settings(
+        BEACON_LOG_MODE="async", BEACON_LOG_BATCH_SIZE=2, BEACON_LOG_FLUSH_INTERVAL=1000
+    )
+    @mock.patch("beacon.log_writer.connection.close")
+    @mock.patch("beacon.log_writer.close_old_connections")
+    @mock.patch("beacon.log_writer.threading.Thread")
+    def test_run(self, mock_thread, mock_close_old, mock_close):
+        writer = LogWriter()
+        for _ in range(5):
+            writer.write(self.log_entry(), self.cases)
+        with mock.patch.object(writer, "_write", wraps=writer._write) as mock_write:
+            writer._queue.put(writer._STOP)
+            writer._run()
+        self.assertEqual([len(c[0][0]) for c in mock_write.call_args_list], [2, 2, 1])
+        self.assertEqual(LogEntry.objects.count(), 5)
+        self.assertEqual(LogEntry.cases.through.objects.count(), 10)
@@ -94,6 +94,43 @@ class TestVariant(TestCase):
         ) = self.variant_allosome_Y.get_variant_sample_frequency_count()
         self.assertEqual(frequency_count, 1)
 
+    #: Test the allele key is computed from the coordinates when saving
+    def test_allele_key(self):
+        v = self.variant_autosome
+        self.assertEqual(
+            Variant.objects.get(id=v.id).allele_key,
+            Variant.get_allele_key(
+                v.release, v.chromosome, v.start, v.end, v.reference, v.alternative
+            ),
+        )
+        v.alternative = v.alternative + "A"
+        v.save()
+        self.assertEqual(
+            Variant.objects.get(id=v.id).allele_key,
+            Variant.get_allele_key(
+                v.release, v.chromosome, v.start, v.end, v.reference, v.alternative
+            ),
+        )
+
+    #: Test the bin is computed from the position when saving
+    def test_bin(self):
+        v = VariantFactory(start=200000, end=200000)
+        self.assertEqual(Variant.objects.get(id=v.id).bin, 586)
+        v.end = 300000
+        v.save()
+        self.assertEqual(Variant.objects.get(id=v.id).bin, 73)
+
+    #: Test the allele key is a stable signed 64 bit integer
+    def test_get_allele_key(self):
+        key = Variant.get_allele_key("GRCh37", 1, 100, 100, "A", "C")
+        self.assertEqual(
+            key, Variant.get_allele_key("GRCh37", "1", "100", 100, "A", "C")
+        )
+        self.assertNotEqual(
+            key, Variant.get_allele_key("GRCh37", 1, 100, 100, "A", "G")
+        )
+        self.assertTrue(-(2**63) <= key < 2**63)
+
 
 class TestPhenotype(TestCase):
     """Basic test case for phenotype model"""
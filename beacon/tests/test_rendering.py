@@ -0,0 +1,71 @@
+import json
+from unittest import skipIf
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from ..rendering import RenderedJsonResponse, orjson, render_json, use_orjson
+from .factories import (
+    MetadataBeaconDatasetFactory,
+    MetadataBeaconFactory,
+    MetadataBeaconOrganizationFactory,
+    RemoteSiteFactory,
+)
+from ..models import LogEntry
+
+
+class TestRendering(TestCase):
+    """Test case for rendering the JSON responses"""
+
+    def setUp(self):
+        self.data = {
+            "exists": True,
+            "frequency": 0.39,
+            "phenotype": ["HP:0000001", "HP:0000118"],
+            "error": None,
+            "caseName": [],
+        }
+
+    #: Test the responses are rendered compactly without indentation
+    @override_settings(BEACON_JSON_INDENT=None, BEACON_JSON_ENCODER="json")
+    def test_render_json_compact(self):
+        self.assertEqual(
+            render_json(self.data),
+            b'{"exists":true,"frequency":0.39,"phenotype":["HP:0000001","HP:0000118"],'
+            b'"error":null,"caseName":[]}',
+        )
+
+    #: Test the responses are rendered with the configured indentation
+    @override_settings(BEACON_JSON_INDENT=4, BEACON_JSON_ENCODER="orjson")
+    def test_render_json_indent(self):
+        self.assertFalse(use_orjson())
+        self.assertEqual(
+            render_json(self.data), json.dumps(self.data, indent=4).encode()
+        )
+
+    #: Test orjson renders the same JSON as the standard library
+    @skipIf(orjson is None, "orjson is not installed")
+    def test_render_json_orjson(self):
+        for indent in (None, 2):
+            with self.settings(BEACON_JSON_INDENT=indent, BEACON_JSON_ENCODER="orjson"):
+                self.assertTrue(use_orjson())
+                rendered = render_json(self.data)
+            with self.settings(BEACON_JSON_INDENT=indent, BEACON_JSON_ENCODER="json"):
+                self.assertEqual(rendered, render_json(self.data))
+
+    #: Test the response contains the rendered JSON
+    def test_rendered_json_response(self):
+        response = RenderedJsonResponse(self.data, status=400)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(json.loads(response.content), self.data)
+
+    #: Test the compact info response is logged with its size
+    @override_settings(BEACON_JSON_INDENT=None)
+    def test_info_compact(self):
+        metadata_beacon = MetadataBeaconFactory()
+        MetadataBeaconOrganizationFactory(metadata_beacon=metadata_beacon)
+        MetadataBeaconDatasetFactory(metadata_beacon=metadata_beacon)
+        RemoteSiteFactory(name="public", key="public")
+        response = self.client.get(reverse("info"))
+        self.assertNotIn(b"\n", response.content)
+        self.assertNotIn(b'", "', response.content)
+        self.assertEqual(LogEntry.objects.get().response_size, len(response.content))
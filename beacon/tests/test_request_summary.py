@@ -0,0 +1,151 @@
+import datetime
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from .factories import LogEntryFactory, RemoteSiteFactory
+from ..models import RequestSummary, VariantRequestSummary
+from ..request_summary import (
+    add_request_summaries,
+    count_requests,
+    rebuild_request_summaries,
+)
+
+
+class TestRequestSummary(TestCase):
+    """Test case for summing up the logged requests per day"""
+
+    #: Set up remote site and log entries of two days
+    def setUp(self):
+        self.remote_site = RemoteSiteFactory()
+        self.log_entries = [
+            LogEntryFactory.build(
+                endpoint=endpoint,
+                remote_site=self.remote_site if endpoint == "query" else None,
+                status_code=status_code,
+                date_time=datetime.datetime(
+                    2021, 5, day, 12, tzinfo=datetime.timezone.utc
+                ),
+                chromosome="1",
+                start=100,
+                end=101,
+                reference="A",
+                alternative="C",
+            )
+            for endpoint, status_code, day in (
+                ("query", 200, 1),
+                ("query", 200, 1),
+                ("query", 400, 1),
+                ("query", 403, 2),
+                ("info", 200, 2),
+            )
+        ]
+
+    #: Test counting log entries
+    def test_count_requests(self):
+        requests, variants = count_requests(self.log_entries)
+        may_1 = datetime.date(2021, 5, 1)
+        may_2 = datetime.date(2021, 5, 2)
+        self.assertEqual(
+            requests,
+            {
+                (may_1, self.remote_site.id, "query", 200): 2,
+                (may_1, self.remote_site.id, "query", 400): 1,
+                (may_2, self.remote_site.id, "query", 403): 1,
+                (may_2, None, "info", 200): 1,
+            },
+        )
+        # requests rejected as invalid are not counted per allele
+        self.assertEqual(
+            variants,
+            {
+                (may_1, "GRCh37", "1", 100, 101, "A", "C"): 2,
+                (may_2, "GRCh37", "1", 100, 101, "A", "C"): 1,
+            },
+        )
+
+    #: Test adding log entries increments the summaries
+    def test_add_request_summaries(self):
+        add_request_summaries(self.log_entries)
+        add_request_summaries(self.log_entries[:1])
+        self.assertEqual(RequestSummary.objects.count(), 4)
+        self.assertEqual(
+            RequestSummary.objects.get(
+                date=datetime.date(2021, 5, 1), status_code=200
+            ).count,
+            3,
+        )
+        self.assertEqual(
+            RequestSummary.objects.get(remote_site__isnull=True).count,
+            1,
+        )
+        self.assertEqual(
+            list(
+                VariantRequestSummary.objects.order_by("date").values_list(
+                    "count", flat=True
+                )
+            ),
+            [3, 1],
+        )
+
+    #: Test the summaries of unknown clients are unique per day and request
+    def test_unique_unknown_remote_site(self):
+        fields = dict(
+            date=datetime.date(2021, 5, 1),
+            remote_site=None,
+            endpoint="info",
+            status_code=200,
+        )
+        RequestSummary.objects.create(**fields)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RequestSummary.objects.create(**fields)
+
+    #: Test rebuilding the summaries of all days
+    def test_rebuild_request_summaries(self):
+        for log_entry in self.log_entries:
+            log_entry.save()
+        add_request_summaries(self.log_entries)
+        self.assertEqual(rebuild_request_summaries(), 5)
+        self.assertEqual(RequestSummary.objects.count(), 4)
+        self.assertEqual(
+            sorted(RequestSummary.objects.values_list("count", flat=True)),
+            [1, 1, 1, 2],
+        )
+        self.assertEqual(
+            sorted(VariantRequestSummary.objects.values_list("count", flat=True)),
+            [1, 2],
+        )
+
+    #: Test rebuilding the summaries from a day on
+    def test_rebuild_request_summaries_since(self):
+        for log_entry in self.log_entries:
+            log_entry.save()
+        add_request_summaries(self.log_entries + self.log_entries)
+        self.assertEqual(rebuild_request_summaries(datetime.date(2021, 5, 2)), 2)
+        # the summaries of the previous day are kept
+        self.assertEqual(
+            sorted(RequestSummary.objects.values_list("count", flat=True)),
+            [1, 1, 2, 4],
+        )
+
+
+class TestRebuildRequestSummaries(TestCase):
+    """Test case for calling the admin command 'rebuild_request_summaries'"""
+
+    #: Test summaries are rebuilt from the logged requests
+    def test_handle(self):
+        LogEntryFactory(endpoint="info", status_code=200)
+        LogEntryFactory(endpoint="query", status_code=200)
+        out = StringIO()
+        call_command("rebuild_request_summaries", stdout=out)
+        self.assertEqual(
+            out.getvalue(),
+            "The request summaries were rebuilt from 2 logged requests.\n",
+        )
+        self.assertEqual(VariantRequestSummary.objects.count(), 1)
+
+    #: Test an invalid day
+    def test_handle_since_invalid(self):
+        with self.assertRaises(CommandError):
+            call_command("rebuild_request_summaries", "--since", "May")
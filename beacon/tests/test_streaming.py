@@ -0,0 +1,81 @@
+from django.http import JsonResponse
+from django.test import TestCase
+from ..streaming import JsonStream, StreamingJsonResponse
+
+
+class TestStreamingJsonResponse(TestCase):
+    """Test case for the incrementally rendered JSON responses"""
+
+    def setUp(self):
+        self.data = {
+            "exists": True,
+            "caseName": ["index_%d" % i for i in range(1000)],
+        }
+        self.completed = []
+
+    #: Test the body equals the content of a JsonResponse and is sent in chunks
+    def test_body(self):
+        response = StreamingJsonResponse(
+            self.data, json_dumps_params={"indent": 2}, chunk_size=1024
+        )
+        chunks = list(response.streaming_content)
+        content = JsonResponse(self.data, json_dumps_params={"indent": 2}).content
+        self.assertEqual(b"".join(chunks), content)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) >= 1024 for chunk in chunks[:-1]))
+        self.assertEqual(response.response_size, len(content))
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    #: Test the items of a JsonStream are only created while rendering them
+    def test_json_stream(self):
+        created = []
+
+        def create_items():
+            for i in range(1000):
+                created.append(i)
+                yield {"caseName": "index_%d" % i}
+
+        response = StreamingJsonResponse(
+            {"exists": True, "datasetAlleleResponses": JsonStream(create_items())},
+            json_dumps_params={"indent": 2},
+            chunk_size=1024,
+        )
+        chunks = iter(response.streaming_content)
+        body = next(chunks)
+        self.assertLess(len(created), 1000)
+        body += b"".join(chunks)
+        content = JsonResponse(
+            {
+                "exists": True,
+                "datasetAlleleResponses": [
+                    {"caseName": "index_%d" % i} for i in range(1000)
+                ],
+            },
+            json_dumps_params={"indent": 2},
+        ).content
+        self.assertEqual(body, content)
+
+    #: Test an empty JsonStream is rendered as empty list
+    def test_json_stream_empty(self):
+        response = StreamingJsonResponse({"datasetAlleleResponses": JsonStream([])})
+        self.assertEqual(
+            b"".join(response.streaming_content), b'{"datasetAlleleResponses": []}'
+        )
+
+    #: Test the callbacks are called once after the body was sent
+    def test_on_complete(self):
+        response = StreamingJsonResponse(self.data, chunk_size=1024)
+        response.on_complete(lambda r: self.completed.append(r.response_size))
+        chunks = iter(response.streaming_content)
+        body = next(chunks)
+        self.assertEqual(self.completed, [])
+        body += b"".join(chunks)
+        response.close()
+        self.assertEqual(self.completed, [len(body)])
+
+    #: Test the callbacks are called if the response is closed before being sent
+    def test_on_complete_closed(self):
+        response = StreamingJsonResponse(self.data)
+        response.on_complete(lambda r: self.completed.append(r.response_size))
+        response.close()
+        self.assertEqual(self.completed, [0])
@@ -8,8 +8,12 @@ from ..variant_accumulation import (
     VariantAccumulator20,
     VariantAccumulator20Internal,
     VariantAccumulator25,
+    AccumulationItem,
+    accumulate_by_level,
 )
 from ..beacon_schemas import AlleleResponseAccumulation
+from ..models import AlleleSummary
+from ..allele_summary import rebuild_allele_summaries
 
 
 class TestVariantAccumulator(TestCase):
@@ -154,3 +158,76 @@ class TestVariantAccumulator(TestCase):
         variant_accumulation.accumulate(allele_response)
         self.assertEqual(allele_response.variant_count_greater_ten, True)
         self.assertEqual(allele_response.frequency, 0)
+
+    def _accumulate_with_classes(self, levels):
+        accumulators = {
+            0: VariantAccumulator0,
+            5: VariantAccumulator5,
+            10: VariantAccumulator10,
+            15: VariantAccumulator15,
+            20: VariantAccumulator20,
+        }
+        allele_response = AlleleResponseAccumulation()
+        allele_response.variant = self.variant
+        for level in levels:
+            accumulators.get(level, VariantAccumulator25)().accumulate(allele_response)
+        allele_response.frequency = round(
+            allele_response.variant_count / allele_response.frequency_count, 2
+        )
+        return allele_response
+
+    def _assert_equal_responses(self, allele_response, expected):
+        self.assertEqual(allele_response.create_dict(), expected.create_dict())
+        self.assertEqual(
+            allele_response.internal_variant_count, expected.internal_variant_count
+        )
+        self.assertEqual(allele_response.frequency_count, expected.frequency_count)
+
+    #: Test the accumulation engine equals the accumulator classes per level
+    def test_accumulate_by_level(self):
+        item = AccumulationItem(
+            self.variant.get_variant_sample_frequency_count(),
+            [self.phenotype.phenotype],
+            [self.case.index],
+        )
+        for level in (0, 5, 10, 12, 15, 20, 25):
+            for n in (1, 10, 11):
+                self._assert_equal_responses(
+                    accumulate_by_level({level: [item] * n}),
+                    self._accumulate_with_classes([level] * n),
+                )
+        self.assertEqual(accumulate_by_level({}), AlleleResponseAccumulation())
+
+    #: Test the accumulation engine equals the accumulator classes for mixed levels
+    def test_accumulate_by_level_mixed(self):
+        item = AccumulationItem(
+            self.variant.get_variant_sample_frequency_count(),
+            [self.phenotype.phenotype],
+            [self.case.index],
+        )
+        for levels in ((25, 20, 15, 10), (20, 25, 5, 0), (25, 10)):
+            self._assert_equal_responses(
+                accumulate_by_level({level: [item] * 3 for level in levels}),
+                self._accumulate_with_classes(
+                    [level for level in levels for _ in range(3)]
+                ),
+            )
+
+    #: Test accumulating the summary of the variant equals accumulating the variant
+    def test_accumulate_summary(self):
+        rebuild_allele_summaries()
+        allele_summary = AlleleSummary.objects.get()
+        summary_item = AccumulationItem(
+            (
+                allele_summary.variant_count,
+                allele_summary.sample_count,
+                allele_summary.frequency_count,
+            ),
+            allele_summary.phenotypes,
+            [c.index for c in allele_summary.cases.all()],
+        )
+        for level in (0, 5, 10, 15, 20, 25):
+            self._assert_equal_responses(
+                accumulate_by_level({level: [summary_item] * 11}),
+                self._accumulate_with_classes([level] * 11),
+            )
@@ -0,0 +1,94 @@
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from ..models import AlleleSummary, Variant
+from .factories import VariantFactory
+
+
+class TestBackfillVariants(TestCase):
+    """Test case for the backfill_variants command"""
+
+    def setUp(self):
+        self.variants = VariantFactory.create_batch(3)
+        # variants stored before the allele keys existed
+        Variant.objects.update(allele_key=None, bin=None)
+
+    #: Test the missing allele keys are filled chunk-wise
+    def test_allele_keys(self):
+        out = StringIO()
+        call_command(
+            "backfill_variants", "--allele_keys", "--batch_size", "2", stdout=out
+        )
+        for v in self.variants:
+            v.set_allele_key()
+            self.assertEqual(Variant.objects.get(id=v.id).allele_key, v.allele_key)
+        self.assertIn("The allele_key of 3 variants were filled.", out.getvalue())
+
+    #: Test the missing bins are filled
+    def test_bins(self):
+        out = StringIO()
+        call_command("backfill_variants", "--bins", stdout=out)
+        for v in self.variants:
+            v.set_bin()
+            self.assertEqual(Variant.objects.get(id=v.id).bin, v.bin)
+        self.assertEqual(Variant.objects.filter(allele_key__isnull=True).count(), 3)
+
+    #: Test a field has to be selected
+    def test_no_field(self):
+        with self.assertRaises(CommandError):
+            call_command("backfill_variants", stdout=StringIO())
+
+
+class TestExplainAlleleLookup(TestCase):
+    """Test case for the explain_allele_lookup command"""
+
+    #: Test the synthetic variants are inserted and every query is explained
+    def test_populate(self):
+        out = StringIO()
+        call_command(
+            "explain_allele_lookup",
+            "--populate",
+            "50",
+            "--cases",
+            "3",
+            "--alleles",
+            "5",
+            "--repeat",
+            "1",
+            stdout=out,
+        )
+        self.assertEqual(Variant.objects.filter(allele_key__isnull=False).count(), 50)
+        self.assertEqual(Variant.objects.filter(bin__isnull=False).count(), 50)
+        self.assertIn("coordinates:", out.getvalue())
+        self.assertIn("allele_key_batch:", out.getvalue())
+        self.assertIn("region:", out.getvalue())
+        self.assertIn("allele_key: ", out.getvalue())
+        self.assertIn("DISTINCT: no", out.getvalue())
+
+    #: Test the summaries of the inserted variants are rebuilt if they are used
+    @override_settings(BEACON_QUERY_BACKEND="allele_summaries")
+    def test_populate_allele_summaries(self):
+        call_command(
+            "explain_allele_lookup",
+            "--populate",
+            "50",
+            "--cases",
+            "3",
+            "--alleles",
+            "5",
+            "--repeat",
+            "1",
+            stdout=StringIO(),
+        )
+        self.assertEqual(
+            AlleleSummary.objects.count(),
+            Variant.objects.values("chromosome", "start", "reference", "alternative")
+            .distinct()
+            .count(),
+        )
+
+    #: Test an empty database is reported
+    def test_no_variants(self):
+        with self.assertRaises(CommandError):
+            call_command("explain_allele_lookup", stdout=StringIO())
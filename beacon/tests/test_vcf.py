@@ -0,0 +1,216 @@
+import gzip
+import os
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from .factories import CaseFactory
+from ..binning import get_bin
+from ..management.commands.import_vcf import _parse_file
+from ..models import Variant
+from ..vcf import build_variants, parse_record, read_samples, split_genotype
+
+#: Header of a VCF file with the samples of a trio
+HEADER = (
+    "##fileformat=VCFv4.2\n"
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t%s\n"
+)
+
+
+class TestVcf(TestCase):
+    """Test case for parsing VCF files"""
+
+    #: Test the samples are read from the header line
+    def test_read_samples(self):
+        lines = iter((HEADER % "a\tb").splitlines(True) + ["1\t1\t.\tA\tC\n"])
+        self.assertEqual(read_samples(lines), ["a", "b"])
+        self.assertEqual(next(lines), "1\t1\t.\tA\tC\n")
+        with self.assertRaises(ValueError):
+            read_samples(iter(["1\t1\t.\tA\tC\n"]))
+
+    #: Test multi-allelic records are split and the chromosomes are mapped
+    def test_parse_record(self):
+        self.assertEqual(
+            parse_record(
+                "chrX\t100\t.\tac\tA,ACC,<DEL>\t.\t.\t.\tDP:GT\t5:1/2\t7\n", ["a", "b"]
+            ),
+            [
+                (23, 100, 101, "AC", "A", {"a": "1/0", "b": "./."}),
+                (23, 100, 101, "AC", "ACC", {"a": "0/1", "b": "./."}),
+            ],
+        )
+        self.assertEqual(parse_record("MT\t1\t.\tA\tC\t.\t.\t.\tGT\t1/1\n", ["a"]), [])
+
+    #: Test records with missing fields are rejected
+    def test_parse_record_malformed(self):
+        with self.assertRaisesMessage(
+            ValueError, "Malformed record with 2 instead of at least 8 fields: 1\t200"
+        ):
+            parse_record("1\t200\n", ["a"])
+
+    #: Test reducing genotypes to one allele
+    def test_split_genotype(self):
+        self.assertEqual(split_genotype("0|2", 2), "0|1")
+        self.assertEqual(split_genotype("1/2", 2), "0/1")
+        self.assertEqual(split_genotype("./.", 1), "./.")
+        self.assertEqual(split_genotype("1", 1), "1")
+
+    #: Test only cases with a carrier of the allele get a variant
+    def test_build_variants(self):
+        records = [(1, 100, 100, "A", "C", {"a": "0/1", "c": "0/0"})]
+        variants = list(
+            build_variants(records, [(1, ["a", "b"]), (2, ["c"])], "GRCh37")
+        )
+        self.assertEqual(len(variants), 1)
+        self.assertEqual(variants[0].case_id, 1)
+        self.assertEqual(variants[0].genotype, {"a": {"gt": "0/1"}, "b": {"gt": "./."}})
+
+
+class TestImportVcf(TestCase):
+    """Test case for the import_vcf command"""
+
+    #: Write a gzipped VCF file with the samples of a trio and an unknown sample
+    def setUp(self):
+        self.case = CaseFactory(structure="trio")
+        self.samples = [x["patient"] for x in self.case.pedigree]
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.test_dir.name, "trio.vcf.gz")
+        with gzip.open(self.path, "wt") as f:
+            f.write(HEADER % "\t".join(self.samples + ["unknown"]))
+            f.write("1\t12345\t.\tC\tT,G\t.\t.\t.\tGT\t0/1\t0/2\t0/0\t1/1\n")
+            f.write("2\t200\t.\tA\tC\t.\t.\t.\tGT\t0/0\t0/0\t0/0\t1/1\n")
+            f.write("Y\t300\t.\tAT\tA\t.\t.\t.\tGT\t1\t0\t.\t0\n")
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def _import(self, path=None, *args):
+        out = StringIO()
+        call_command(
+            "import_vcf", path or self.path, "--batch_size", "2", *args, stdout=out
+        )
+        return out.getvalue()
+
+    #: Test the variants of the case are imported once
+    def test_import_vcf(self):
+        out = self._import()
+        self.assertIn(
+            "The samples unknown of %s are not part of any case." % self.path, out
+        )
+        self.assertIn(
+            "3 variants of 1 cases were imported from 3 records of 1 files", out
+        )
+        self.assertEqual(
+            sorted(
+                Variant.objects.values_list(
+                    "chromosome", "start", "end", "reference", "alternative"
+                )
+            ),
+            [
+                (1, 12345, 12345, "C", "G"),
+                (1, 12345, 12345, "C", "T"),
+                (24, 300, 301, "AT", "A"),
+            ],
+        )
+        variant = Variant.objects.get(alternative="G")
+        self.assertEqual(variant.case, self.case)
+        self.assertEqual(
+            variant.genotype,
+            dict(zip(self.samples, [{"gt": "0/0"}, {"gt": "0/1"}, {"gt": "0/0"}])),
+        )
+        self.assertEqual(variant.get_variant_sample_frequency_count(), (1, 1, 2))
+        out = self._import()
+        self.assertIn(
+            "0 variants of 1 cases were imported from 3 records of 1 files, 3 variants already existed.",
+            out,
+        )
+        self.assertEqual(Variant.objects.count(), 3)
+
+    #: Test the files of a directory are parsed by several processes
+    def test_import_vcf_jobs(self):
+        case = CaseFactory()
+        with open(os.path.join(self.test_dir.name, "singleton.vcf"), "w") as f:
+            f.write(HEADER % case.index)
+            f.write("1\t12345\t.\tC\tT\t.\t.\t.\tGT\t0/1\n")
+        out = self._import(self.test_dir.name, "--jobs", "2")
+        self.assertIn(
+            "4 variants of 2 cases were imported from 4 records of 2 files", out
+        )
+        self.assertRegex(out, r"Process \d+ parsed \d files")
+        self.assertEqual(Variant.objects.filter(case=case).count(), 1)
+        self.assertEqual(Variant.objects.filter(case=self.case).count(), 3)
+
+    #: Test files without header are reported
+    def test_import_vcf_invalid_file(self):
+        with open(os.path.join(self.test_dir.name, "invalid.vcf"), "w") as f:
+            f.write("1\t12345\t.\tC\tT\n")
+        with self.assertRaisesMessage(CommandError, "The VCF file has no header line."):
+            self._import(self.test_dir.name)
+        self.assertEqual(Variant.objects.count(), 3)
+
+    #: Test a malformed record of a file parsed by a worker process is reported
+    def test_import_vcf_jobs_malformed(self):
+        with open(os.path.join(self.test_dir.name, "malformed.vcf"), "w") as f:
+            f.write(HEADER % self.samples[0])
+            f.write("1\t200\n")
+        with self.assertRaisesMessage(CommandError, "Malformed record"):
+            self._import(self.test_dir.name, "--jobs", "2")
+        self.assertEqual(Variant.objects.count(), 3)
+
+    #: Test unexpected errors of a worker process are reported
+    @mock.patch(
+        "beacon.management.commands.import_vcf.VcfReader.read_batches",
+        side_effect=RuntimeError("unexpected"),
+    )
+    def test_import_vcf_jobs_error(self, mock_read_batches):
+        with open(os.path.join(self.test_dir.name, "singleton.vcf"), "w") as f:
+            f.write(HEADER % self.samples[0])
+        with self.assertRaisesMessage(CommandError, "RuntimeError: unexpected"):
+            self._import(self.test_dir.name, "--jobs", "2")
+
+    #: Test the files of a worker process which died are reported
+    @mock.patch("beacon.management.commands.import_vcf._parse_file")
+    def test_import_vcf_jobs_died(self, mock_parse_file):
+        def exit_worker(*args):
+            # the start message of the worker is sent before it dies
+            time.sleep(0.5)
+            os._exit(1)
+
+        mock_parse_file.side_effect = exit_worker
+        with open(os.path.join(self.test_dir.name, "singleton.vcf"), "w") as f:
+            f.write(HEADER % self.samples[0])
+        with self.assertRaisesRegex(CommandError, r"The worker process \d+ stopped."):
+            self._import(self.test_dir.name, "--jobs", "2")
+
+    #: Test a parsed file is reported with its results instead of its reader
+    def test_parse_file_done(self):
+        messages = list(
+            _parse_file(self.path, [(self.case.id, self.samples)], "GRCh37", 2, False)
+        )
+        self.assertEqual([m[0] for m in messages], ["batch", "batch", "done"])
+        self.assertEqual(
+            messages[-1],
+            ("done", os.getpid(), self.path, mock.ANY, 3, [self.case.id], ["unknown"]),
+        )
+
+    #: Test importing only the packed allele counts
+    def test_import_vcf_packed(self):
+        self._import(None, "--packed")
+        variant = Variant.objects.get(alternative="G")
+        self.assertIsNone(variant.genotype)
+        self.assertEqual(bytes(variant.allele_counts), bytes([0, 1, 0]))
+        self.assertEqual(variant.get_variant_sample_frequency_count(), (1, 1, 2))
+
+    #: Test the imported variants get their allele keys and bins
+    def test_import_vcf_allele_key(self):
+        self._import(None)
+        for v in Variant.objects.all():
+            self.assertEqual(v.bin, get_bin(v.start, v.end))
+            self.assertEqual(
+                v.allele_key,
+                Variant.get_allele_key(
+                    v.release, v.chromosome, v.start, v.end, v.reference, v.alternative
+                ),
+            )
@@ -1,5 +1,6 @@
 import datetime
-from django.test import TestCase
+from unittest import mock
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from .factories import (
     MetadataBeaconFactory,
@@ -12,6 +13,8 @@ from .factories import (
     ProjectFactory,
     PhenotypeFactory,
 )
+from ..caches import authentication_cache
+from ..log_writer import LogWriter
 from ..views import CaseQueryEndpoint
 from ..models import (
     LogEntry,
@@ -22,8 +25,10 @@ from ..models import (
     Case,
     Consortium,
 )
+from django.db import connection
 from django.http import JsonResponse
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 
 
 class TestCaseInfoEndpoint(TestCase):
@@ -108,6 +113,46 @@ class TestCaseInfoEndpoint(TestCase):
         self.assertEqual(log.status_code, 200)
         self.assertIsInstance(log.response_size, int)
 
+    #: Test the rendered response is reused without querying the metadata
+    def test_get_info_cached(self):
+        content = self.client.get(reverse("info")).content
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("info"))
+        self.assertEqual(response.content, content)
+        self.assertFalse(any("metadata" in q["sql"] for q in context.captured_queries))
+        self.assertEqual(LogEntry.objects.count(), 2)
+
+    #: Test conditional GET requests are answered with 304 Not Modified
+    def test_get_info_not_modified(self):
+        response = self.client.get(reverse("info"))
+        etag = response["ETag"]
+        last_modified = response["Last-Modified"]
+        response = self.client.get(reverse("info"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+        response = self.client.get(
+            reverse("info"), HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(reverse("info"), HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+        log = LogEntry.objects.filter(status_code=304).first()
+        self.assertEqual(log.response_size, 0)
+        self.assertEqual(LogEntry.objects.count(), 4)
+
+    #: Test changed metadata are rendered again
+    def test_get_info_metadata_changed(self):
+        etag = self.client.get(reverse("info"))["ETag"]
+        self.metadata_beacon.name = "changed"
+        self.metadata_beacon.save()
+        response = self.client.get(reverse("info"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "changed")
+        self.assertNotEqual(response["ETag"], etag)
+        self.metadata_dataset.delete()
+        self.assertEqual(self.client.get(reverse("info")).json()["datasets"], [])
+
 
 class TestCaseQueryEndpoint(TestCase):
     """Test case for query endpoint"""
@@ -744,3 +789,470 @@ class TestCaseQueryEndpoint(TestCase):
             c._check_query_input(chromosome, start, "1234", reference, alternative),
             True,
         )
+
+    #: Test batch POST method for query endpoint
+    def test_post_query_batch(self):
+        p = ProjectFactory()
+        con = ConsortiumFactory(projects=[p], visibility_level=15)
+        c = CaseFactory(project=p)
+        VariantFactory(
+            case=c,
+            chromosome=1,
+            start=12345,
+            end=12345,
+            reference="C",
+            alternative="T",
+        )
+        RemoteSiteFactory(key="x", consortia=[con])
+        response = self.client.post(
+            reverse("query"),
+            {
+                "alleleRequests": [
+                    {
+                        "referenceName": 1,
+                        "start": 12344,
+                        "end": 12345,
+                        "referenceBases": "C",
+                        "alternateBases": "T",
+                    },
+                    {
+                        "referenceName": "X",
+                        "start": "100",
+                        "end": "101",
+                        "referenceBases": "A",
+                        "alternateBases": "G",
+                        "assemblyId": "GRCh38",
+                    },
+                ]
+            },
+            content_type="application/json",
+            HTTP_AUTHORIZATION="x",
+        )
+        self.assertEqual(response.status_code, 200)
+        output = response.json()
+        self.assertEqual(output["exists"], True)
+        self.assertEqual(output["error"], None)
+        self.assertEqual(
+            [a["assemblyId"] for a in output["alleleRequests"]], ["GRCh37", "GRCh38"]
+        )
+        self.assertEqual(
+            [r["exists"] for r in output["datasetAlleleResponses"]], [True, False]
+        )
+        self.assertEqual(output["datasetAlleleResponses"][0]["variantCount"], 1)
+        self.assertEqual(LogEntry.objects.count(), 2)
+        log = LogEntry.objects.get(chromosome="1")
+        self.assertEqual(log.cases.all()[::1], [c])
+        self.assertEqual(log.status_code, 200)
+        self.assertEqual(LogEntry.objects.get(chromosome="X").cases.count(), 0)
+
+    #: Test batch POST method with an invalid allele
+    def test_post_query_batch_invalid_input(self):
+        response = self.client.post(
+            reverse("query"),
+            {
+                "alleleRequests": [
+                    {
+                        "referenceName": 1,
+                        "start": 12344,
+                        "end": 12345,
+                        "referenceBases": "C",
+                        "alternateBases": "T",
+                    },
+                    {"referenceName": 1, "start": 12344},
+                ]
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["error"],
+            {"errorCode": 400, "errorMessage": "The input format is invalid."},
+        )
+        self.assertEqual(LogEntry.objects.count(), 1)
+        response = self.client.post(
+            reverse("query"), "no json", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    #: Test variants without allele key are found by their coordinates
+    def test_post_query_batch_without_allele_key(self):
+        p = ProjectFactory()
+        con = ConsortiumFactory(projects=[p], visibility_level=15)
+        c = CaseFactory(project=p)
+        for alternative in ("T", "G"):
+            VariantFactory(
+                case=c,
+                chromosome=1,
+                start=12345,
+                end=12345,
+                reference="C",
+                alternative=alternative,
+            )
+        Variant.objects.filter(alternative="T").update(allele_key=None)
+        RemoteSiteFactory(key="x", consortia=[con])
+        allele = {
+            "referenceName": 1,
+            "start": 12344,
+            "end": 12345,
+            "referenceBases": "C",
+        }
+        response = self.client.post(
+            reverse("query"),
+            {
+                "alleleRequests": [
+                    dict(allele, alternateBases="T"),
+                    dict(allele, alternateBases="G"),
+                    dict(allele, alternateBases="A"),
+                ]
+            },
+            content_type="application/json",
+            HTTP_AUTHORIZATION="x",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [r["exists"] for r in response.json()["datasetAlleleResponses"]],
+            [True, True, False],
+        )
+
+    #: Test batch POST method charges each allele to the access limit
+    def test_post_query_batch_exceeded_access_limit(self):
+        RemoteSiteFactory(key="3_access", access_limit=3)
+        allele = {
+            "referenceName": 1,
+            "start": 12344,
+            "end": 12345,
+            "referenceBases": "C",
+            "alternateBases": "T",
+        }
+        response = self.client.post(
+            reverse("query"),
+            {"alleleRequests": [allele] * 4},
+            content_type="application/json",
+            HTTP_AUTHORIZATION="3_access",
+        )
+        self.assertEqual(response.status_code, 403)
+        # the rejected request is logged and charged as well
+        response = self.client.post(
+            reverse("query"),
+            {"alleleRequests": [allele] * 2},
+            content_type="application/json",
+            HTTP_AUTHORIZATION="3_access",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["datasetAlleleResponses"]), 2)
+
+    #: Test the requests buffered by the log writer are charged to the access limit
+    @override_settings(BEACON_LOG_MODE="async")
+    @mock.patch("beacon.views.log_writer", new_callable=LogWriter)
+    @mock.patch("beacon.log_writer.threading.Thread")
+    def test_get_query_pending_access_limit(self, mock_thread, log_writer):
+        RemoteSiteFactory(key="1_access", access_limit=1)
+        params = {
+            "referenceName": 1,
+            "start": 12344,
+            "end": 12345,
+            "referenceBases": "C",
+            "alternateBases": "T",
+        }
+        response = self.client.get(
+            reverse("query"), params, HTTP_AUTHORIZATION="1_access"
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            reverse("query"), params, HTTP_AUTHORIZATION="1_access"
+        )
+        self.assertEqual(response.status_code, 403)
+        log_writer.flush()
+        self.assertEqual(
+            log_writer.pending(RemoteSite.objects.get(key="1_access").id), 0
+        )
+
+    #: Set up variants inside and outside of chr17:41,196,312-41,277,500
+    def _create_region_variants(self):
+        p = ProjectFactory()
+        con = ConsortiumFactory(projects=[p], visibility_level=15)
+        cases = [CaseFactory(project=p) for _ in range(3)]
+        # a deletion starting before the region
+        VariantFactory(
+            case=cases[0],
+            chromosome=17,
+            start=41196300,
+            end=41196320,
+            reference="C" * 21,
+            alternative="C",
+        )
+        for c in cases[1:]:
+            VariantFactory(
+                case=c,
+                chromosome=17,
+                start=41200000,
+                end=41200000,
+                reference="A",
+                alternative="G",
+            )
+        VariantFactory(
+            case=cases[0],
+            chromosome=17,
+            start=41277501,
+            end=41277501,
+            reference="A",
+            alternative="G",
+        )
+        VariantFactory(
+            case=cases[0],
+            chromosome=1,
+            start=41200000,
+            end=41200000,
+            reference="A",
+            alternative="G",
+        )
+        # a variant of a project not visible to the remote site
+        VariantFactory(
+            case=CaseFactory(project=ProjectFactory()),
+            chromosome=17,
+            start=41200001,
+            end=41200001,
+            reference="A",
+            alternative="G",
+        )
+        RemoteSiteFactory(key="x", consortia=[con])
+        return cases
+
+    #: Test region request answered per allele
+    def test_get_query_region(self):
+        cases = self._create_region_variants()
+        response = self.client.get(
+            reverse("query"),
+            {
+                "queryMode": "region",
+                "referenceName": 17,
+                "start": 41196311,
+                "end": 41277500,
+            },
+            HTTP_AUTHORIZATION="x",
+        )
+        self.assertEqual(response.status_code, 200)
+        output = response.json()
+        self.assertEqual(output["exists"], True)
+        self.assertEqual(
+            output["regionRequest"],
+            {
+                "referenceName": "17",
+                "start": "41196311",
+                "end": "41277500",
+                "assemblyId": "GRCh37",
+                "aggregate": False,
+            },
+        )
+        self.assertEqual(
+            [
+                (r["start"], r["end"], r["referenceBases"], r["alternateBases"])
+                for r in output["datasetAlleleResponses"]
+            ],
+            [(41196299, 41196320, "C" * 21, "C"), (41199999, 41200000, "A", "G")],
+        )
+        self.assertEqual(
+            [r["variantCount"] for r in output["datasetAlleleResponses"]], [1, 2]
+        )
+        log = LogEntry.objects.get()
+        self.assertEqual(log.chromosome, "17")
+        self.assertEqual(log.start, 41196311)
+        self.assertEqual(log.end, 41277500)
+        self.assertEqual(log.reference, None)
+        self.assertEqual(set(log.cases.all()), set(cases))
+
+    #: Test the streamed region answer equals the rendered one
+    def test_get_query_region_streaming(self):
+        self._create_region_variants()
+        data = {
+            "queryMode": "region",
+            "referenceName": 17,
+            "start": 41196311,
+            "end": 41277500,
+        }
+        content = self.client.get(
+            reverse("query"), data, HTTP_AUTHORIZATION="x"
+        ).content
+        with self.settings(BEACON_STREAMING_RESPONSES=True):
+            response = self.client.get(reverse("query"), data, HTTP_AUTHORIZATION="x")
+            self.assertTrue(response.streaming)
+            self.assertEqual(b"".join(response.streaming_content), content)
+
+    #: Test region request answered by one aggregated response
+    def test_post_query_region_aggregate(self):
+        self._create_region_variants()
+        response = self.client.post(
+            reverse("query"),
+            {
+                "queryMode": "region",
+                "aggregate": "true",
+                "referenceName": 17,
+                "start": 41196311,
+                "end": 41277500,
+            },
+            HTTP_AUTHORIZATION="x",
+        )
+        self.assertEqual(response.status_code, 200)
+        output = response.json()
+        self.assertEqual(len(output["datasetAlleleResponses"]), 1)
+        self.assertEqual(output["datasetAlleleResponses"][0]["variantCount"], 3)
+        self.assertEqual(output["datasetAlleleResponses"][0]["sampleCount"], 3)
+        self.assertNotIn("referenceBases", output["datasetAlleleResponses"][0])
+        response = self.client.post(
+            reverse("query"),
+            {
+                "queryMode": "region",
+                "aggregate": "true",
+                "referenceName": 17,
+                "start": 100,
+                "end": 200,
+            },
+            HTTP_AUTHORIZATION="x",
+        )
+        self.assertEqual(response.json()["exists"], False)
+        self.assertEqual(response.json()["datasetAlleleResponses"], [])
+
+    #: Test region requests with invalid or too large regions
+    @override_settings(BEACON_MAX_REGION_SIZE=1000)
+    def test_get_query_region_invalid_input(self):
+        for start, end in (
+            ("100", "1101"),
+            ("100", "100"),
+            ("100", None),
+            ("200", "100"),
+        ):
+            data = {"queryMode": "region", "referenceName": 17, "start": start}
+            if end is not None:
+                data["end"] = end
+            response = self.client.get(reverse("query"), data)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(
+                response.json()["error"],
+                {"errorCode": 400, "errorMessage": "The input format is invalid."},
+            )
+        self.assertEqual(LogEntry.objects.count(), 4)
+
+    #: Test the streamed answer equals the rendered answer and is logged after sending
+    def test_get_query_streaming(self):
+        p = ProjectFactory()
+        con = ConsortiumFactory(projects=[p], visibility_level=0)
+        for _ in range(3):
+            VariantFactory(
+                case=CaseFactory(project=p),
+                chromosome=1,
+                start=12345,
+                end=12345,
+                reference="C",
+                alternative="T",
+            )
+        RemoteSiteFactory(key="x", consortia=[con])
+        data = {
+            "referenceName": 1,
+            "start": 12344,
+            "end": 12345,
+            "referenceBases": "C",
+            "alternateBases": "T",
+        }
+        content = self.client.get(
+            reverse("query"), data, HTTP_AUTHORIZATION="x"
+        ).content
+        with self.settings(BEACON_STREAMING_RESPONSES=True):
+            response = self.client.get(reverse("query"), data, HTTP_AUTHORIZATION="x")
+            self.assertTrue(response.streaming)
+            self.assertEqual(LogEntry.objects.count(), 1)
+            self.assertEqual(b"".join(response.streaming_content), content)
+        log = LogEntry.objects.latest("id")
+        self.assertEqual(log.response_size, len(content))
+        self.assertEqual(log.status_code, 200)
+        self.assertEqual(log.cases.count(), 3)
+
+    #: Test the streamed batch answer is logged per allele after sending
+    @override_settings(BEACON_STREAMING_RESPONSES=True)
+    def test_post_query_batch_streaming(self):
+        allele = {
+            "referenceName": 1,
+            "start": 12344,
+            "end": 12345,
+            "referenceBases": "C",
+            "alternateBases": "T",
+        }
+        with self.settings(BEACON_STREAMING_RESPONSES=False):
+            rendered = self.client.post(
+                reverse("query"),
+                {"alleleRequests": [allele] * 2},
+                content_type="application/json",
+            ).content
+        LogEntry.objects.all().delete()
+        response = self.client.post(
+            reverse("query"),
+            {"alleleRequests": [allele] * 2},
+            content_type="application/json",
+        )
+        self.assertEqual(LogEntry.objects.count(), 0)
+        content = b"".join(response.streaming_content)
+        self.assertEqual(content, rendered)
+        self.assertEqual(LogEntry.objects.count(), 2)
+        self.assertEqual(
+            [log.response_size for log in LogEntry.objects.all()],
+            [len(content) // 2] * 2,
+        )
+        response = self.client.post(
+            reverse("query"), "no json", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        response.close()
+        self.assertEqual(LogEntry.objects.count(), 3)
+
+    #: Test number of queries does not grow with the number of matching cases
+    def test_get_query_constant_number_of_queries(self):
+        consortia = [
+            ConsortiumFactory(visibility_level=level) for level in range(0, 30, 5)
+        ]
+        RemoteSiteFactory(key="x", consortia=consortia)
+
+        def add_matching_cases():
+            for consortium in consortia:
+                p = ProjectFactory()
+                consortium.projects.add(p)
+                c = CaseFactory(project=p, structure="trio")
+                PhenotypeFactory(case=c)
+                PhenotypeFactory(case=c)
+                VariantFactory(
+                    case=c,
+                    chromosome=1,
+                    start=12345,
+                    end=12345,
+                    reference="C",
+                    alternative="T",
+                )
+
+        def count_queries():
+            authentication_cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(
+                    reverse("query"),
+                    {
+                        "referenceName": 1,
+                        "start": 12344,
+                        "end": 12345,
+                        "referenceBases": "C",
+                        "alternateBases": "T",
+                    },
+                    HTTP_AUTHORIZATION="x",
+                )
+            self.assertEqual(response.status_code, 200)
+            return len(context.captured_queries)
+
+        add_matching_cases()
+        # creates the access counter of today
+        count_queries()
+        num_queries = count_queries()
+        for _ in range(5):
+            add_matching_cases()
+        self.assertEqual(Variant.objects.count(), 36)
+        self.assertEqual(count_queries(), num_queries)
+
+
+@override_settings(BEACON_QUERY_BACKEND="allele_summaries")
+class TestCaseQueryEndpointAlleleSummaries(TestCaseQueryEndpoint):
+    """Test case for query endpoint answering from the allele summaries"""
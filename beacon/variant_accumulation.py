@@ -1,5 +1,44 @@
-from .models import Phenotype
 from abc import ABC, abstractmethod
+from collections import namedtuple
+from .beacon_schemas import AlleleResponseAccumulation
+from .hpo import get_ontology
+
+#: The information a visibility level reveals: the count field receiving the number of
+#: alleles (None if hidden), whether variantCount>10 is revealed and whether coarse
+#: phenotypes, phenotypes and case indices are revealed
+VisibilityRule = namedtuple(
+    "VisibilityRule",
+    ["count_field", "greater_ten", "coarse_phenotype", "phenotype", "case_index"],
+)
+
+#: Rules of the visibility levels, all other levels fall back to level 25
+VISIBILITY_RULES = {
+    0: VisibilityRule("variant_count", True, False, True, True),
+    5: VisibilityRule("variant_count", True, False, True, False),
+    10: VisibilityRule("variant_count", True, True, False, False),
+    15: VisibilityRule("variant_count", True, False, False, False),
+    20: VisibilityRule("internal_variant_count", True, False, False, False),
+    25: VisibilityRule(None, False, False, False, False),
+}
+
+#: The counts (number of alleles, samples, total number of alleles), HPO terms and
+#: case indices of a variant or of the variants summed up in an AlleleSummary
+AccumulationItem = namedtuple(
+    "AccumulationItem", ["counts", "phenotypes", "case_indices"]
+)
+
+
+def get_variant_counts(allele_response):
+    """
+    Returns the counts of the current variant, which are computed once per query for all
+    matched variants if possible.
+
+    :param allele_response: An AlleleResponseAccumulation object.
+    :return: integer of number of alleles, samples and total numbers of alleles
+    """
+    if allele_response.variant_counts is not None:
+        return allele_response.variant_counts
+    return allele_response.variant.get_variant_sample_frequency_count()
 
 
 class VariantAccumulator(ABC):
@@ -43,7 +82,7 @@ class VariantAccumulator25(VariantAccumulator):
         """
         super(VariantAccumulator25, self).accumulate_variant(allele_response)
         allele_response.exists = True
-        counts = allele_response.variant.get_variant_sample_frequency_count()
+        counts = get_variant_counts(allele_response)
         allele_response.sample_count += counts[1]
         allele_response.frequency_count += counts[2]
 
@@ -79,9 +118,7 @@ class VariantAccumulator20(VariantAccumulator20Internal):
 
         :param allele_response: An AlleleResponseAccumulation object.
         """
-        allele_response.internal_variant_count += (
-            allele_response.variant.get_variant_sample_frequency_count()[0]
-        )
+        allele_response.internal_variant_count += get_variant_counts(allele_response)[0]
         super(VariantAccumulator20, self).accumulate_variant(allele_response)
 
 
@@ -98,9 +135,7 @@ class VariantAccumulator15(VariantAccumulator20Internal):
 
         :param allele_response: An AlleleResponseAccumulation object.
         """
-        allele_response.variant_count += (
-            allele_response.variant.get_variant_sample_frequency_count()[0]
-        )
+        allele_response.variant_count += get_variant_counts(allele_response)[0]
         super(VariantAccumulator15, self).accumulate_variant(allele_response)
 
 
@@ -118,7 +153,8 @@ class VariantAccumulator10(VariantAccumulator15):
         :param allele_response: An AlleleResponseAccumulation object.
         """
         super(VariantAccumulator10, self).accumulate_variant(allele_response)
-        for p in Phenotype.objects.filter(case=allele_response.variant.case):
+        # uses the phenotypes prefetched with the case if available
+        for p in allele_response.variant.case.phenotype_set.all():
             allele_response.coarse_phenotype = allele_response.coarse_phenotype.union(
                 p.get_coarse_phenotype()
             )
@@ -138,7 +174,8 @@ class VariantAccumulator5(VariantAccumulator15):
         :param allele_response: An AlleleResponseAccumulation object.
         """
         super(VariantAccumulator5, self).accumulate_variant(allele_response)
-        for p in Phenotype.objects.filter(case=allele_response.variant.case):
+        # uses the phenotypes prefetched with the case if available
+        for p in allele_response.variant.case.phenotype_set.all():
             allele_response.phenotype = allele_response.phenotype.union({p.phenotype})
 
 
@@ -158,3 +195,70 @@ class VariantAccumulator0(VariantAccumulator5):
         super(VariantAccumulator0, self).accumulate_variant(allele_response)
         # get case identifier
         allele_response.case_indices.append(allele_response.variant.case.index)
+
+
+def get_visibility_rule(level):
+    """
+    Returns the information revealed by a visibility level.
+
+    :param level: A visibility level integer.
+    :return: VisibilityRule tuple
+    """
+    return VISIBILITY_RULES.get(level, VISIBILITY_RULES[25])
+
+
+def accumulate_by_level(items_by_level):
+    """
+    Accumulates the information about the variants of an allele according to the
+    visibility levels of their projects in one pass per level. The result equals
+    accumulating each variant with the accumulator class of its level and computing
+    the frequency afterwards.
+
+    :param items_by_level: A dict mapping visibility levels to lists of AccumulationItem tuples.
+    :return: AlleleResponseAccumulation object
+    """
+    allele_response = AlleleResponseAccumulation()
+    greater_ten = False
+    for level, items in items_by_level.items():
+        if not items:
+            continue
+        rule = get_visibility_rule(level)
+        c_variant, c_sample, c_frequency = map(sum, zip(*(i.counts for i in items)))
+        allele_response.exists = True
+        allele_response.sample_count += c_sample
+        allele_response.frequency_count += c_frequency
+        if rule.count_field:
+            setattr(
+                allele_response,
+                rule.count_field,
+                getattr(allele_response, rule.count_field) + c_variant,
+            )
+        greater_ten = greater_ten or rule.greater_ten
+        if rule.phenotype or rule.coarse_phenotype:
+            terms = {term for i in items for term in i.phenotypes}
+            if rule.phenotype:
+                allele_response.phenotype = allele_response.phenotype.union(terms)
+            if rule.coarse_phenotype:
+                ontology = get_ontology()
+                for term in terms:
+                    # a term without coarse ancestors is a coarse term itself
+                    allele_response.coarse_phenotype = (
+                        allele_response.coarse_phenotype.union(
+                            ontology.get_coarse_terms(term) or {term}
+                        )
+                    )
+        if rule.case_index:
+            allele_response.case_indices.extend(
+                index for i in items for index in i.case_indices
+            )
+    # the counts only grow, so checking the totals equals checking after each variant
+    if (
+        greater_ten
+        and allele_response.variant_count + allele_response.internal_variant_count > 10
+    ):
+        allele_response.variant_count_greater_ten = True
+    if allele_response.exists:
+        allele_response.frequency = round(
+            (allele_response.variant_count / allele_response.frequency_count), 2
+        )
+    return allele_response
@@ -0,0 +1,261 @@
+import gzip
+import re
+from itertools import islice
+from .models import Variant
+
+#: Maps the reference names of a VCF file without "chr" prefix to the chromosome values stored for a Variant
+VCF_CHROMOSOME_MAPPING = {name: value for value, name in Variant.CHROMOSOME_CHOICES}
+
+#: Fields of a Variant object passed between processes
+VARIANT_FIELDS = (
+    "case_id",
+    "release",
+    "chromosome",
+    "start",
+    "end",
+    "reference",
+    "alternative",
+    "genotype",
+    "allele_counts",
+    "allele_key",
+    "bin",
+)
+
+#: Separators of the alleles in a genotype
+GENOTYPE_SEPARATOR = re.compile(r"([/|])")
+
+
+def open_vcf(path):
+    """
+    Opens a plain or gzip/bgzip compressed VCF file for reading lines.
+
+    :param path: Path of the VCF file.
+    :return: text file object
+    """
+    with open(path, "rb") as f:
+        compressed = f.read(2) == b"\x1f\x8b"
+    if compressed:
+        return gzip.open(path, "rt")
+    return open(path, "r")
+
+
+def read_samples(lines):
+    """
+    Reads the header of a VCF file up to the column names.
+
+    :param lines: An iterator of the lines of a VCF file, consumed up to the header line.
+    :return: list of sample names
+    """
+    for line in lines:
+        if line.startswith("#CHROM"):
+            return line.rstrip("\n").split("\t")[9:]
+        if not line.startswith("##"):
+            break
+    raise ValueError("The VCF file has no header line.")
+
+
+def match_cases(samples, cases):
+    """
+    Finds the cases whose pedigree contains samples of a VCF file.
+
+    :param samples: List of the sample names of the VCF file.
+    :param cases: A list of (case id, list of sample names of the pedigree) tuples.
+    :return: list of the matching (case id, list of sample names) tuples, list of the
+     sample names not part of any case
+    """
+    matched_cases = [
+        (case_id, patients)
+        for case_id, patients in cases
+        if set(patients).intersection(samples)
+    ]
+    matched = {patient for _, patients in matched_cases for patient in patients}
+    return matched_cases, [sample for sample in samples if sample not in matched]
+
+
+def parse_record(line, samples):
+    """
+    Parses a record of a VCF file and splits it into its alternative alleles. Records on
+    other reference sequences than the chromosomes 1-22, X and Y, symbolic and missing
+    alleles are skipped. Records with less than the 8 mandatory fields raise a
+    ValueError.
+
+    :param line: A record line of a VCF file.
+    :param samples: List of the sample names of the VCF file.
+    :return: list of (chromosome, start, end, reference, alternative, dict mapping
+     sample names to genotype strings) tuples with the 1-based start position, the
+     genotypes only contain the number of the alternative allele as "1"
+    """
+    fields = line.rstrip("\n").split("\t")
+    if len(fields) < 8:
+        raise ValueError(
+            "Malformed record with %d instead of at least 8 fields: %s"
+            % (len(fields), line.rstrip("\n"))
+        )
+    name = fields[0]
+    if name[:3].lower() == "chr":
+        name = name[3:]
+    chromosome = VCF_CHROMOSOME_MAPPING.get(name.upper())
+    if chromosome is None:
+        return []
+    start = int(fields[1])
+    reference = fields[3].upper()
+    end = start + len(reference) - 1
+    if len(fields) > 9:
+        keys = fields[8].split(":")
+        gt_index = keys.index("GT") if "GT" in keys else None
+        genotypes = {
+            sample: (
+                value.split(":")[gt_index]
+                if gt_index is not None and len(value.split(":")) > gt_index
+                else "./."
+            )
+            for sample, value in zip(samples, fields[9:])
+        }
+    else:
+        genotypes = {}
+    records = []
+    for allele, alternative in enumerate(fields[4].split(","), start=1):
+        if alternative in (".", "*") or alternative.startswith("<"):
+            continue
+        records.append(
+            (
+                chromosome,
+                start,
+                end,
+                reference,
+                alternative.upper(),
+                {
+                    sample: split_genotype(gt, allele)
+                    for sample, gt in genotypes.items()
+                },
+            )
+        )
+    return records
+
+
+def split_genotype(gt, allele):
+    """
+    Reduces a genotype to one alternative allele, e.g. "1/2" is "0/1" for the allele 2.
+
+    :param gt: A genotype string of a VCF file.
+    :param allele: Number of the alternative allele.
+    :return: genotype string with "1" for the allele, "0" for other alleles and "." if missing
+    """
+    return "".join(
+        part if part in ("/", "|", ".") else ("1" if part == str(allele) else "0")
+        for part in GENOTYPE_SEPARATOR.split(gt)
+    )
+
+
+def build_variants(records, cases, release, packed=False):
+    """
+    Creates the variants of the cases with at least one sample carrying the allele.
+
+    :param records: An iterable of tuples returned by parse_record.
+    :param cases: A list of (case id, list of sample names of the pedigree) tuples.
+    :param release: The genome build of the VCF file.
+    :param packed: Store only the packed allele counts instead of the genotype JSON.
+    :return: generator of unsaved Variant objects
+    """
+    for chromosome, start, end, reference, alternative, genotypes in records:
+        for case_id, patients in cases:
+            genotype = {
+                patient: {"gt": genotypes.get(patient, "./.")} for patient in patients
+            }
+            if any("1" in g["gt"] for g in genotype.values()):
+                variant = Variant(
+                    release=release,
+                    chromosome=chromosome,
+                    start=start,
+                    end=end,
+                    reference=reference,
+                    alternative=alternative,
+                    case_id=case_id,
+                )
+                variant.set_allele_key()
+                variant.set_bin()
+                if packed:
+                    variant.allele_counts = bytes(
+                        genotype[patient]["gt"].count("1") for patient in patients
+                    )
+                else:
+                    variant.genotype = genotype
+                yield variant
+
+
+def get_variant_key(variant):
+    """
+    Returns the values identifying a variant of a case.
+
+    :param variant: A Variant object.
+    :return: (case id, release, chromosome, start, end, reference, alternative) tuple
+    """
+    return (
+        variant.case_id,
+        variant.release,
+        variant.chromosome,
+        variant.start,
+        variant.end,
+        variant.reference,
+        variant.alternative,
+    )
+
+
+class VcfReader:
+    """
+    Streams the variants of the cases from a VCF file in batches.
+    """
+
+    def __init__(self, path, cases, release, packed=False):
+        #: Path of the VCF file
+        self.path = path
+        #: List of (case id, list of sample names of the pedigree) tuples of all cases
+        self.cases = cases
+        #: Genome build of the file
+        self.release = release
+        #: Store only the packed allele counts of the variants
+        self.packed = packed
+        #: Number of records read
+        self.records = 0
+        #: List of (case id, list of sample names) tuples of the cases in the file
+        self.matched_cases = []
+        #: Samples of the file which are not part of any case
+        self.unmatched_samples = []
+
+    def read_batches(self, batch_size):
+        """
+        Reads the file and creates the variants of the cases.
+
+        :param batch_size: Maximal number of variants per batch.
+        :return: generator of lists of unsaved Variant objects
+        """
+        with open_vcf(self.path) as f:
+            samples = read_samples(f)
+            self.matched_cases, self.unmatched_samples = match_cases(
+                samples, self.cases
+            )
+            variants = build_variants(
+                self._read_records(f, samples),
+                self.matched_cases,
+                self.release,
+                self.packed,
+            )
+            while True:
+                batch = list(islice(variants, batch_size))
+                if not batch:
+                    return
+                yield batch
+
+    def _read_records(self, lines, samples):
+        """
+        Parses the records of the file.
+
+        :param lines: An iterator of the lines of the file after the header.
+        :param samples: List of the sample names of the file.
+        :return: generator of tuples returned by parse_record
+        """
+        for line in lines:
+            if not line.strip() or line.startswith("#"):
+                continue
+            self.records += 1
+            yield from parse_record(line, samples)
@@ -1,35 +1,43 @@
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.views import View
+import json
 import re
+from django.db.models import Prefetch, Q
 from .models import (
+    AlleleSummary,
+    Case,
     Variant,
-    RemoteSite,
-    Consortium,
     LogEntry,
     MetadataBeacon,
-    MetadataBeaconOrganization,
-    MetadataBeaconDataset,
 )
 from .beacon_schemas import (
     AlleleRequest,
-    AlleleResponseAccumulation,
+    BatchQueryResponse,
     Error,
-    InfoResponse,
-    DatasetResponse,
-    OrganizationResponse,
     QueryResponse,
+    RegionQueryResponse,
+    RegionRequest,
 )
 from .variant_accumulation import (
-    VariantAccumulator0,
-    VariantAccumulator5,
-    VariantAccumulator10,
-    VariantAccumulator15,
-    VariantAccumulator20,
-    VariantAccumulator25,
+    AccumulationItem,
+    accumulate_by_level,
+    get_visibility_rule,
 )
-from datetime import date
+from .access_counter import get_access_counter
+from .binning import MAX_BIN_POSITION, get_overlapping_bins
+from .genotypes import count_variants
+from .log_writer import log_writer
+from .rendering import RenderedJsonResponse, get_json_dumps_params
+from .streaming import JsonStream, StreamingJsonResponse
+from .caches import authentication_cache, info_response_cache
 from django.utils import timezone
 
+#: Maps the accepted reference names to the chromosome values stored for a Variant
+CHROMOSOME_MAPPING = {name: value for value, name in Variant.CHROMOSOME_CHOICES}
+
 
 class CaseInfoEndpoint(View):
     def get(self, request, *args, **kwargs):
@@ -43,63 +51,45 @@ class CaseInfoEndpoint(View):
 
     def _handle(self, request, *args, **kwargs):
         """
-        Handles requests for beacon 'info' endpoint.
+        Handles requests for beacon 'info' endpoint. The response is rendered once and
+        answered with 304 Not Modified if the client has got it already.
 
         :param request: A django HttpRequest object.
-        :return: JSONResponse
+        :return: HttpResponse
         """
-        # collect metadata from database
-        metadata_beacon = MetadataBeacon.objects.all()
-        datasets = MetadataBeaconDataset.objects.filter(
-            metadata_beacon=metadata_beacon[0]
-        )
-        datasets_dict_list = []
-        for d in datasets:
-            # create json response scheme for dataset
-            datasets_dict = DatasetResponse(
-                d.beacon_data_id,
-                d.name,
-                d.assembly_id,
-                d.create_date_time,
-                d.update_date_time,
-            ).create_dict()
-            datasets_dict_list.append(datasets_dict)
-        organisations = MetadataBeaconOrganization.objects.filter(
-            metadata_beacon=metadata_beacon[0]
-        )
-        # create json response scheme for organization
-        dict_org = OrganizationResponse(
-            organisations[0].beacon_org_id,
-            organisations[0].name,
-            organisations[0].contact_url,
-        ).create_dict()
-        # create json output scheme for info endpoint
-        output = JsonResponse(
-            InfoResponse(
-                metadata_beacon[0].beacon_id,
-                metadata_beacon[0].name,
-                metadata_beacon[0].api_version,
-                datasets_dict_list,
-                dict_org,
-            ).create_dict(),
-            json_dumps_params={"indent": 2},
+        info_response = info_response_cache.get()
+        output = get_conditional_response(
+            request,
+            etag=info_response.etag,
+            last_modified=info_response.last_modified,
         )
+        if output is None:
+            output = HttpResponse(
+                info_response.content, content_type="application/json"
+            )
+        output["ETag"] = info_response.etag
+        output["Last-Modified"] = http_date(info_response.last_modified)
         # log request
-        LogEntry(
-            ip_address=request.META.get("REMOTE_ADDR"),
-            user_identifier=request.META.get("USER"),
-            remote_site=RemoteSite.objects.get(name="public"),
-            date_time=timezone.now(),
-            method=request.method,
-            endpoint="info",
-            server_protocol=request.META["SERVER_PROTOCOL"],
-            status_code=output.status_code,
-            response_size=len(output.content),
-        ).save()
+        log_writer.write(
+            LogEntry(
+                ip_address=request.META.get("REMOTE_ADDR"),
+                user_identifier=request.META.get("USER"),
+                remote_site=info_response.public_site,
+                date_time=timezone.now(),
+                method=request.method,
+                endpoint="info",
+                server_protocol=request.META["SERVER_PROTOCOL"],
+                status_code=output.status_code,
+                response_size=len(output.content),
+            )
+        )
         return output
 
 
 class CaseQueryEndpoint(View):
+    #: Number of positions looked up per database query
+    QUERY_CHUNK_SIZE = 500
+
     def get(self, request, *args, **kwargs):
         """
         GET method for beacon '/query' endpoint.
@@ -113,6 +103,11 @@ class CaseQueryEndpoint(View):
         reference = request.GET.get("referenceBases")
         alternative = request.GET.get("alternateBases")
         release = request.GET.get("assemblyId")
+        # a region request asks for all alleles overlapping the range
+        if request.GET.get("queryMode") == "region":
+            return self._handle_region(
+                request, chromosome, start, end, release, request.GET.get("aggregate")
+            )
         return self._handle(
             request, chromosome, start, end, reference, alternative, release
         )
@@ -124,12 +119,20 @@ class CaseQueryEndpoint(View):
         :param request: A django HttpRequest object containing posted data and headers.
         :rtype: JSONResponse
         """
+        # a JSON body contains a batch of allele requests
+        if request.content_type == "application/json":
+            return self._handle_batch(request)
         chromosome = request.POST.get("referenceName")
         start = request.POST.get("start")
         end = request.POST.get("end")
         reference = request.POST.get("referenceBases")
         alternative = request.POST.get("alternateBases")
         release = request.POST.get("assemblyId")
+        # a region request asks for all alleles overlapping the range
+        if request.POST.get("queryMode") == "region":
+            return self._handle_region(
+                request, chromosome, start, end, release, request.POST.get("aggregate")
+            )
         return self._handle(
             request, chromosome, start, end, reference, alternative, release
         )
@@ -166,14 +169,15 @@ class CaseQueryEndpoint(View):
                 key = request.headers["Authorization"]
             else:
                 key = "public"
-            remote_site = self._authenticate(key)
+            authenticated_site = self._authenticate(key)
             # authentication failed
-            if not list(remote_site):
+            if authenticated_site is None:
                 output_json["error"] = Error(
                     401, "You are not authorized as a user."
                 ).create_dict()
-                remote_site = [None]
+                remote_site = None
                 raise UnboundLocalError()
+            remote_site = authenticated_site.remote_site
             # check if input parameters are valid
             if self._check_query_input(chromosome, start, end, reference, alternative):
                 output_json["error"] = Error(
@@ -181,14 +185,14 @@ class CaseQueryEndpoint(View):
                 ).create_dict()
                 raise UnboundLocalError()
             # check if access limit of remote site is exceeded
-            if self._check_access_limit(remote_site[0]):
+            if self._check_access_limit(remote_site):
                 output_json["error"] = Error(
                     403, "You have exceeded your access limit."
                 ).create_dict()
                 raise UnboundLocalError()
             # query database for variant request
             query_parameters, cases = self._query_variant(
-                remote_site[0].consortia,
+                authenticated_site.visibility_levels,
                 chromosome,
                 start,
                 end,
@@ -202,18 +206,16 @@ class CaseQueryEndpoint(View):
             else:
                 output_json["exists"] = True
                 output_json["datasetAlleleResponses"] = [query_parameters.create_dict()]
-            output = JsonResponse(output_json, json_dumps_params={"indent": 2})
+            output = self._create_response(output_json)
         except UnboundLocalError:  # Not authenticated or invalid arguments
-            output = JsonResponse(
-                output_json,
-                status=output_json["error"]["errorCode"],
-                json_dumps_params={"indent": 2},
+            output = self._create_response(
+                output_json, status=output_json["error"]["errorCode"]
             )
         # log request
         log_entry = LogEntry(
             ip_address=request.META.get("REMOTE_ADDR"),
             user_identifier=request.META.get("HTTP_X_REMOTE_USER"),
-            remote_site=remote_site[0],
+            remote_site=remote_site,
             date_time=timezone.now(),
             method=request.method,
             endpoint="query",
@@ -225,12 +227,294 @@ class CaseQueryEndpoint(View):
             reference=reference,
             alternative=alternative,
             status_code=output.status_code,
-            response_size=len(output.content),
         )
-        log_entry.save()
-        log_entry.cases.set(cases)
+        self._write_log(output, [(log_entry, cases)])
+        return output
+
+    def _handle_batch(self, request):
+        """
+        Handles a batch request for beacon 'query' endpoint. The JSON body contains a list
+        of AlleleRequest objects under the key 'alleleRequests' which are answered
+        by one datasetAlleleResponse per allele.
+
+        :param request: A django HttpRequest object with a JSON body.
+        :return: JSONResponse
+        """
+        allele_requests = []
+        try:
+            allele_requests = self._parse_batch(request.body)
+            # get metadata
+            beacon_id, api_version = self._query_metadata()
+            output_json = BatchQueryResponse(
+                beacon_id,
+                api_version,
+                [AlleleRequest(*a).create_dict() for a in allele_requests or []],
+            ).create_dict()
+            # authentication with password
+            if "Authorization" in request.headers:
+                key = request.headers["Authorization"]
+            else:
+                key = "public"
+            authenticated_site = self._authenticate(key)
+            # authentication failed
+            if authenticated_site is None:
+                output_json["error"] = Error(
+                    401, "You are not authorized as a user."
+                ).create_dict()
+                remote_site = None
+                raise UnboundLocalError()
+            remote_site = authenticated_site.remote_site
+            # check if the batch and each of its alleles are valid
+            if (
+                not allele_requests
+                or len(allele_requests) > settings.BEACON_MAX_BATCH_SIZE
+                or any(self._check_query_input(*a[:5]) for a in allele_requests)
+            ):
+                output_json["error"] = Error(
+                    400, "The input format is invalid."
+                ).create_dict()
+                raise UnboundLocalError()
+            # check if access limit of remote site is exceeded, each allele is charged
+            if self._check_access_limit(remote_site, len(allele_requests)):
+                output_json["error"] = Error(
+                    403, "You have exceeded your access limit."
+                ).create_dict()
+                raise UnboundLocalError()
+            # query database for all requested alleles at once
+            results = self._query_variants(
+                authenticated_site.visibility_levels, allele_requests
+            )
+            output_json["exists"] = any(r.exists for r, _ in results)
+            # the answers of the alleles are created while streaming them
+            output_json["datasetAlleleResponses"] = JsonStream(
+                r.create_dict() for r, _ in results
+            )
+            output = self._create_response(output_json)
+        except UnboundLocalError:  # Not authenticated or invalid arguments
+            output = self._create_response(
+                output_json, status=output_json["error"]["errorCode"]
+            )
+        # log one entry per allele so each allele is charged to the access limit
+        if output.status_code == 200:
+            logged = [(a, c) for a, (_, c) in zip(allele_requests, results)]
+        else:
+            logged = [((None,) * 5 + ("GRCh37",), [])]
+        self._write_log(
+            output,
+            [
+                (
+                    LogEntry(
+                        ip_address=request.META.get("REMOTE_ADDR"),
+                        user_identifier=request.META.get("HTTP_X_REMOTE_USER"),
+                        remote_site=remote_site,
+                        date_time=timezone.now(),
+                        method=request.method,
+                        endpoint="query",
+                        server_protocol=request.META["SERVER_PROTOCOL"],
+                        release=release,
+                        chromosome=chromosome,
+                        start=start,
+                        end=end,
+                        reference=reference,
+                        alternative=alternative,
+                        status_code=output.status_code,
+                    ),
+                    allele_cases,
+                )
+                for (
+                    chromosome,
+                    start,
+                    end,
+                    reference,
+                    alternative,
+                    release,
+                ), allele_cases in logged
+            ],
+        )
         return output
 
+    def _handle_region(self, request, chromosome, start, end, release, aggregate):
+        """
+        Handles a region request for beacon 'query' endpoint. The alleles of all variants
+        overlapping the region are answered by one datasetAlleleResponse per allele
+        or, if aggregate is 'true', by one datasetAlleleResponse summing up all of them.
+
+        :param request: A django HttpRequest object.
+        :param chromosome: A string of the reference name passed by the request.
+        :param start: A string of the 0-based start position passed by the request.
+        :param end: A string of the end position passed by the request.
+        :param release: A string of the release passed by the request.
+        :param aggregate: A string passed by the request, 'true' for one summed up response.
+        :return: JSONResponse
+        """
+        try:
+            # set requested cases to None
+            cases = [None]
+            # 'collect' request parameters
+            if release is None:
+                release = "GRCh37"
+            aggregate = aggregate == "true"
+            region_request = RegionRequest(
+                chromosome, start, end, release, aggregate
+            ).create_dict()
+            # get metadata
+            beacon_id, api_version = self._query_metadata()
+            output_json = RegionQueryResponse(
+                beacon_id, api_version, region_request
+            ).create_dict()
+            # authentication with password
+            if "Authorization" in request.headers:
+                key = request.headers["Authorization"]
+            else:
+                key = "public"
+            authenticated_site = self._authenticate(key)
+            # authentication failed
+            if authenticated_site is None:
+                output_json["error"] = Error(
+                    401, "You are not authorized as a user."
+                ).create_dict()
+                remote_site = None
+                raise UnboundLocalError()
+            remote_site = authenticated_site.remote_site
+            # check if input parameters are valid
+            if self._check_region_input(chromosome, start, end):
+                output_json["error"] = Error(
+                    400, "The input format is invalid."
+                ).create_dict()
+                raise UnboundLocalError()
+            # check if access limit of remote site is exceeded
+            if self._check_access_limit(remote_site):
+                output_json["error"] = Error(
+                    403, "You have exceeded your access limit."
+                ).create_dict()
+                raise UnboundLocalError()
+            # query database for the alleles in the region
+            results, cases = self._query_region(
+                authenticated_site.visibility_levels,
+                chromosome,
+                start,
+                end,
+                release,
+                aggregate,
+            )
+            output_json["exists"] = any(r.exists for _, r in results)
+            output_json["datasetAlleleResponses"] = JsonStream(
+                self._create_region_allele_dict(chromosome, allele, r)
+                for allele, r in results
+                if r.exists
+            )
+            output = self._create_response(output_json)
+        except UnboundLocalError:  # Not authenticated or invalid arguments
+            output = self._create_response(
+                output_json, status=output_json["error"]["errorCode"]
+            )
+        # log request
+        log_entry = LogEntry(
+            ip_address=request.META.get("REMOTE_ADDR"),
+            user_identifier=request.META.get("HTTP_X_REMOTE_USER"),
+            remote_site=remote_site,
+            date_time=timezone.now(),
+            method=request.method,
+            endpoint="query",
+            server_protocol=request.META["SERVER_PROTOCOL"],
+            release=release,
+            chromosome=chromosome,
+            start=start,
+            end=end,
+            status_code=output.status_code,
+        )
+        self._write_log(output, [(log_entry, cases)])
+        return output
+
+    def _create_response(self, output_json, status=200):
+        """
+        Renders the output of the query endpoint, incrementally while sending it if the
+        setting BEACON_STREAMING_RESPONSES is enabled. Otherwise, the
+        datasetAlleleResponses of a JsonStream are created before rendering them.
+
+        :param output_json: A dict of the QueryResponseObject.
+        :param status: The HTTP status code.
+        :return: RenderedJsonResponse or StreamingJsonResponse
+        """
+        if settings.BEACON_STREAMING_RESPONSES:
+            return StreamingJsonResponse(
+                output_json, status=status, json_dumps_params=get_json_dumps_params()
+            )
+        if isinstance(output_json["datasetAlleleResponses"], JsonStream):
+            output_json["datasetAlleleResponses"] = list(
+                output_json["datasetAlleleResponses"]
+            )
+        return RenderedJsonResponse(output_json, status=status)
+
+    def _write_log(self, output, items):
+        """
+        Writes the log entries of a response, each with its share of the response size.
+        The entries of a streamed response are written after its body was sent.
+
+        :param output: The RenderedJsonResponse or StreamingJsonResponse object.
+        :param items: A list of (unsaved LogEntry object without response size, list
+         of cases) tuples.
+        """
+
+        def write(response_size):
+            for log_entry, _ in items:
+                log_entry.response_size = response_size // len(items)
+            log_writer.write_many(items)
+
+        if isinstance(output, StreamingJsonResponse):
+            output.on_complete(lambda response: write(response.response_size))
+        else:
+            write(len(output.content))
+
+    def _create_region_allele_dict(self, chromosome, allele, allele_response):
+        """
+        Creates the datasetAlleleResponse of an allele of a region request, which
+        contains the coordinates of the allele unless the alleles are aggregated.
+
+        :param chromosome: A string of the requested reference name.
+        :param allele: A (release, chromosome, start, end, reference, alternative) tuple
+         with the 1-based start position or None if aggregated.
+        :param allele_response: An AlleleResponseAccumulationObject.
+        :return: dict of the datasetAlleleResponse
+        """
+        if allele is None:
+            return allele_response.create_dict()
+        release, _, start, end, reference, alternative = allele
+        allele_dict = AlleleRequest(
+            chromosome, start - 1, end, reference, alternative, release
+        ).create_dict()
+        allele_dict.update(allele_response.create_dict())
+        return allele_dict
+
+    def _parse_batch(self, body):
+        """
+        Parses the JSON body of a batch request into a list of allele parameter tuples.
+
+        :param body: A bytes object containing the JSON body of the request.
+        :return: list of (chromosome, start, end, reference, alternative, release) tuples
+         or None if the body is invalid.
+        """
+        try:
+            allele_requests = json.loads(body)["alleleRequests"]
+            if not isinstance(allele_requests, list):
+                return None
+            return [
+                tuple(
+                    None if a.get(k) is None else str(a.get(k))
+                    for k in (
+                        "referenceName",
+                        "start",
+                        "end",
+                        "referenceBases",
+                        "alternateBases",
+                    )
+                )
+                + (str(a.get("assemblyId") or "GRCh37"),)
+                for a in allele_requests
+            ]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+
     def _check_query_input(self, chromosome, start, end, reference, alternative):
         """
         Checks if the parameters passed by the request have a invalid format.
@@ -264,44 +548,67 @@ class CaseQueryEndpoint(View):
             return True
         return False
 
+    def _check_region_input(self, chromosome, start, end):
+        """
+        Checks if the region passed by the request has a invalid format or exceeds the
+        maximal region size.
+
+        :param chromosome: A string of the reference name.
+        :param start: A string of the 0-based start position.
+        :param end: A string of the end position.
+        :return: bool: True if invalid, False otherwise
+        """
+        chromosome_pattern = re.compile(r"[1-9]|[1][0-9]|[2][0-2]|[XY]")
+        position_pattern = re.compile(r"(\d+)")
+        try:
+            if re.fullmatch(chromosome_pattern, chromosome) is None:
+                return True
+            if re.fullmatch(position_pattern, start) is None:
+                return True
+            if re.fullmatch(position_pattern, end) is None:
+                return True
+            if int(start) >= int(end) or int(end) > MAX_BIN_POSITION:
+                return True
+            if int(end) - int(start) > settings.BEACON_MAX_REGION_SIZE:
+                return True
+        except TypeError:
+            return True
+        return False
+
     def _authenticate(self, key):
         """
         Authenticates the client by finding fitting remote site for key.
 
         :param key: A key string.
-        :rtype: django QuerySet containing a RemoteSite object.
+        :return: AuthenticatedRemoteSite object or None if the key is unknown
         """
-        remote_site = RemoteSite.objects.filter(key=key)
-        return remote_site
+        return authentication_cache.get(key)
 
-    def _check_access_limit(self, remote_site):
+    def _check_access_limit(self, remote_site, requested=1):
         """
         Checks if the client exceeded his access limit defined by the Remote Site.
 
         :param remote_site: A RemoteSite object.
+        :param requested: The number of requests to be charged, default is 1
         :return: bool: True if exceeded, False otherwise
         """
-        access_limit = remote_site.access_limit
-        if (
-            LogEntry.objects.filter(
-                remote_site=remote_site, date_time__contains=date.today()
-            ).count()
-            >= access_limit
-        ):
-            return True
-        else:
-            return False
+        return (
+            get_access_counter().get(remote_site.id)
+            + log_writer.pending(remote_site.id)
+            + requested
+            > remote_site.access_limit
+        )
 
     def _query_variant(
-        self, consortia, chromosome, start, end, reference, alternative, release
+        self, vis_levels, chromosome, start, end, reference, alternative, release
     ):
         """
         Queries the database for the given variant defined by the input parameters
         and accumulates the variant information according its visibility level.
         Returns an AlleleResponseAccumulationObject from the json_structures module.
 
-        :param consortia: A QuerySet of consortium objects which defining
-         the visibility level of the variant data.
+        :param vis_levels: A dict mapping the ids of the projects visible to the
+         remote site to the visibility level of their variant data.
         :param chromosome: A string of the reference name.
         :param start: A string of the start position.
         :param end: A string of the end position.
@@ -310,63 +617,226 @@ class CaseQueryEndpoint(View):
         :param release: A string of the release.
         :return: AlleleResponseAccumulationObject
         """
-        allele_response = AlleleResponseAccumulation()
-        # convert 0-based variant position to 1-based
-        start_1_based = int(start) + 1
-        # query database for requested variant
-        variants = Variant.objects.filter(
-            chromosome=chromosome,
-            start=start_1_based,
-            release=release,
-            end=end,
-            reference=reference,
-            alternative=alternative,
-            case__project__consortium__in=consortia.all(),
-        ).distinct()
-        cases = []
-        # for each variant get summary data according to visibility level
-        for v in variants:
-            allele_response.variant = v
-            visibility_level = self._get_highest_vis_level(v.case.project, consortia)
-            if visibility_level == 0:
-                variant_accumulator = VariantAccumulator0()
-            elif visibility_level == 5:
-                variant_accumulator = VariantAccumulator5()
-            elif visibility_level == 10:
-                variant_accumulator = VariantAccumulator10()
-            elif visibility_level == 15:
-                variant_accumulator = VariantAccumulator15()
-            elif visibility_level == 20:
-                variant_accumulator = VariantAccumulator20()
-            else:
-                variant_accumulator = VariantAccumulator25()
-            variant_accumulator.accumulate(allele_response)
-            cases.append(v.case)
-        # calculate frequency
-        if allele_response.exists:
-            allele_response.frequency = round(
-                (allele_response.variant_count / allele_response.frequency_count), 2
+        return self._query_variants(
+            vis_levels, [(chromosome, start, end, reference, alternative, release)]
+        )[0]
+
+    def _query_variants(self, vis_levels, allele_requests):
+        """
+        Queries the database for all given variants at once and accumulates the
+        variant information of each allele according its visibility level.
+
+        :param vis_levels: A dict mapping the ids of the projects visible to the
+         remote site to the visibility level of their variant data.
+        :param allele_requests: A list of (chromosome, start, end, reference, alternative, release)
+         tuples of strings, the start position is 0-based.
+        :return: list of (AlleleResponseAccumulationObject, list of cases) tuples,
+         one for each allele request
+        """
+        # convert 0-based variant position to 1-based and map reference name
+        keys = [
+            (
+                release,
+                CHROMOSOME_MAPPING.get(chromosome, chromosome),
+                int(start) + 1,
+                int(end),
+                reference,
+                alternative,
             )
-        return allele_response, cases
+            for chromosome, start, end, reference, alternative, release in allele_requests
+        ]
+        if settings.BEACON_QUERY_BACKEND == "allele_summaries":
+            return self._query_allele_summaries(vis_levels, keys)
+        variants_per_key = {key: [] for key in keys}
+        unique_keys = sorted(set(keys))
+        # query database for requested variants by their allele keys chunk-wise to
+        # stay within the limit of query parameters, the coordinates of the found
+        # variants are compared as different alleles may share a key
+        for i in range(0, len(unique_keys), self.QUERY_CHUNK_SIZE):
+            chunk = unique_keys[i : i + self.QUERY_CHUNK_SIZE]
+            variants = (
+                Variant.objects.filter(
+                    # variants whose key is not filled yet by backfill_variants
+                    # are looked up by their positions
+                    Q(allele_key__in={Variant.get_allele_key(*key) for key in chunk})
+                    | Q(
+                        allele_key__isnull=True,
+                        release__in={key[0] for key in chunk},
+                        chromosome__in={key[1] for key in chunk},
+                        start__in={key[2] for key in chunk},
+                    ),
+                    case__project_id__in=vis_levels.keys(),
+                )
+                .select_related("case")
+                .prefetch_related("case__phenotype_set")
+            )
+            for v in variants:
+                key = (
+                    v.release,
+                    v.chromosome,
+                    v.start,
+                    v.end,
+                    v.reference,
+                    v.alternative,
+                )
+                if key in variants_per_key:
+                    variants_per_key[key].append(v)
+        return self._accumulate_variants(
+            vis_levels, [variants_per_key[key] for key in keys]
+        )
 
-    def _query_metadata(self):
+    def _query_region(self, vis_levels, chromosome, start, end, release, aggregate):
         """
-        Queries the database for the beacon metadata.
+        Queries the database for the variants overlapping a region through the bins
+        of the variants and accumulates the variant information of each allele
+        or of all of them according to their visibility level.
 
-        :return: beacon_id string, api_version string
+        :param vis_levels: A dict mapping the ids of the projects visible to the
+         remote site to the visibility level of their variant data.
+        :param chromosome: A string of the reference name.
+        :param start: A string of the 0-based start position.
+        :param end: A string of the end position.
+        :param release: A string of the release.
+        :param aggregate: Accumulate all alleles of the region at once.
+        :return: list of ((release, chromosome, start, end, reference, alternative) tuple
+         or None if aggregated, AlleleResponseAccumulationObject) tuples ordered by
+         position, list of cases
+        """
+        # convert 0-based region start to 1-based
+        start = int(start) + 1
+        end = int(end)
+        variants = (
+            Variant.objects.filter(
+                bin__in=get_overlapping_bins(start, end),
+                release=release,
+                chromosome=CHROMOSOME_MAPPING[chromosome],
+                start__lte=end,
+                end__gte=start,
+                case__project_id__in=vis_levels.keys(),
+            )
+            .select_related("case")
+            .prefetch_related("case__phenotype_set")
+            .order_by("start", "end", "reference", "alternative", "id")
+        )
+        variants_per_allele = {}
+        for v in variants:
+            variants_per_allele.setdefault(
+                (
+                    v.release,
+                    v.chromosome,
+                    v.start,
+                    v.end,
+                    v.reference,
+                    v.alternative,
+                ),
+                [],
+            ).append(v)
+        if aggregate:
+            alleles = [None]
+            variant_groups = [[v for vs in variants_per_allele.values() for v in vs]]
+        else:
+            alleles = list(variants_per_allele)
+            variant_groups = list(variants_per_allele.values())
+        results = self._accumulate_variants(vis_levels, variant_groups)
+        return (
+            [(allele, r) for allele, (r, _) in zip(alleles, results)],
+            [c for _, allele_cases in results for c in allele_cases],
+        )
+
+    def _accumulate_variants(self, vis_levels, variant_groups):
+        """
+        Accumulates the variant information of each group of variants according the
+        visibility level of their project.
+
+        :param vis_levels: A dict mapping the ids of the projects visible to the
+         remote site to the visibility level of their variant data.
+        :param variant_groups: A list of lists of Variant objects with their cases
+         and phenotypes.
+        :return: list of (AlleleResponseAccumulationObject, list of cases) tuples,
+         one for each group
+        """
+        # count the alleles of all matched variants at once
+        matched = list({id(v): v for group in variant_groups for v in group}.values())
+        counts = dict(zip(map(id, matched), count_variants(matched)))
+        results = []
+        for group in variant_groups:
+            items_by_level = {}
+            cases = []
+            # group the variants by the visibility level of their project and only
+            # collect the information revealed by the level
+            for v in group:
+                level = vis_levels[v.case.project_id]
+                rule = get_visibility_rule(level)
+                items_by_level.setdefault(level, []).append(
+                    AccumulationItem(
+                        counts[id(v)],
+                        (
+                            [p.phenotype for p in v.case.phenotype_set.all()]
+                            if rule.phenotype or rule.coarse_phenotype
+                            else ()
+                        ),
+                        (v.case.index,) if rule.case_index else (),
+                    )
+                )
+                cases.append(v.case)
+            results.append((accumulate_by_level(items_by_level), cases))
+        return results
+
+    def _query_allele_summaries(self, vis_levels, keys):
+        """
+        Queries the database for the summaries of all given alleles in the visible
+        projects and accumulates them according to the visibility level of their project.
+
+        :param vis_levels: A dict mapping the ids of the projects visible to the
+         remote site to the visibility level of their variant data.
+        :param keys: A list of (release, chromosome, start, end, reference, alternative)
+         tuples with the stored chromosome value and 1-based start position.
+        :return: list of (AlleleResponseAccumulationObject, list of cases) tuples,
+         one for each allele
         """
-        metadata_beacon = MetadataBeacon.objects.all()
-        return metadata_beacon[0].beacon_id, metadata_beacon[0].api_version
+        summaries_per_key = {key: [] for key in keys}
+        starts = sorted({key[2] for key in keys})
+        for i in range(0, len(starts), self.QUERY_CHUNK_SIZE):
+            summaries = AlleleSummary.objects.filter(
+                release__in={key[0] for key in keys},
+                chromosome__in={key[1] for key in keys},
+                start__in=starts[i : i + self.QUERY_CHUNK_SIZE],
+                project_id__in=vis_levels.keys(),
+            ).prefetch_related(Prefetch("cases", queryset=Case.objects.order_by("id")))
+            for s in summaries:
+                key = (
+                    s.release,
+                    s.chromosome,
+                    s.start,
+                    s.end,
+                    s.reference,
+                    s.alternative,
+                )
+                if key in summaries_per_key:
+                    summaries_per_key[key].append(s)
+        results = []
+        for key in keys:
+            items_by_level = {}
+            cases = []
+            # group the summaries by the visibility level of their project
+            for s in summaries_per_key[key]:
+                summary_cases = s.cases.all()
+                items_by_level.setdefault(vis_levels[s.project_id], []).append(
+                    AccumulationItem(
+                        (s.variant_count, s.sample_count, s.frequency_count),
+                        s.phenotypes,
+                        [c.index for c in summary_cases],
+                    )
+                )
+                cases.extend(summary_cases)
+            results.append((accumulate_by_level(items_by_level), cases))
+        return results
 
-    def _get_highest_vis_level(self, projects, consortia):
+    def _query_metadata(self):
         """
-        Looks up which is the highest visibility level for which the data from the project can be queried.
+        Queries the database for the beacon metadata.
 
-        :param projects: A project object.
-        :param consortia: A consortia QuerySet.
-        :return: A visibility level integer
+        :return: beacon_id string, api_version string
         """
-        project_consortia = Consortium.objects.filter(
-            projects=projects, id__in=consortia.all().values("id")
-        ).values("visibility_level")
-        return min([c["visibility_level"] for c in project_consortia])
+        metadata_beacon = MetadataBeacon.objects.all()[0]
+        return metadata_beacon.beacon_id, metadata_beacon.api_version
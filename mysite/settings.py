@@ -2,9 +2,8 @@
 Django settings for beacon project.
 """
 
-import obonet
+import os
 from pathlib import Path
-import networkx
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -108,16 +107,75 @@ USE_TZ = True
 STATIC_URL = "/static/"
 
 
-# Build up HPO graph
-HPO_GRAPH_PATH = "http://purl.obolibrary.org/obo/hp.obo"
-HPO_GRAPH = obonet.read_obo(HPO_GRAPH_PATH).reverse()
-HPO_COARSE_TERMS = {
-    k
-    for k, v in networkx.algorithms.shortest_path_length(
-        HPO_GRAPH, list({n for n, d in HPO_GRAPH.in_degree() if d == 0})[0]
-    ).items()
-    if v == 4
-}
+# Source of the HPO graph, which is loaded on first use (see beacon.hpo.get_ontology)
+# The source can be a local file or an URL and is set by the environment variable BEACON_HPO_PATH
+HPO_GRAPH_PATH = os.environ.get(
+    "BEACON_HPO_PATH", "http://purl.obolibrary.org/obo/hp.obo"
+)
+# Directory where the precomputed HPO graph is cached, delete it for reloading an URL
+HPO_CACHE_DIR = os.environ.get("BEACON_HPO_CACHE_DIR", BASE_DIR / ".hpo_cache")
+# Load the HPO graph when the app starts instead of on the first phenotype query
+HPO_WARM_UP = False
+
+
+# Maximal number of alleles in one batch request of the query endpoint
+BEACON_MAX_BATCH_SIZE = 1000
+
+# Maximal number of bases of a region request of the query endpoint
+BEACON_MAX_REGION_SIZE = 1000000
+
+
+# Source of the query answers: "variants" reads the genotypes of the matching variants,
+# "allele_summaries" reads the summed up variants of each project, which are only kept
+# up to date while this backend is active and must be filled by the management command
+# rebuild_allele_summaries before switching to it
+BEACON_QUERY_BACKEND = "variants"
+
+
+# Indentation of the JSON responses, None renders them compactly without spaces
+BEACON_JSON_INDENT = 2 if DEBUG else None
+
+# Encoder of the JSON responses, "orjson" uses the package orjson if it is installed
+# (only for the indentations None and 2) and "json" the encoder of the standard library
+BEACON_JSON_ENCODER = "orjson"
+
+# Render the answers of the query endpoint incrementally while sending them, so large
+# answers are not held in memory as a whole and the first bytes are sent earlier
+BEACON_STREAMING_RESPONSES = False
+
+
+# Number of remote site keys kept in the authentication cache
+BEACON_AUTH_CACHE_SIZE = 256
+
+# Seconds a remote site and its visibility levels are kept in the authentication cache,
+# which bounds how long other processes than the one changing consortia or projects
+# use the previous levels
+BEACON_AUTH_CACHE_TTL = 300
+
+# Seconds the rendered response of the info endpoint is kept
+BEACON_INFO_CACHE_TTL = 300
+
+
+# Backend counting the daily requests per remote site for the access limit, either
+# "beacon.access_counter.DatabaseAccessCounter" or "beacon.access_counter.CacheAccessCounter"
+BEACON_ACCESS_COUNTER = "beacon.access_counter.DatabaseAccessCounter"
+
+# Django cache used by the CacheAccessCounter
+BEACON_ACCESS_COUNTER_CACHE = "default"
+
+
+# Logging of the requests, either "sync" (saved within the request) or "async"
+# (buffered and bulk inserted by a background thread)
+BEACON_LOG_MODE = "sync"
+
+# Maximal number of log entries inserted at once by the background thread
+BEACON_LOG_BATCH_SIZE = 500
+
+# Milliseconds the background thread waits for further log entries before inserting
+BEACON_LOG_FLUSH_INTERVAL = 200
+
+# Maximal number of buffered log entries, requests wait if the buffer is full
+BEACON_LOG_BUFFER_SIZE = 10000
 
 
 # Default fields for database